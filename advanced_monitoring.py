@@ -8,26 +8,64 @@ import time
 import psutil
 import logging
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Any
 import threading
 import queue
 
+import numpy as np
+
+from lib.registry import registry
+from lib.metrics import metrics as metrics_registry, start_metrics_exporter
+from lib.timeseries import RingBuffer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Scrapeable metrics, shared with PerformanceMonitor and ErrorHandler
+SYSTEM_GAUGES = {
+    'cpu_usage': metrics_registry.gauge("system_cpu_usage_percent", "Host CPU utilisation"),
+    'memory_usage': metrics_registry.gauge("system_memory_usage_percent", "Host memory utilisation"),
+    'memory_available': metrics_registry.gauge("system_memory_available_bytes", "Host memory available", unit="bytes"),
+    'disk_usage': metrics_registry.gauge("system_disk_usage_percent", "Root filesystem utilisation"),
+    'disk_free': metrics_registry.gauge("system_disk_free_bytes", "Root filesystem free space", unit="bytes"),
+    'process_count': metrics_registry.gauge("system_process_count", "Processes running on the host")
+}
+LOAD_AVERAGE = metrics_registry.gauge("system_load_average", "Host load average", ["period"])
+OPERATION_DURATION = metrics_registry.histogram("operation_duration_seconds", "Duration of tracked operations",
+                                                ["operation"])
+OPERATION_FAILURES = metrics_registry.counter("operation_failures", "Tracked operations that failed", ["operation"])
+ERRORS = metrics_registry.counter("errors", "Application errors by type", ["error_type"])
+ALERTS = metrics_registry.counter("alerts", "Monitoring alerts raised", ["type", "severity"])
+USER_ACTIONS = metrics_registry.counter("user_actions", "Tracked user actions", ["action"])
+
+# System samples are taken every 30 seconds and a week of them is kept
+MONITOR_INTERVAL = 30
+WEEK_OF_SAMPLES = 7 * 24 * 3600 // MONITOR_INTERVAL
+
+# Capacity and columns of each series; timestamps are epoch seconds
+SERIES = {
+    'system_health': (WEEK_OF_SAMPLES, {
+        'cpu_usage': np.float32, 'memory_usage': np.float32, 'memory_available': np.int64,
+        'disk_usage': np.float32, 'disk_free': np.int64, 'process_count': np.int32,
+        'load_1m': np.float32, 'load_5m': np.float32, 'load_15m': np.float32
+    }),
+    'performance': (10000, {'operation': object, 'duration': np.float64, 'success': np.bool_}),
+    'errors': (1000, {'error_type': object, 'error_message': object, 'context': object}),
+    'alerts': (1000, {'type': object, 'severity': object, 'message': object,
+                      'value': np.float64, 'threshold': np.float64}),
+    'user_activity': (1000, {'user_id': object, 'action': object, 'details': object})
+}
+
+def _format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
 class AdvancedMonitoring:
     """Advanced monitoring and alerting system"""
     
     def __init__(self):
-        self.metrics = {
-            'performance': [],
-            'errors': [],
-            'alerts': [],
-            'user_activity': [],
-            'system_health': []
-        }
+        self.metrics = {name: RingBuffer(capacity, columns) for name, (capacity, columns) in SERIES.items()}
         self.alert_thresholds = {
             'cpu_usage': 80,
             'memory_usage': 85,
@@ -45,6 +83,7 @@ class AdvancedMonitoring:
             monitoring_thread = threading.Thread(target=self._monitoring_loop)
             monitoring_thread.daemon = True
             monitoring_thread.start()
+            start_metrics_exporter()
             logger.info("Advanced monitoring started")
     
     def stop_monitoring(self):
@@ -58,17 +97,13 @@ class AdvancedMonitoring:
             try:
                 # Collect system metrics
                 system_metrics = self._collect_system_metrics()
-                self.metrics['system_health'].append(system_metrics)
+                self._record_system_metrics(system_metrics)
+                self._export_system_metrics(system_metrics)
                 
                 # Check for alerts
                 self._check_alerts(system_metrics)
                 
-                # Clean old metrics (keep last 1000 entries)
-                for metric_type in self.metrics:
-                    if len(self.metrics[metric_type]) > 1000:
-                        self.metrics[metric_type] = self.metrics[metric_type][-1000:]
-                
-                time.sleep(30)  # Monitor every 30 seconds
+                time.sleep(MONITOR_INTERVAL)
                 
             except Exception as e:
                 logger.error(f"Monitoring error: {e}")
@@ -82,7 +117,7 @@ class AdvancedMonitoring:
             disk = psutil.disk_usage('/')
             
             return {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': time.time(),
                 'cpu_usage': cpu_percent,
                 'memory_usage': memory.percent,
                 'memory_available': memory.available,
@@ -94,7 +129,7 @@ class AdvancedMonitoring:
         except Exception as e:
             logger.error(f"Error collecting system metrics: {e}")
             return {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': time.time(),
                 'cpu_usage': 0,
                 'memory_usage': 0,
                 'memory_available': 0,
@@ -104,6 +139,32 @@ class AdvancedMonitoring:
                 'load_average': [0, 0, 0]
             }
     
+    def _record_system_metrics(self, metrics: Dict):
+        """Append a system sample to its series"""
+        load_1m, load_5m, load_15m = metrics.get('load_average', [0, 0, 0])
+        self.metrics['system_health'].append(
+            metrics['timestamp'],
+            **{key: metrics[key] for key in SYSTEM_GAUGES},
+            load_1m=load_1m, load_5m=load_5m, load_15m=load_15m
+        )
+    
+    def _export_system_metrics(self, metrics: Dict):
+        """Publish the latest system sample as gauges"""
+        for key, gauge in SYSTEM_GAUGES.items():
+            gauge.set(metrics.get(key, 0))
+        for period, value in zip(("1m", "5m", "15m"), metrics.get('load_average', [0, 0, 0])):
+            LOAD_AVERAGE.labels(period).set(value)
+    
+    def _record_alert(self, alert: Dict):
+        """Store, queue and count an alert"""
+        self.metrics['alerts'].append(
+            type=alert['type'], severity=alert['severity'], message=alert['message'],
+            value=alert.get('value', alert.get('duration', alert.get('error_count', np.nan))),
+            threshold=alert.get('threshold', np.nan)
+        )
+        self.alert_queue.put(alert)
+        ALERTS.labels(alert['type'], alert['severity']).inc()
+    
     def _check_alerts(self, metrics: Dict):
         """Check for alert conditions"""
         alerts = []
@@ -143,20 +204,15 @@ class AdvancedMonitoring:
         
         # Add alerts to queue
         for alert in alerts:
-            self.metrics['alerts'].append(alert)
-            self.alert_queue.put(alert)
+            self._record_alert(alert)
             logger.warning(f"Alert: {alert['message']}")
     
     def track_performance(self, operation: str, duration: float, success: bool = True):
         """Track operation performance"""
-        performance_data = {
-            'timestamp': datetime.now().isoformat(),
-            'operation': operation,
-            'duration': duration,
-            'success': success
-        }
-        
-        self.metrics['performance'].append(performance_data)
+        self.metrics['performance'].append(operation=operation, duration=duration, success=success)
+        OPERATION_DURATION.labels(operation).observe(duration)
+        if not success:
+            OPERATION_FAILURES.labels(operation).inc()
         
         # Check for performance alerts
         if duration > self.alert_thresholds['response_time']:
@@ -169,45 +225,30 @@ class AdvancedMonitoring:
                 'duration': duration,
                 'threshold': self.alert_thresholds['response_time']
             }
-            self.metrics['alerts'].append(alert)
-            self.alert_queue.put(alert)
+            self._record_alert(alert)
     
     def track_error(self, error_type: str, error_message: str, context: str = ""):
         """Track application errors"""
-        error_data = {
-            'timestamp': datetime.now().isoformat(),
-            'error_type': error_type,
-            'error_message': error_message,
-            'context': context
-        }
-        
-        self.metrics['errors'].append(error_data)
+        self.metrics['errors'].append(error_type=error_type, error_message=error_message, context=context)
+        ERRORS.labels(error_type).inc()
         
         # Check error rate
-        recent_errors = [e for e in self.metrics['errors'] 
-                        if datetime.fromisoformat(e['timestamp']) > datetime.now() - timedelta(minutes=5)]
+        recent_errors = self.metrics['errors'].count(since=time.time() - 300)
         
-        if len(recent_errors) > 10:  # More than 10 errors in 5 minutes
+        if recent_errors > 10:  # More than 10 errors in 5 minutes
             alert = {
                 'type': 'error_rate',
                 'severity': 'critical',
-                'message': f"High error rate: {len(recent_errors)} errors in 5 minutes",
+                'message': f"High error rate: {recent_errors} errors in 5 minutes",
                 'timestamp': datetime.now().isoformat(),
-                'error_count': len(recent_errors)
+                'error_count': recent_errors
             }
-            self.metrics['alerts'].append(alert)
-            self.alert_queue.put(alert)
+            self._record_alert(alert)
     
     def track_user_activity(self, user_id: str, action: str, details: Dict = None):
         """Track user activity"""
-        activity_data = {
-            'timestamp': datetime.now().isoformat(),
-            'user_id': user_id,
-            'action': action,
-            'details': details or {}
-        }
-        
-        self.metrics['user_activity'].append(activity_data)
+        self.metrics['user_activity'].append(user_id=user_id, action=action, details=details or {})
+        USER_ACTIONS.labels(action).inc()
         logger.info(f"User activity: {user_id} - {action}")
     
     def show_monitoring_dashboard(self):
@@ -228,13 +269,16 @@ class AdvancedMonitoring:
         
         # User activity
         self._show_user_activity()
+        
+        # Series storage
+        self._show_storage()
     
     def _show_system_health(self):
         """Show system health metrics"""
         st.markdown("### 🖥️ System Health")
         
-        if self.metrics['system_health']:
-            latest_metrics = self.metrics['system_health'][-1]
+        if len(self.metrics['system_health']):
+            latest_metrics = self.metrics['system_health'].latest()
             
             col1, col2, col3, col4 = st.columns(4)
             
@@ -260,10 +304,11 @@ class AdvancedMonitoring:
             # System health chart
             if len(self.metrics['system_health']) > 1:
                 st.markdown("**System Health Over Time**")
+                recent = self.metrics['system_health'].window(last=20)
                 chart_data = {
-                    'CPU Usage': [m['cpu_usage'] for m in self.metrics['system_health'][-20:]],
-                    'Memory Usage': [m['memory_usage'] for m in self.metrics['system_health'][-20:]],
-                    'Disk Usage': [m['disk_usage'] for m in self.metrics['system_health'][-20:]]
+                    'CPU Usage': recent['cpu_usage'],
+                    'Memory Usage': recent['memory_usage'],
+                    'Disk Usage': recent['disk_usage']
                 }
                 st.line_chart(chart_data)
         else:
@@ -273,12 +318,13 @@ class AdvancedMonitoring:
         """Show performance metrics"""
         st.markdown("### ⚡ Performance Metrics")
         
-        if self.metrics['performance']:
+        if len(self.metrics['performance']):
             # Calculate performance statistics
-            durations = [p['duration'] for p in self.metrics['performance']]
-            avg_duration = sum(durations) / len(durations)
-            max_duration = max(durations)
-            min_duration = min(durations)
+            performance = self.metrics['performance'].window()
+            durations = performance['duration']
+            avg_duration = durations.mean()
+            max_duration = durations.max()
+            min_duration = durations.min()
             
             col1, col2, col3, col4 = st.columns(4)
             
@@ -292,13 +338,13 @@ class AdvancedMonitoring:
                 st.metric("Min Response Time", f"{min_duration:.2f}s")
             
             with col4:
-                success_rate = sum(1 for p in self.metrics['performance'] if p['success']) / len(self.metrics['performance'])
+                success_rate = performance['success'].mean()
                 st.metric("Success Rate", f"{success_rate:.1%}")
             
             # Performance chart
             st.markdown("**Performance Over Time**")
             chart_data = {
-                'Response Time': [p['duration'] for p in self.metrics['performance'][-20:]]
+                'Response Time': durations[-20:]
             }
             st.line_chart(chart_data)
         else:
@@ -308,12 +354,10 @@ class AdvancedMonitoring:
         """Show error tracking"""
         st.markdown("### 🐛 Error Tracking")
         
-        if self.metrics['errors']:
+        if len(self.metrics['errors']):
             # Error statistics
-            error_types = {}
-            for error in self.metrics['errors']:
-                error_type = error['error_type']
-                error_types[error_type] = error_types.get(error_type, 0) + 1
+            types, counts = np.unique(self.metrics['errors'].window()['error_type'].astype(str), return_counts=True)
+            error_types = dict(zip(types, counts))
             
             col1, col2 = st.columns(2)
             
@@ -324,7 +368,7 @@ class AdvancedMonitoring:
             
             with col2:
                 st.markdown("**Recent Errors**")
-                for error in self.metrics['errors'][-5:]:
+                for error in self.metrics['errors'].rows(5):
                     st.write(f"• {error['error_type']}: {error['error_message']}")
         else:
             st.info("No errors recorded.")
@@ -333,20 +377,21 @@ class AdvancedMonitoring:
         """Show alerts"""
         st.markdown("### 🚨 Alerts")
         
-        if self.metrics['alerts']:
+        if len(self.metrics['alerts']):
             # Group alerts by severity
-            critical_alerts = [a for a in self.metrics['alerts'] if a['severity'] == 'critical']
-            warning_alerts = [a for a in self.metrics['alerts'] if a['severity'] == 'warning']
+            alerts = self.metrics['alerts'].window()
+            critical_alerts = np.flatnonzero(alerts['severity'] == 'critical')
+            warning_alerts = np.flatnonzero(alerts['severity'] == 'warning')
             
-            if critical_alerts:
+            if len(critical_alerts):
                 st.error(f"**Critical Alerts ({len(critical_alerts)})**")
-                for alert in critical_alerts[-5:]:
-                    st.error(f"🔴 {alert['message']} - {alert['timestamp']}")
+                for i in critical_alerts[-5:]:
+                    st.error(f"🔴 {alerts['message'][i]} - {_format_timestamp(alerts['timestamp'][i])}")
             
-            if warning_alerts:
+            if len(warning_alerts):
                 st.warning(f"**Warning Alerts ({len(warning_alerts)})**")
-                for alert in warning_alerts[-5:]:
-                    st.warning(f"🟡 {alert['message']} - {alert['timestamp']}")
+                for i in warning_alerts[-5:]:
+                    st.warning(f"🟡 {alerts['message'][i]} - {_format_timestamp(alerts['timestamp'][i])}")
         else:
             st.success("✅ No active alerts.")
     
@@ -354,15 +399,31 @@ class AdvancedMonitoring:
         """Show user activity"""
         st.markdown("### 👥 User Activity")
         
-        if self.metrics['user_activity']:
+        if len(self.metrics['user_activity']):
             # Recent activity
-            recent_activity = self.metrics['user_activity'][-10:]
+            recent_activity = self.metrics['user_activity'].rows(10)
             
             for activity in recent_activity:
-                st.write(f"• {activity['user_id']}: {activity['action']} - {activity['timestamp']}")
+                st.write(f"• {activity['user_id']}: {activity['action']} - {_format_timestamp(activity['timestamp'])}")
         else:
             st.info("No user activity recorded.")
     
+    def memory_report(self) -> Dict[str, Dict[str, Any]]:
+        """Capacity, fill and array memory of each series"""
+        return {name: series.memory() for name, series in self.metrics.items()}
+    
+    def _show_storage(self):
+        """Show series capacity and memory"""
+        st.markdown("### 🗄️ Metric Storage")
+        
+        report = self.memory_report()
+        total = sum(series['bytes'] for series in report.values())
+        week = report['system_health']
+        st.caption(f"{total / 1024 / 1024:.1f} MiB for all series · a week of {MONITOR_INTERVAL}s system samples "
+                   f"({week['capacity']:,}) takes {week['bytes'] / 1024 / 1024:.1f} MiB, "
+                   f"{week['bytes_per_sample']:.0f} bytes per sample")
+        st.dataframe([{'series': name, **series} for name, series in report.items()], use_container_width=True)
+    
     def show_alert_settings(self):
         """Show alert configuration"""
         st.markdown("### ⚙️ Alert Settings")
@@ -390,8 +451,8 @@ class AdvancedMonitoring:
             })
             st.success("✅ Alert settings saved!")
 
-# Global monitoring instance
-advanced_monitoring = AdvancedMonitoring()
+# Global monitoring instance, created on first use
+advanced_monitoring = registry.register("advanced_monitoring", AdvancedMonitoring)
 
 def show_advanced_monitoring():
     """Main advanced monitoring interface"""
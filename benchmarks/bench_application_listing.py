@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark application listing memory
+Compares the header-only listing from get_all_applications() with loading
+every full application, using tracemalloc to measure retained memory.
+
+Usage: python benchmarks/bench_application_listing.py [record_count]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.secure_data_manager import SecureDataManager
+from bench_secure_data_manager import sample_application
+
+def _measure(label, load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {len(result):>7} records   {elapsed:7.2f} s   "
+          f"retained {retained / 1024 / 1024:8.1f} MiB   peak {peak / 1024 / 1024:8.1f} MiB")
+    return result
+
+def run(record_count: int = 50000):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        manager = SecureDataManager(
+            data_dir=os.path.join(workdir, "data"),
+            secrets_dir=os.path.join(workdir, "secrets")
+        )
+        for i in range(record_count):
+            manager.save_application(sample_application(i, free_text_size=1500))
+
+        headers = _measure("headers only:", manager.get_all_applications)
+        del headers
+        _measure("full records:", lambda: [manager.load_application(header["application_id"])
+                                           for header in manager.get_all_applications()])
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark the breached-password filter
+Builds filters over synthetic password lists at several target false
+positive rates, then measures the file size against a Python set of the
+same passwords, the resident memory of opening the filter and of running
+lookups through it, lookup latency for members and non-members, and the
+false positive rate actually observed on passwords that were never inserted.
+Members must always be found.
+
+Usage: python benchmarks/bench_breach_filter.py [entries, default 1000000] [lookups, default 200000]
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.breach_filter import BreachedPasswordFilter, build_filter
+
+FP_RATES = (0.01, 0.001, 0.0001)
+
+def _rss_kib() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def _passwords(count: int, seed: int, prefix: str):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "!@#$%"
+    return [prefix + "".join(rng.choices(alphabet, k=rng.randint(6, 14))) for _ in range(count)]
+
+def _time_lookups(bloom, passwords) -> float:
+    start = time.perf_counter()
+    for password in passwords:
+        password in bloom
+    return (time.perf_counter() - start) / len(passwords) * 1e6
+
+def run(entries: int = 1000000, lookups: int = 200000):
+    logging.disable(logging.WARNING)
+    members = _passwords(entries, 1, "m")
+    # A different prefix guarantees none of these were inserted
+    strangers = _passwords(lookups, 2, "s")
+    set_bytes = sys.getsizeof(set(members)) + sum(sys.getsizeof(p) for p in members)
+    print(f"{entries:,} passwords; as a Python set: {set_bytes / 2 ** 20:.1f} MiB\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fp_rate in FP_RATES:
+            path = os.path.join(tmp, f"filter-{fp_rate}.bloom")
+            start = time.perf_counter()
+            built = build_filter(iter(members), path, entries, fp_rate)
+            build_seconds = time.perf_counter() - start
+
+            rss_before = _rss_kib()
+            bloom = BreachedPasswordFilter(path)
+            rss_open = _rss_kib() - rss_before
+
+            sample = random.Random(3).sample(members, min(lookups, entries))
+            member_us = _time_lookups(bloom, sample)
+            missing = sum(1 for password in sample if password not in bloom)
+            stranger_us = _time_lookups(bloom, strangers)
+            false_positives = sum(1 for password in strangers if password in bloom)
+            rss_used = _rss_kib() - rss_before
+
+            print(f"target FPR {fp_rate}:")
+            print(f"  file       {built['bytes'] / 2 ** 20:7.2f} MiB, {built['hashes']} hashes, built in {build_seconds:.1f}s")
+            print(f"  resident   {rss_open:7d} KiB after open, {rss_used} KiB after lookups")
+            print(f"  lookup     {member_us:7.2f} us member, {stranger_us:.2f} us non-member")
+            print(f"  observed   FPR {false_positives / len(strangers):.5f} "
+                  f"(expected {built['expected_fp_rate']:.5f}), {missing} members missed")
+            bloom.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image optimization pipeline
+Generates synthetic camera-sized JPEGs with EXIF, then reports cold (encode)
+and warm (derivative cache) throughput for each batch size and worker count.
+
+Usage: python benchmarks/bench_image_optimizer.py [batch sizes, e.g. 100,1000] [workers, e.g. 1,4]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+from lib.images import ImageOptimizer, DISPLAY_SIZES
+
+PHOTO_SIZE = (4032, 3024)  # 12 MP phone camera
+
+def _make_photos(directory: str, count: int, rng: random.Random) -> list:
+    """Distinct JPEGs with photo-like content and GPS/orientation EXIF"""
+    base = Image.effect_noise(PHOTO_SIZE, 64).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90
+    exif[0x010F] = "BenchCam"
+    paths = []
+    for i in range(count):
+        photo = base.copy()
+        draw = ImageDraw.Draw(photo)
+        for _ in range(12):
+            x, y = rng.randrange(PHOTO_SIZE[0]), rng.randrange(PHOTO_SIZE[1])
+            draw.ellipse((x, y, x + 600, y + 400), fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = os.path.join(directory, f"photo_{i:04d}.jpg")
+        photo.save(path, "JPEG", quality=92, exif=exif)
+        paths.append(path)
+    return paths
+
+def run(batch_sizes=(100, 1000), worker_counts=(1, os.cpu_count() or 1)):
+    logging.disable(logging.INFO)
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        photos = _make_photos(workdir, max(batch_sizes), rng)
+        source_mb = sum(os.path.getsize(path) for path in photos) / 1024 / 1024
+        print(f"generated {len(photos)} photos ({source_mb:.0f} MiB) in {time.perf_counter() - start:.1f}s")
+
+        for workers in worker_counts:
+            for batch_size in batch_sizes:
+                optimizer = ImageOptimizer(cache_dir=os.path.join(workdir, f"cache_{workers}_{batch_size}"),
+                                           max_workers=workers)
+                batch = photos[:batch_size]
+                for label in ("cold", "warm"):
+                    start = time.perf_counter()
+                    results = optimizer.optimize(batch, max_size=DISPLAY_SIZES["display"])
+                    elapsed = time.perf_counter() - start
+                    failed = sum(1 for result in results if result["error"])
+                    ratio = (sum(r["output_bytes"] for r in results) / sum(r["input_bytes"] for r in results))
+                    print(f"workers {workers:<2} batch {batch_size:<5} {label}:  {elapsed:7.2f}s   "
+                          f"{batch_size / elapsed:8.1f} photos/s   output {ratio:.1%} of input   "
+                          f"failed {failed}")
+                optimizer.shutdown()
+
+if __name__ == "__main__":
+    sizes = tuple(int(n) for n in sys.argv[1].split(",")) if len(sys.argv) > 1 else (100, 1000)
+    workers = tuple(int(n) for n in sys.argv[2].split(",")) if len(sys.argv) > 2 else (1, os.cpu_count() or 1)
+    run(sizes, workers)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark SecureDataManager key rotation
+Measures background re-wrap throughput and how much foreground
+load_application latency degrades while a rotation is running.
+
+Usage: python benchmarks/bench_key_rotation.py [record_count]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.secure_data_manager import SecureDataManager
+from bench_secure_data_manager import sample_application
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _measure_loads(manager, app_ids, until=None, count=2000):
+    """Time random foreground loads, either `count` of them or until `until()` is true"""
+    latencies = []
+    while (until is None and len(latencies) < count) or (until is not None and not until()):
+        start = time.perf_counter()
+        manager.load_application(random.choice(app_ids))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def _report(label, latencies):
+    print(f"{label:<22} p50 {statistics.median(latencies):6.3f} ms   "
+          f"p95 {_percentile(latencies, 0.95):6.3f} ms   "
+          f"p99 {_percentile(latencies, 0.99):6.3f} ms   ({len(latencies)} loads)")
+
+def run(record_count: int = 5000):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        manager = SecureDataManager(
+            data_dir=os.path.join(workdir, "data"),
+            secrets_dir=os.path.join(workdir, "secrets")
+        )
+        app_ids = [manager.save_application(sample_application(i)) for i in range(record_count)]
+
+        baseline = _measure_loads(manager, app_ids)
+
+        manager.rotate_encryption_key(background=True)
+        during = _measure_loads(manager, app_ids, until=lambda: not manager._rotation_thread.is_alive())
+        state = manager.get_rotation_status()
+
+    print(f"records:               {record_count}")
+    print(f"re-wrapped:            {state['rewrapped']} in {state['duration_seconds']:.2f}s "
+          f"({state['rewrapped'] / state['duration_seconds']:,.0f} records/s incl. throttling)")
+    _report("foreground, idle:", baseline)
+    _report("foreground, rotating:", during)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark a login burst against unrelated reruns
+Starts a burst of concurrent password checks, one thread per login as
+Streamlit would, while a separate thread keeps timing a fixed chunk of
+pure-Python work standing in for another session's rerun. Compares bcrypt
+on the calling threads with the bounded hashing pool.
+
+Usage: python benchmarks/bench_password_hashing.py [logins, default 16] [bcrypt cost, default 12]
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import statistics
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.password_hashing import PasswordHasher
+
+RERUN_WORK = 200000
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _rerun():
+    total = 0
+    for i in range(RERUN_WORK):
+        total += i % 7
+    return total
+
+def _time_reruns(stop):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        _rerun()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def run_case(label, verify, logins):
+    stop = threading.Event()
+    rerun_latencies = []
+    rerun_thread = threading.Thread(target=lambda: rerun_latencies.extend(_time_reruns(stop)))
+    login_latencies = []
+    lock = threading.Lock()
+
+    def login():
+        start = time.perf_counter()
+        verify()
+        with lock:
+            login_latencies.append((time.perf_counter() - start) * 1000)
+
+    rerun_thread.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    burst = time.perf_counter() - start
+    stop.set()
+    rerun_thread.join()
+
+    login_latencies.sort()
+    print(f"{label:<14} burst {burst:6.2f}s   login p50 {statistics.median(login_latencies):7.0f} ms   "
+          f"max {login_latencies[-1]:7.0f} ms   rerun p50 {statistics.median(rerun_latencies):7.1f} ms   "
+          f"p95 {_percentile(rerun_latencies, 0.95):7.1f} ms   "
+          f"max {max(rerun_latencies):7.1f} ms")
+
+def run(logins: int = 16, rounds: int = 12):
+    logging.disable(logging.INFO)
+    hashed = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(rounds))
+    baseline_stop = threading.Event()
+    threading.Timer(1.0, baseline_stop.set).start()
+    idle = _time_reruns(baseline_stop)
+    print(f"{logins} logins at cost {rounds}, {os.cpu_count()} CPUs; idle rerun p50 {statistics.median(idle):.1f} ms")
+
+    run_case("inline", lambda: bcrypt.checkpw(b"correct horse", hashed), logins)
+    hasher = PasswordHasher(rounds=rounds)
+    run_case(f"pool ({hasher.max_workers} wkr)", lambda: hasher.verify("correct horse", hashed.decode()), logins)
+    print(f"pool status: {hasher.status()}")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    cost = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    run(count, cost)
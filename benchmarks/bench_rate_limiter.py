@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared rate limiter under contention
+Runs 1, 4 and 8 worker processes, each with several threads calling
+RateLimiter.check in a loop against one shared SQLite file, once with every
+caller on the same hot bucket and once spread over many users, and reports
+checks per second and per-check latency. Finishes with a garbage
+collection pass over expired buckets.
+
+Usage: python benchmarks/bench_rate_limiter.py [seconds per run] [workers, e.g. 1,4,8]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+THREADS_PER_WORKER = 4
+USERS = 10000
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def _worker(db_path, hot, duration, barrier, results):
+    import threading
+    logging.disable(logging.WARNING)
+    from lib.rate_limiter import RateLimiter, RateLimit
+
+    # Generous limits so checks take the write path
+    limiter = RateLimiter(db_path, limits={'view': RateLimit(10 ** 9)})
+    latencies = []
+    lock = threading.Lock()
+
+    def loop():
+        local = []
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            user = "hot-user" if hot else f"user-{random.randrange(USERS)}"
+            start = time.perf_counter()
+            limiter.check('view', user_id=user, ip_address="10.0.0.1" if hot else f"10.0.{random.randrange(256)}.1")
+            local.append((time.perf_counter() - start) * 1e6)
+        with lock:
+            latencies.extend(local)
+
+    barrier.wait()
+    threads = [threading.Thread(target=loop) for _ in range(THREADS_PER_WORKER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(latencies)
+
+def run_case(workers, hot, duration, workdir):
+    context = multiprocessing.get_context("spawn")
+    db_path = os.path.join(workdir, f"limits_{workers}_{int(hot)}.sqlite3")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(db_path, hot, duration, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    latencies = [latency for _ in processes for latency in results.get()]
+    for process in processes:
+        process.join()
+
+    print(f"{'hot key' if hot else 'spread':<8} workers {workers} x {THREADS_PER_WORKER} threads: "
+          f"{len(latencies) / duration:8.0f} checks/s   p50 {statistics.median(latencies):7.1f} us   "
+          f"p99 {_percentile(latencies, 0.99):8.1f} us")
+    return db_path
+
+def run_gc(db_path):
+    from lib.rate_limiter import SQLiteBuckets, GC_BATCH
+    store = SQLiteBuckets(db_path)
+    before = store.count()
+    start = time.perf_counter()
+    collected = 0
+    while True:
+        batch = store.collect(time.time() + 10 ** 10)
+        collected += batch
+        if batch < GC_BATCH:
+            break
+    print(f"gc: {collected} of {before} buckets expired and removed in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def run(duration: float = 5.0, worker_counts=(1, 4, 8)):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = None
+        for workers in worker_counts:
+            for hot in (True, False):
+                db_path = run_case(workers, hot, duration, workdir)
+        run_gc(db_path)
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    counts = tuple(int(n) for n in sys.argv[2].split(",")) if len(sys.argv) > 2 else (1, 4, 8)
+    run(seconds, counts)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark whole-record sanitization
+Builds a complete comprehensive application (every field of the 12-step
+form, free-text answers of realistic length) and compares sanitizing it
+field by field with the original sanitize_input pipeline (bleach plus every
+regex, compiled per call) and with today's sanitize_input, against one
+sanitize_record call. Before timing, free-text output is checked against the
+original pipeline on the application and on random markup-heavy strings.
+
+Usage: python benchmarks/bench_sanitization.py [iterations, default 2000]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import logging
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bleach
+
+from lib.security import security
+from lib.sanitization import sanitize_record, sanitize_text, COMPREHENSIVE_APPLICATION_SCHEMA
+from bench_secure_data_manager import sample_application
+
+def full_application(index: int = 0) -> dict:
+    """Every field of the comprehensive form, filled in"""
+    record = sample_application(index)
+    free_text = record["experience"]
+    samples = {
+        'text': free_text + " Looking forward to hearing from you & your team.",
+        'line': "Chicago, IL",
+        'email': record["email"],
+        'phone': "+1 (312) 555-0142",
+        'int': record["age"],
+        'bool': True,
+        'date': str(date(2025, 3, 1)),
+        'choice': "Occasionally",
+        'choices': ["Weekends", "Evenings", "Overnight"],
+    }
+    application = {field: samples[spec] for field, spec in COMPREHENSIVE_APPLICATION_SCHEMA.items()}
+    application.update(full_name=record["full_name"], occupation=record["occupation"])
+    return application
+
+def original_sanitize_input(user_input: str) -> str:
+    """SecurityManager.sanitize_input as it was before sanitize_text"""
+    if not user_input:
+        return ""
+    sanitized = bleach.clean(user_input, tags=[], attributes={}, strip=True)
+    sql_patterns = [
+        r'(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)',
+        r'(\b(OR|AND)\s+\d+\s*=\s*\d+)',
+        r'(\b(OR|AND)\s+\w+\s*=\s*\w+)',
+        r'(\bUNION\s+SELECT\b)',
+        r'(\bDROP\s+TABLE\b)',
+        r'(\bDELETE\s+FROM\b)',
+        r'(\bINSERT\s+INTO\b)',
+        r'(\bUPDATE\s+SET\b)',
+    ]
+    for pattern in sql_patterns:
+        sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
+    script_patterns = [
+        r'<script[^>]*>.*?</script>',
+        r'javascript:',
+        r'on\w+\s*=',
+        r'<iframe[^>]*>.*?</iframe>',
+        r'<object[^>]*>.*?</object>',
+        r'<embed[^>]*>.*?</embed>',
+    ]
+    for pattern in script_patterns:
+        sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE | re.DOTALL)
+    return sanitized.strip()
+
+def per_field(application: dict, sanitize=security.sanitize_input) -> dict:
+    cleaned = {}
+    for field, value in application.items():
+        if isinstance(value, list):
+            cleaned[field] = [sanitize(item) for item in value]
+        elif isinstance(value, str):
+            cleaned[field] = sanitize(value)
+        else:
+            cleaned[field] = value
+    return cleaned
+
+def check_equivalence(samples: int = 20000):
+    """sanitize_text must match the original pipeline on hostile input too"""
+    pieces = ["SELECT", "select", "union", " or 1=1", " OR a=b", "AND x = y", "<script>alert(1)</script>",
+              "<b>", "</i>", "&amp;", "&", "javascript:", "onclick=", "onload =", "<iframe src=x></iframe>",
+              "\r\n", "\x00", "\x0b", "=", ":", "<", ">", " ", "word", "Drop Table", "é", "\t"]
+    for _ in range(samples):
+        text = "".join(random.choice(pieces) for _ in range(random.randint(0, 12)))
+        assert sanitize_text(text) == original_sanitize_input(text), repr(text)
+
+def _time(func, application, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(application)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def run(iterations: int = 2000):
+    logging.disable(logging.INFO)
+    application = full_application()
+    text_fields = [f for f, spec in COMPREHENSIVE_APPLICATION_SCHEMA.items() if spec == 'text']
+
+    check_equivalence()
+    baseline = per_field(application, original_sanitize_input)
+    batched = sanitize_record(application, COMPREHENSIVE_APPLICATION_SCHEMA)
+    assert all(baseline[f] == batched[f] for f in text_fields), "free-text results differ"
+
+    original_us = _time(lambda app: per_field(app, original_sanitize_input), application, iterations)
+    per_field_us = _time(per_field, application, iterations)
+    record_us = _time(lambda app: sanitize_record(app, COMPREHENSIVE_APPLICATION_SCHEMA), application, iterations)
+    print(f"{len(application)} fields ({len(text_fields)} free text), {iterations} iterations")
+    print(f"original per-field pipeline: {original_us:8.1f} us/application")
+    print(f"per-field sanitize_input:    {per_field_us:8.1f} us/application ({original_us / per_field_us:.1f}x)")
+    print(f"sanitize_record:             {record_us:8.1f} us/application ({original_us / record_us:.1f}x)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the application full-text search index
+Indexes synthetic applications and reports query latency percentiles for
+term, prefix, phrase, multi-term and status-filtered queries.
+
+Usage: python benchmarks/bench_search_index.py [record_count]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.search import ApplicationSearchIndex
+
+FIRST_NAMES = ["Sarah", "Emma", "Jessica", "Ashley", "Olivia", "Mia", "Chloe", "Zoe", "Hannah", "Grace"]
+LAST_NAMES = ["Johnson", "Davis", "Wilson", "Brown", "Garcia", "Miller", "Martinez", "Lopez", "Clark", "Young"]
+CITIES = ["New York, NY", "Los Angeles, CA", "Chicago, IL", "Miami, FL", "Austin, TX", "Seattle, WA", "Denver, CO"]
+OCCUPATIONS = ["Nurse", "Barista", "Graphic Designer", "Teacher", "Software Engineer", "Bartender", "Photographer"]
+VOCABULARY = ("structure routine honest communication weekends evenings travel content creation domestic "
+              "service training protocol boundaries respect aftercare schedule flexible remote hospitality "
+              "photography fitness cooking organisation discretion loyalty growth curiosity").split()
+STATUSES = ["pending", "approved", "rejected"]
+
+QUERIES = {
+    "term": "hospitality",
+    "prefix": "photo*",
+    "phrase": '"honest communication"',
+    "multi-term": "nurse chicago weekends",
+    "name": "Garcia",
+}
+
+def synthetic_application(rng: random.Random) -> dict:
+    def free_text(words):
+        return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    return {
+        "personal_info": {
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "location": rng.choice(CITIES),
+            "occupation": rng.choice(OCCUPATIONS),
+        },
+        "experience": {"interests": free_text(40), "limits": free_text(25)},
+        "additional": {"expectations": free_text(40), "anything_else": free_text(20)},
+    }
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run(record_count: int = 100000, repeats: int = 200):
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    index = ApplicationSearchIndex()
+
+    start = time.perf_counter()
+    index.index_applications(
+        (f"APP-{i:06d}", synthetic_application(rng), rng.choice(STATUSES)) for i in range(record_count)
+    )
+    build_elapsed = time.perf_counter() - start
+    print(f"indexed {index.count()} applications in {build_elapsed:.1f}s "
+          f"({record_count / build_elapsed:,.0f} docs/s)")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.index_application(f"APP-{i:06d}", synthetic_application(rng), "pending")
+    print(f"incremental re-index: {(time.perf_counter() - start) * 1000 / 1000:.3f} ms/application")
+
+    cases = [(label, query, None) for label, query in QUERIES.items()]
+    cases.append(("term + status", "hospitality", "approved"))
+
+    for label, query, status in cases:
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = index.search(query, limit=20, status=status)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<14} {query:<26} top-{len(results):<3} "
+              f"p50 {statistics.median(latencies):7.2f} ms   p95 {_percentile(latencies, 0.95):7.2f} ms")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark SecureDataManager save/load throughput
+Reports records per second for saving, loading and listing applications so
+changes to the storage format can be checked against listing performance.
+
+Usage: python benchmarks/bench_secure_data_manager.py [record_count]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.secure_data_manager import SecureDataManager
+
+def sample_application(index: int, free_text_size: int = 400) -> dict:
+    """Build an application shaped like a comprehensive form submission"""
+    sentence = "I enjoy structure, clear expectations and honest communication. "
+    filler = (sentence * (free_text_size // len(sentence) + 1))[:free_text_size]
+    return {
+        "full_name": f"Applicant {index}",
+        "email": f"applicant{index}@example.com",
+        "age": 21 + index % 30,
+        "location": ["New York, NY", "Chicago, IL", "Miami, FL"][index % 3],
+        "occupation": "Hospitality",
+        "experience": filler,
+        "interests": filler,
+        "limits": filler,
+        "availability": "Weekends and evenings",
+        "additional_info": filler
+    }
+
+def run(record_count: int = 1000):
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as workdir:
+        manager = SecureDataManager(
+            data_dir=os.path.join(workdir, "data"),
+            secrets_dir=os.path.join(workdir, "secrets")
+        )
+        applications = [sample_application(i) for i in range(record_count)]
+
+        start = time.perf_counter()
+        app_ids = [manager.save_application(app) for app in applications]
+        save_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for app_id in app_ids:
+            manager.load_application(app_id)
+        load_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        listed = manager.get_all_applications()
+        list_elapsed = time.perf_counter() - start
+
+        large = sample_application(0, free_text_size=2 * 1024 * 1024)
+        start = time.perf_counter()
+        large_id = manager.save_application(large)
+        manager.load_application(large_id)
+        large_elapsed = time.perf_counter() - start
+
+    print(f"records:         {record_count}")
+    print(f"save:            {record_count / save_elapsed:,.0f} records/s")
+    print(f"load:            {record_count / load_elapsed:,.0f} records/s")
+    print(f"list ({len(listed)}):     {list_elapsed * 1000:,.1f} ms")
+    print(f"large record RT: {large_elapsed * 1000:,.1f} ms (streamed body)")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cross-process shared cache
+Runs 1, 4 and 8 worker processes that each call a swr_cache getter in a
+loop, once with per-process caching and once with the shared SQLite cache,
+and reports how often the backend was hit plus per-worker memory and call
+latency.
+
+Usage: python benchmarks/bench_shared_cache.py [seconds per run] [workers, e.g. 1,4,8]
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TTL = 2.0
+FETCH_LATENCY = 0.2  # Simulated Supabase round trip
+PAYLOAD_ROWS = 20000
+RENDER_PAUSE = 0.01
+
+def _rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def _worker(mode, cache_path, duration, fetches, barrier, results):
+    if mode == "shared":
+        os.environ["SHARED_CACHE_PATH"] = cache_path
+    logging.disable(logging.WARNING)
+    from lib.performance import swr_cache
+
+    @swr_cache("bench_applications", ttl=TTL, max_staleness=TTL * 5, shared=(mode == "shared"))
+    def fetch_applications():
+        with fetches.get_lock():
+            fetches.value += 1
+        time.sleep(FETCH_LATENCY)
+        return [{"id": i, "status": "pending", "name": f"Applicant {i}", "notes": "x" * 80}
+                for i in range(PAYLOAD_ROWS)]
+
+    baseline = _rss_mib()
+    barrier.wait()
+    latencies = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        start = time.perf_counter()
+        rows = fetch_applications()
+        latencies.append((time.perf_counter() - start) * 1000)
+        del rows
+        time.sleep(RENDER_PAUSE)
+    latencies.sort()
+    results.put({
+        "calls": len(latencies),
+        "p50": statistics.median(latencies),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "rss_growth": _rss_mib() - baseline
+    })
+
+def run_case(mode, workers, duration, workdir):
+    context = multiprocessing.get_context("spawn")
+    fetches = context.Value("i", 0)
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    cache_path = os.path.join(workdir, f"shared_{workers}.sqlite3")
+    processes = [context.Process(target=_worker, args=(mode, cache_path, duration, fetches, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(f"{mode:<7} workers {workers}:  backend fetches {fetches.value:4d}   "
+          f"calls {sum(r['calls'] for r in reports):6d}   "
+          f"p50 {statistics.median(r['p50'] for r in reports):6.2f} ms   "
+          f"p99 {max(r['p99'] for r in reports):7.2f} ms   "
+          f"RSS growth {statistics.mean(r['rss_growth'] for r in reports):6.1f} MiB/worker "
+          f"({sum(r['rss_growth'] for r in reports):6.1f} MiB total)")
+
+def run(duration: float = 10.0, worker_counts=(1, 4, 8)):
+    print(f"ttl {TTL}s, fetch {FETCH_LATENCY * 1000:.0f} ms, {PAYLOAD_ROWS} rows, {duration}s per run")
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in worker_counts:
+            for mode in ("local", "shared"):
+                run_case(mode, workers, duration, workdir)
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    counts = tuple(int(n) for n in sys.argv[2].split(",")) if len(sys.argv) > 2 else (1, 4, 8)
+    run(seconds, counts)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark AdvancedMonitoring's ring-buffer series
+Fills a week of 30-second system samples, the way the monitoring loop
+records them, and compares the old storage (a list of dicts with ISO
+timestamps, trimmed by copying) against the NumPy ring buffers: memory
+held, append cost, reading the last 20 samples and the last hour, and the
+5-minute error-rate check that track_error runs on every error.
+
+Usage: python benchmarks/bench_timeseries.py [errors, default 1000]
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advanced_monitoring import AdvancedMonitoring, WEEK_OF_SAMPLES, MONITOR_INTERVAL
+
+def _samples(count: int):
+    rng = random.Random(1)
+    start = time.time() - count * MONITOR_INTERVAL
+    for i in range(count):
+        yield {
+            'timestamp': start + i * MONITOR_INTERVAL,
+            'cpu_usage': rng.uniform(0, 100), 'memory_usage': rng.uniform(20, 90),
+            'memory_available': rng.randrange(1 << 30, 1 << 34), 'disk_usage': rng.uniform(40, 60),
+            'disk_free': rng.randrange(1 << 34, 1 << 36), 'process_count': rng.randrange(100, 400),
+            'load_average': (rng.random(), rng.random(), rng.random())
+        }
+
+def _timed(func, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def old_storage(samples, errors: int):
+    """The list-of-dicts storage AdvancedMonitoring used to keep"""
+    tracemalloc.start()
+    history = []
+    start = time.perf_counter()
+    for sample in samples:
+        history.append({**sample, 'timestamp': datetime.fromtimestamp(sample['timestamp']).isoformat(),
+                        'load_average': list(sample['load_average'])})
+    append_seconds = (time.perf_counter() - start) / len(history)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    hour_ago = datetime.now() - timedelta(hours=1)
+    error_log = [{'timestamp': datetime.now().isoformat(), 'error_type': 'ValueError',
+                  'error_message': 'bad input', 'context': ''} for _ in range(errors)]
+    return {
+        'bytes': held,
+        'append_us': append_seconds * 1e6,
+        'last_20_us': _timed(lambda: [m['cpu_usage'] for m in history[-20:]], 1000) * 1e6,
+        'last_hour_us': _timed(lambda: [m for m in history
+                                         if datetime.fromisoformat(m['timestamp']) > hour_ago], 5) * 1e6,
+        'trim_us': _timed(lambda: history[-1000:], 100) * 1e6,
+        'error_rate_us': _timed(lambda: [e for e in error_log if datetime.fromisoformat(e['timestamp'])
+                                         > datetime.now() - timedelta(minutes=5)], 20) * 1e6,
+    }
+
+def ring_storage(samples, errors: int):
+    monitoring = AdvancedMonitoring()
+    series = monitoring.metrics['system_health']
+    start = time.perf_counter()
+    for sample in samples:
+        monitoring._record_system_metrics(sample)
+    append_seconds = (time.perf_counter() - start) / len(series)
+
+    for _ in range(errors):
+        monitoring.metrics['errors'].append(error_type='ValueError', error_message='bad input', context='')
+    errors_series = monitoring.metrics['errors']
+    hour_ago = time.time() - 3600
+    return {
+        'bytes': series.nbytes,
+        'append_us': append_seconds * 1e6,
+        'last_20_us': _timed(lambda: series.window(last=20)['cpu_usage'], 1000) * 1e6,
+        'last_hour_us': _timed(lambda: series.window(since=hour_ago), 1000) * 1e6,
+        'trim_us': 0.0,
+        'error_rate_us': _timed(lambda: errors_series.count(since=time.time() - 300), 1000) * 1e6,
+        'report': monitoring.memory_report(),
+    }
+
+def run(errors: int = 1000):
+    logging.disable(logging.WARNING)
+    samples = list(_samples(WEEK_OF_SAMPLES))
+    print(f"A week of {MONITOR_INTERVAL}s samples: {len(samples):,} system samples, {errors} errors\n")
+
+    old = old_storage(samples, errors)
+    ring = ring_storage(samples, errors)
+    print(f"{'':24s}{'list of dicts':>16s}{'ring buffer':>16s}")
+    print(f"{'memory (MiB)':24s}{old['bytes'] / 2 ** 20:16.2f}{ring['bytes'] / 2 ** 20:16.2f}")
+    for key, label in (('append_us', 'append (us)'), ('last_20_us', 'last 20 samples (us)'),
+                       ('last_hour_us', 'last hour (us)'), ('trim_us', 'trim per loop (us)'),
+                       ('error_rate_us', '5-min error rate (us)')):
+        print(f"{label:24s}{old[key]:16.2f}{ring[key]:16.2f}")
+
+    print("\nSeries memory:")
+    for name, report in ring['report'].items():
+        print(f"  {name:14s} {report['capacity']:7,d} samples  {report['bytes'] / 1024:9.1f} KiB  "
+              f"{report['bytes_per_sample']:6.0f} B/sample")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Build the breached-password filter
+Reads a password list, one entry per line: either plain passwords (e.g. a
+common-passwords list) or the SHA1:count lines of the Have I Been Pwned
+download, and writes the memory-mapped Bloom filter that
+check_password_strength consults. Deploy the file at
+data/breached_passwords.bloom or point BREACHED_PASSWORDS_FILTER at it.
+
+Usage: python benchmarks/build_breach_filter.py <list> [more lists...] [--out path] [--fp-rate 0.001]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.breach_filter import build_filter, BREACH_FILTER_PATH_ENV, DEFAULT_FILTER_PATH, DEFAULT_FP_RATE
+
+def _count_lines(paths):
+    total = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                total += block.count(b"\n")
+    return total + len(paths)
+
+def _lines(paths):
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+def run(paths, out_path: str, fp_rate: float):
+    start = time.perf_counter()
+    # Counting first sizes the filter without holding the list in memory
+    count = _count_lines(paths)
+    result = build_filter(_lines(paths), out_path, count, fp_rate)
+    elapsed = time.perf_counter() - start
+
+    print(f"entries:      {result['items']:,}")
+    print(f"size:         {result['bytes'] / 2 ** 20:.2f} MiB ({result['bits'] / max(1, result['items']):.1f} bits/entry)")
+    print(f"hashes:       {result['hashes']}")
+    print(f"fill ratio:   {result['fill_ratio']:.3f}")
+    print(f"expected FPR: {result['expected_fp_rate']:.5f} (target {fp_rate})")
+    print(f"built in:     {elapsed:.1f}s")
+    print(f"\n{BREACH_FILTER_PATH_ENV}={out_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the breached-password Bloom filter")
+    parser.add_argument("lists", nargs="+", help="password or SHA1:count lists, one entry per line")
+    parser.add_argument("--out", default=DEFAULT_FILTER_PATH)
+    parser.add_argument("--fp-rate", type=float, default=DEFAULT_FP_RATE)
+    args = parser.parse_args()
+    run(args.lists, args.out, args.fp_rate)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Choose the bcrypt cost for this hardware
+Times bcrypt at increasing cost factors and prints the highest one whose
+median hash stays within the target latency, as the BCRYPT_ROUNDS setting
+to deploy. Run it on the production machine type, not a laptop.
+
+Usage: python benchmarks/calibrate_bcrypt.py [target ms, default 250] [samples, default 3]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.password_hashing import calibrate_cost, BCRYPT_ROUNDS_ENV
+
+def run(target_ms: float = 250.0, samples: int = 3):
+    result = calibrate_cost(target_ms, samples=samples)
+    for rounds, median in result["timings_ms"]:
+        marker = "  <- chosen" if rounds == result["rounds"] else ""
+        print(f"cost {rounds:2d}: {median:8.1f} ms{marker}")
+    print(f"\n{BCRYPT_ROUNDS_ENV}={result['rounds']}")
+
+if __name__ == "__main__":
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    run(target, count)
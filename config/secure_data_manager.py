@@ -2,28 +2,94 @@
 Secure Data Manager
 Handles all sensitive data with proper encryption and access controls.
 This file should NEVER be committed to GitHub with real data.
+
+Record bodies are protected with AES-256-GCM envelope encryption: every record
+gets its own random data key, which is wrapped with the key-encryption key
+held in the key ring. Integrity comes from the GCM tag, so a tampered or
+swapped record fails to decrypt instead of needing a re-hash.
+
+The key ring (``secrets/keyring.json``) keeps every key-encryption key by ID and
+each envelope records the ID it was wrapped with, so old records stay readable
+after a rotation while a background job re-wraps their data keys in batches.
+
+Applications are stored as a small JSON header (id, timestamp, status, reviewer
+and the key envelope) plus a separately stored encrypted body, so listings never
+read or decrypt the long free-text answers.
 """
 
 import os
+import io
 import json
+import base64
 import hashlib
 import secrets
-from typing import Dict, Any, Optional
+import threading
+import time
+import itertools
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, BinaryIO, Iterable, Iterator
 from datetime import datetime, timedelta
 import logging
 
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from lib.registry import registry
+
+try:
+    import fcntl
+except ImportError:  # Windows: records are only locked within the process
+    fcntl = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ENCRYPTION_ALGORITHM = "AES-256-GCM"
+NONCE_SIZE = 12  # 96-bit nonces, as recommended for GCM
+STREAM_THRESHOLD = 256 * 1024  # Bodies above this size are streamed to a side file
+STREAM_CHUNK_SIZE = 64 * 1024
+APPLICATION_HEADER_FIELDS = ("application_id", "timestamp", "status", "reviewed_by", "reviewed_at")
+LEGACY_KEY_ID = "k1"  # ID given to the original secrets/encryption.key
+ROTATION_BATCH_SIZE = 50
+ROTATION_BATCH_PAUSE = 0.05  # Seconds to yield between batches during re-wrap
+
+def _b64encode(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text.encode("ascii"))
+
+def _json_chunks(payload: Any) -> Iterator[bytes]:
+    """Encode payload as JSON in chunks of about STREAM_CHUNK_SIZE bytes"""
+    pieces, size = [], 0
+    for piece in json.JSONEncoder().iterencode(payload):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(pieces).encode("utf-8")
+            pieces, size = [], 0
+    if pieces:
+        yield "".join(pieces).encode("utf-8")
+
 class SecureDataManager:
     """Manages all sensitive data with encryption and access controls"""
     
-    def __init__(self):
-        self.data_dir = "data"
-        self.secrets_dir = "secrets"
-        self.encryption_key = self._get_or_create_encryption_key()
+    def __init__(self, data_dir: str = "data", secrets_dir: str = "secrets", search_index=None):
+        self.data_dir = data_dir
+        self.secrets_dir = secrets_dir
+        # Optional lib.search.ApplicationSearchIndex kept in sync on save/update
+        self.search_index = search_index
         self._ensure_directories()
+        self._record_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        self.encryption_key = self._get_or_create_encryption_key()
+        with self._locked():
+            self._set_keyring(self._load_keyring())
+        self._rotation_thread = None
+        self._rotation_stop = threading.Event()
     
     def _ensure_directories(self):
         """Create necessary directories if they don't exist"""
@@ -46,27 +112,207 @@ class SecureDataManager:
             logger.info("Generated new encryption key")
             return key
     
-    def _encrypt_data(self, data: str) -> str:
-        """Simple encryption for sensitive data"""
-        # In production, use proper encryption like Fernet
+    def _load_keyring(self) -> Dict[str, Any]:
+        """Load the key ring, seeding it with the original encryption key"""
+        keyring_file = os.path.join(self.secrets_dir, "keyring.json")
+        
+        if os.path.exists(keyring_file):
+            with open(keyring_file, 'r') as f:
+                return json.load(f)
+        
+        keyring = {
+            "active": LEGACY_KEY_ID,
+            "keys": {
+                LEGACY_KEY_ID: {"key": self.encryption_key, "created_at": datetime.now().isoformat()}
+            }
+        }
+        self._save_json(keyring_file, keyring)
+        return keyring
+    
+    def _keyring_stamp(self):
+        try:
+            stat = os.stat(os.path.join(self.secrets_dir, "keyring.json"))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+    
+    def _set_keyring(self, keyring: Dict[str, Any]):
+        self._keyring = keyring
+        self._keyring_version = self._keyring_stamp()
+        # Cache the key-encryption key ciphers so wrapping/unwrapping data keys
+        # does not re-parse a key for every record
+        self._keks = {key_id: AESGCM(bytes.fromhex(key["key"])) for key_id, key in keyring["keys"].items()}
+    
+    def _refresh_keyring(self, force: bool = False):
+        """Pick up keys rotated or retired by another worker process"""
+        if force or self._keyring_stamp() != self._keyring_version:
+            with self._locked():
+                self._set_keyring(self._load_keyring())
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the record lock across threads and, via a lock file, across processes"""
+        with self._record_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(os.path.join(self.secrets_dir, "records.lock"), 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+    
+    def _save_json(self, file_path: str, payload: Dict[str, Any]):
+        """Write JSON atomically so concurrent readers never see a partial file"""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, file_path)
+    
+    @property
+    def active_key_id(self) -> str:
+        return self._keyring["active"]
+    
+    def _wrap_data_key(self, data_key: bytes, aad: bytes) -> Dict[str, str]:
+        """Encrypt a per-record data key with the active key-encryption key"""
+        self._refresh_keyring()
+        key_id = self.active_key_id
+        nonce = os.urandom(NONCE_SIZE)
+        return {
+            "key_id": key_id,
+            "wrapped_key": _b64encode(nonce + self._keks[key_id].encrypt(nonce, data_key, aad))
+        }
+    
+    def _unwrap_data_key(self, envelope: Dict[str, str], aad: bytes) -> bytes:
+        """Decrypt a per-record data key with the key it was wrapped under"""
+        key_id = envelope.get("key_id", LEGACY_KEY_ID)
+        if key_id not in self._keks:
+            # Another worker may have rotated since the ring was loaded
+            self._refresh_keyring(force=True)
+        kek = self._keks[key_id]
+        raw = _b64decode(envelope["wrapped_key"])
+        return kek.decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], aad)
+    
+    def _encrypt_data(self, data: str, aad: bytes) -> Dict[str, str]:
+        """Encrypt data under a fresh data key and return the envelope"""
+        data_key = AESGCM.generate_key(bit_length=256)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = AESGCM(data_key).encrypt(nonce, data.encode("utf-8"), aad)
+        return {
+            "alg": ENCRYPTION_ALGORITHM,
+            **self._wrap_data_key(data_key, aad),
+            "nonce": _b64encode(nonce),
+            "ciphertext": _b64encode(ciphertext)
+        }
+    
+    def _decrypt_data(self, envelope: Dict[str, str], aad: bytes) -> str:
+        """Decrypt an envelope produced by _encrypt_data (raises InvalidTag on tampering)"""
+        data_key = self._unwrap_data_key(envelope, aad)
+        plaintext = AESGCM(data_key).decrypt(_b64decode(envelope["nonce"]), _b64decode(envelope["ciphertext"]), aad)
+        return plaintext.decode("utf-8")
+    
+    def _encrypt_stream(self, chunks: Iterable[bytes], target: BinaryIO, aad: bytes) -> Dict[str, str]:
+        """Encrypt a large body chunk by chunk into target; the GCM tag is kept in the envelope"""
+        data_key = AESGCM.generate_key(bit_length=256)
+        nonce = os.urandom(NONCE_SIZE)
+        encryptor = Cipher(algorithms.AES(data_key), modes.GCM(nonce)).encryptor()
+        encryptor.authenticate_additional_data(aad)
+        
+        for chunk in chunks:
+            target.write(encryptor.update(chunk))
+        target.write(encryptor.finalize())
+        
+        return {
+            "alg": ENCRYPTION_ALGORITHM,
+            **self._wrap_data_key(data_key, aad),
+            "nonce": _b64encode(nonce),
+            "tag": _b64encode(encryptor.tag)
+        }
+    
+    def _decrypt_stream(self, envelope: Dict[str, str], source: BinaryIO, target: BinaryIO, aad: bytes):
+        """Decrypt a streamed body chunk by chunk into target
+        
+        Raises InvalidTag once the end is reached if the body was tampered
+        with; target then holds unauthenticated plaintext and must be discarded.
+        """
+        data_key = self._unwrap_data_key(envelope, aad)
+        decryptor = Cipher(
+            algorithms.AES(data_key),
+            modes.GCM(_b64decode(envelope["nonce"]), _b64decode(envelope["tag"]))
+        ).decryptor()
+        decryptor.authenticate_additional_data(aad)
+        
+        for chunk in iter(lambda: source.read(STREAM_CHUNK_SIZE), b""):
+            target.write(decryptor.update(chunk))
+        target.write(decryptor.finalize())
+    
+    def _legacy_checksum(self, data: str) -> str:
+        """Checksum used by records written before envelope encryption"""
         return hashlib.sha256((data + self.encryption_key).encode()).hexdigest()
     
-    def _decrypt_data(self, encrypted_data: str) -> str:
-        """Simple decryption for sensitive data"""
-        # In production, use proper decryption
-        return encrypted_data  # Simplified for demo
+    def _seal_record(self, record_name: str, payload: Dict[str, Any], detached: bool = False) -> Dict[str, Any]:
+        """Encrypt a record body, streaming it to a side file when detached or large"""
+        aad = record_name.encode("utf-8")
+        body_path = os.path.join(self.data_dir, f"{record_name}.body")
+        chunks = _json_chunks(payload)
+        
+        # Encode only as far as the threshold to decide; the rest goes straight to the side file
+        head = bytearray()
+        if not detached:
+            for chunk in chunks:
+                head += chunk
+                if len(head) > STREAM_THRESHOLD:
+                    break
+            else:
+                if os.path.exists(body_path):
+                    os.remove(body_path)
+                return self._encrypt_data(head.decode("utf-8"), aad)
+        
+        tmp_path = f"{body_path}.tmp"
+        with open(tmp_path, 'wb') as target:
+            envelope = self._encrypt_stream(itertools.chain([bytes(head)], chunks), target, aad)
+        os.replace(tmp_path, body_path)
+        envelope["body_file"] = os.path.basename(body_path)
+        return envelope
+    
+    def _open_record(self, record_name: str, secure_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Decrypt a record body, returning None if authentication fails"""
+        aad = record_name.encode("utf-8")
+        envelope = secure_data.get("encryption")
+        
+        try:
+            if envelope is None:
+                # Legacy plaintext record: fall back to the old checksum check
+                if secure_data.get("checksum") != self._legacy_checksum(json.dumps(secure_data["data"])):
+                    return None
+                return secure_data["data"]
+            
+            if "body_file" in envelope:
+                # The JSON parser needs the whole document, and plaintext never goes to disk,
+                # so the sink is in memory; it is parsed only once the tag verifies
+                plaintext = io.BytesIO()
+                with open(os.path.join(self.data_dir, envelope["body_file"]), 'rb') as source:
+                    self._decrypt_stream(envelope, source, plaintext, aad)
+                return json.loads(plaintext.getvalue())
+            
+            return json.loads(self._decrypt_data(envelope, aad))
+        except (InvalidTag, ValueError, KeyError):
+            return None
     
     def save_sir_preferences(self, preferences: Dict[str, Any]) -> bool:
         """Save Sir's personal preferences securely"""
         try:
-            secure_data = {
-                "timestamp": datetime.now().isoformat(),
-                "data": preferences,
-                "checksum": self._encrypt_data(json.dumps(preferences))
-            }
-            
-            with open(os.path.join(self.data_dir, "sir_preferences.json"), 'w') as f:
-                json.dump(secure_data, f, indent=2)
+            # Sealed under the lock so a key retired by another worker is never used
+            with self._locked():
+                secure_data = {
+                    "timestamp": datetime.now().isoformat(),
+                    "encryption": self._seal_record("sir_preferences", preferences)
+                }
+                self._save_json(os.path.join(self.data_dir, "sir_preferences.json"), secure_data)
             
             logger.info("Sir's preferences saved securely")
             return True
@@ -84,13 +330,13 @@ class SecureDataManager:
             with open(file_path, 'r') as f:
                 secure_data = json.load(f)
             
-            # Verify data integrity
-            expected_checksum = self._encrypt_data(json.dumps(secure_data["data"]))
-            if secure_data["checksum"] != expected_checksum:
+            # Decryption fails if the data was tampered with
+            preferences = self._open_record("sir_preferences", secure_data)
+            if preferences is None:
                 logger.error("Data integrity check failed")
                 return None
             
-            return secure_data["data"]
+            return preferences
         except Exception as e:
             logger.error(f"Failed to load Sir's preferences: {e}")
             return None
@@ -101,20 +347,21 @@ class SecureDataManager:
             # Generate unique application ID
             app_id = f"APP-{datetime.now().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4).upper()}"
             
-            secure_data = {
-                "application_id": app_id,
-                "timestamp": datetime.now().isoformat(),
-                "data": application_data,
-                "checksum": self._encrypt_data(json.dumps(application_data)),
-                "status": "pending",
-                "reviewed_by": None,
-                "reviewed_at": None
-            }
-            
             # Save to secure location
             file_path = os.path.join(self.data_dir, f"application_{app_id}.json")
-            with open(file_path, 'w') as f:
-                json.dump(secure_data, f, indent=2)
+            with self._locked():
+                secure_data = {
+                    "application_id": app_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "encryption": self._seal_record(f"application_{app_id}", application_data, detached=True),
+                    "status": "pending",
+                    "reviewed_by": None,
+                    "reviewed_at": None
+                }
+                self._save_json(file_path, secure_data)
+            
+            if self.search_index is not None:
+                self.search_index.index_application(app_id, application_data, "pending")
             
             logger.info(f"Application {app_id} saved securely")
             return app_id
@@ -122,39 +369,75 @@ class SecureDataManager:
             logger.error(f"Failed to save application: {e}")
             return None
     
-    def load_application(self, app_id: str) -> Optional[Dict[str, Any]]:
-        """Load application data securely"""
+    def _read_application_record(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Read the stored header record for an application"""
+        file_path = os.path.join(self.data_dir, f"application_{app_id}.json")
+        if not os.path.exists(file_path):
+            return None
+        
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    
+    def load_application_header(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Load only the application header (no decryption)"""
         try:
-            file_path = os.path.join(self.data_dir, f"application_{app_id}.json")
-            if not os.path.exists(file_path):
+            secure_data = self._read_application_record(app_id)
+            if secure_data is None:
                 return None
             
-            with open(file_path, 'r') as f:
-                secure_data = json.load(f)
+            return {field: secure_data.get(field) for field in APPLICATION_HEADER_FIELDS}
+        except Exception as e:
+            logger.error(f"Failed to load application header {app_id}: {e}")
+            return None
+    
+    def load_application_body(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Load and decrypt the application answers on demand"""
+        try:
+            secure_data = self._read_application_record(app_id)
+            if secure_data is None:
+                return None
+            
+            # Decryption fails if the data was tampered with
+            application_data = self._open_record(f"application_{app_id}", secure_data)
+            if application_data is None:
+                logger.error("Application data integrity check failed")
+            return application_data
+        except Exception as e:
+            logger.error(f"Failed to load application body {app_id}: {e}")
+            return None
+    
+    def load_application(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Load application header and body securely"""
+        try:
+            secure_data = self._read_application_record(app_id)
+            if secure_data is None:
+                return None
             
-            # Verify data integrity
-            expected_checksum = self._encrypt_data(json.dumps(secure_data["data"]))
-            if secure_data["checksum"] != expected_checksum:
+            # Decryption fails if the data was tampered with
+            application_data = self._open_record(f"application_{app_id}", secure_data)
+            if application_data is None:
                 logger.error("Application data integrity check failed")
                 return None
             
-            return secure_data
+            application = {field: secure_data.get(field) for field in APPLICATION_HEADER_FIELDS}
+            application["data"] = application_data
+            return application
         except Exception as e:
             logger.error(f"Failed to load application {app_id}: {e}")
             return None
     
     def get_all_applications(self) -> list:
-        """Get all applications (admin only)"""
+        """Get all application headers (admin only); use load_application_body for answers"""
         try:
             applications = []
             for filename in os.listdir(self.data_dir):
                 if filename.startswith("application_") and filename.endswith(".json"):
-                    app_id = filename.replace("application_", "").replace(".json", "")
-                    app_data = self.load_application(app_id)
-                    if app_data:
-                        applications.append(app_data)
+                    app_id = filename[len("application_"):-len(".json")]
+                    header = self.load_application_header(app_id)
+                    if header:
+                        applications.append(header)
             
-            return sorted(applications, key=lambda x: x.get("timestamp", ""), reverse=True)
+            return sorted(applications, key=lambda x: x.get("timestamp") or "", reverse=True)
         except Exception as e:
             logger.error(f"Failed to get applications: {e}")
             return []
@@ -166,15 +449,19 @@ class SecureDataManager:
             if not os.path.exists(file_path):
                 return False
             
-            with open(file_path, 'r') as f:
-                secure_data = json.load(f)
+            # Hold the record lock so a key rotation batch can't overwrite the update
+            with self._locked():
+                with open(file_path, 'r') as f:
+                    secure_data = json.load(f)
+                
+                secure_data["status"] = status
+                secure_data["reviewed_by"] = reviewed_by
+                secure_data["reviewed_at"] = datetime.now().isoformat()
+                
+                self._save_json(file_path, secure_data)
             
-            secure_data["status"] = status
-            secure_data["reviewed_by"] = reviewed_by
-            secure_data["reviewed_at"] = datetime.now().isoformat()
-            
-            with open(file_path, 'w') as f:
-                json.dump(secure_data, f, indent=2)
+            if self.search_index is not None:
+                self.search_index.update_status(app_id, status)
             
             logger.info(f"Application {app_id} status updated to {status}")
             return True
@@ -185,14 +472,12 @@ class SecureDataManager:
     def save_innovation_project(self, project_data: Dict[str, Any]) -> bool:
         """Save innovation project data securely"""
         try:
-            secure_data = {
-                "timestamp": datetime.now().isoformat(),
-                "data": project_data,
-                "checksum": self._encrypt_data(json.dumps(project_data))
-            }
-            
-            with open(os.path.join(self.data_dir, "innovation_project.json"), 'w') as f:
-                json.dump(secure_data, f, indent=2)
+            with self._locked():
+                secure_data = {
+                    "timestamp": datetime.now().isoformat(),
+                    "encryption": self._seal_record("innovation_project", project_data)
+                }
+                self._save_json(os.path.join(self.data_dir, "innovation_project.json"), secure_data)
             
             logger.info("Innovation project data saved securely")
             return True
@@ -210,13 +495,13 @@ class SecureDataManager:
             with open(file_path, 'r') as f:
                 secure_data = json.load(f)
             
-            # Verify data integrity
-            expected_checksum = self._encrypt_data(json.dumps(secure_data["data"]))
-            if secure_data["checksum"] != expected_checksum:
+            # Decryption fails if the data was tampered with
+            project_data = self._open_record("innovation_project", secure_data)
+            if project_data is None:
                 logger.error("Innovation project data integrity check failed")
                 return None
             
-            return secure_data["data"]
+            return project_data
         except Exception as e:
             logger.error(f"Failed to load innovation project: {e}")
             return None
@@ -253,6 +538,172 @@ class SecureDataManager:
                 "avg_response_time": "0 days"
             }
     
+    def rotate_encryption_key(self, background: bool = True) -> Optional[str]:
+        """Make a new key-encryption key active and re-wrap existing records
+        
+        Returns None while an earlier rotation is unfinished (running here or
+        in another worker, or paused): its re-wrap job would overwrite the new
+        rotation's progress. Resume it with resume_key_rotation() first.
+        """
+        with self._locked():
+            state = self.get_rotation_status()
+            if state and not state.get("completed_at"):
+                logger.error(f"Key rotation to {state['target_key_id']} is still in progress; not rotating again")
+                return None
+            
+            # Start from the ring on disk in case another worker rotated
+            self._refresh_keyring(force=True)
+            key_id = f"k{max(int(existing[1:]) for existing in self._keyring['keys']) + 1}"
+            key = secrets.token_hex(32)
+            self._keyring["keys"][key_id] = {"key": key, "created_at": datetime.now().isoformat()}
+            self._keyring["active"] = key_id
+            self._save_json(os.path.join(self.secrets_dir, "keyring.json"), self._keyring)
+            self._set_keyring(self._keyring)
+            
+            self._save_rotation_state({
+                "target_key_id": key_id,
+                "started_at": datetime.now().isoformat(),
+                "completed_at": None,
+                "last_record": None,
+                "rewrapped": 0,
+                "total": len(self._list_record_names())
+            })
+        
+        logger.info(f"Rotated encryption key to {key_id}")
+        if background:
+            self.resume_key_rotation()
+        else:
+            self._rewrap_records()
+        return key_id
+    
+    def resume_key_rotation(self) -> bool:
+        """Start (or restart after a crash) the background re-wrap job"""
+        state = self.get_rotation_status()
+        if not state or state.get("completed_at"):
+            return False
+        if self._rotation_thread and self._rotation_thread.is_alive():
+            return True
+        
+        self._rotation_stop.clear()
+        self._rotation_thread = threading.Thread(target=self._rewrap_records, name="key-rotation")
+        self._rotation_thread.daemon = True
+        self._rotation_thread.start()
+        return True
+    
+    def stop_key_rotation(self, timeout: float = None):
+        """Pause the background re-wrap job; progress is kept for resume"""
+        self._rotation_stop.set()
+        if self._rotation_thread:
+            self._rotation_thread.join(timeout)
+    
+    def get_rotation_status(self) -> Optional[Dict[str, Any]]:
+        """Get progress of the current or last key rotation"""
+        state_file = os.path.join(self.secrets_dir, "rotation.json")
+        if not os.path.exists(state_file):
+            return None
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    
+    def _save_rotation_state(self, state: Dict[str, Any]):
+        self._save_json(os.path.join(self.secrets_dir, "rotation.json"), state)
+    
+    def _list_record_names(self) -> List[str]:
+        """Names of all encrypted records (the file name without .json)"""
+        return sorted(
+            filename[:-len(".json")] for filename in os.listdir(self.data_dir)
+            if filename.endswith(".json")
+        )
+    
+    def _rewrap_records(self):
+        """Re-wrap data keys under the active key in throttled batches
+        
+        Only the small wrapped key in each envelope changes; record bodies are
+        not re-encrypted. Reads keep working throughout because retired keys
+        stay in the ring, and the checkpoint lets an interrupted job resume.
+        """
+        state = self.get_rotation_status()
+        target_key_id = state["target_key_id"]
+        pending = [name for name in self._list_record_names()
+                   if state["last_record"] is None or name > state["last_record"]]
+        start_time = time.perf_counter()
+        
+        try:
+            for batch_start in range(0, len(pending), ROTATION_BATCH_SIZE):
+                if self._rotation_stop.is_set():
+                    logger.info(f"Key rotation paused after {state['rewrapped']} records")
+                    return
+                
+                batch = pending[batch_start:batch_start + ROTATION_BATCH_SIZE]
+                with self._locked():
+                    # Another worker may be running (or have finished) the same job
+                    current = self.get_rotation_status()
+                    if not current or current["target_key_id"] != target_key_id or current.get("completed_at"):
+                        logger.info(f"Key rotation to {target_key_id} finished elsewhere")
+                        return
+                    state = current
+                    batch = [name for name in batch if state["last_record"] is None or name > state["last_record"]]
+                    if not batch:
+                        continue
+                    for record_name in batch:
+                        if self._rewrap_record(record_name, target_key_id):
+                            state["rewrapped"] += 1
+                    state["last_record"] = batch[-1]
+                    self._save_rotation_state(state)
+                
+                # Yield to foreground requests between batches
+                time.sleep(ROTATION_BATCH_PAUSE)
+            
+            state["completed_at"] = datetime.now().isoformat()
+            state["duration_seconds"] = round(time.perf_counter() - start_time, 3)
+            self._save_rotation_state(state)
+            logger.info(f"Key rotation to {target_key_id} complete: {state['rewrapped']} records re-wrapped")
+        except Exception as e:
+            logger.error(f"Key rotation failed, resume with resume_key_rotation(): {e}")
+    
+    def _rewrap_record(self, record_name: str, target_key_id: str) -> bool:
+        """Re-wrap one record's data key under the target key"""
+        file_path = os.path.join(self.data_dir, f"{record_name}.json")
+        if not os.path.exists(file_path):
+            return False
+        
+        with open(file_path, 'r') as f:
+            secure_data = json.load(f)
+        
+        envelope = secure_data.get("encryption")
+        if envelope is None or envelope.get("key_id", LEGACY_KEY_ID) == target_key_id:
+            return False
+        
+        aad = record_name.encode("utf-8")
+        data_key = self._unwrap_data_key(envelope, aad)
+        nonce = os.urandom(NONCE_SIZE)
+        envelope["key_id"] = target_key_id
+        envelope["wrapped_key"] = _b64encode(nonce + self._keks[target_key_id].encrypt(nonce, data_key, aad))
+        self._save_json(file_path, secure_data)
+        return True
+    
+    def retire_key(self, key_id: str) -> bool:
+        """Remove a key from the ring once no record is wrapped under it"""
+        with self._locked():
+            self._refresh_keyring(force=True)
+            state = self.get_rotation_status()
+            if key_id == self.active_key_id or (state and not state.get("completed_at")):
+                logger.error(f"Key {key_id} can't be retired while it is active or a rotation is running")
+                return False
+            
+            for record_name in self._list_record_names():
+                with open(os.path.join(self.data_dir, f"{record_name}.json"), 'r') as f:
+                    envelope = json.load(f).get("encryption") or {}
+                if envelope.get("key_id", LEGACY_KEY_ID) == key_id:
+                    logger.error(f"Key {key_id} still protects {record_name}")
+                    return False
+            
+            self._keyring["keys"].pop(key_id, None)
+            self._save_json(os.path.join(self.secrets_dir, "keyring.json"), self._keyring)
+            self._set_keyring(self._keyring)
+        
+        logger.info(f"Retired encryption key {key_id}")
+        return True
+    
     def cleanup_old_data(self, days_old: int = 365) -> int:
         """Clean up old data (admin only)"""
         try:
@@ -266,6 +717,11 @@ class SecureDataManager:
                     
                     if file_time < cutoff_date:
                         os.remove(file_path)
+                        body_path = file_path[:-len(".json")] + ".body"
+                        if os.path.exists(body_path):
+                            os.remove(body_path)
+                        if self.search_index is not None:
+                            self.search_index.remove_application(filename[len("application_"):-len(".json")])
                         cleaned_count += 1
             
             logger.info(f"Cleaned up {cleaned_count} old files")
@@ -274,5 +730,11 @@ class SecureDataManager:
             logger.error(f"Failed to cleanup old data: {e}")
             return 0
 
-# Global instance
-secure_data_manager = SecureDataManager()
+# Global instance, created on first use so importing this module touches no files
+secure_data_manager = registry.register(
+    "secure_data_manager",
+    SecureDataManager,
+    # Pick up a key rotation that was interrupted by a restart
+    on_init=lambda manager: manager.resume_key_rotation(),
+    warm=True
+)
@@ -304,8 +304,14 @@ class DigitalSignatureSystem:
         )
         
         if uploaded_file:
-            # Display uploaded image
-            st.image(uploaded_file, caption="Uploaded Signature", use_column_width=True)
+            # Display a resized, metadata-free copy rather than the full upload
+            try:
+                from lib.images import image_optimizer, DISPLAY_SIZES
+                preview, _ = image_optimizer.optimize_bytes(uploaded_file.getvalue(), max_size=DISPLAY_SIZES["display"])
+            except Exception as e:
+                logger.warning(f"⚠️ Showing unoptimized signature image: {e}")
+                preview = uploaded_file
+            st.image(preview, caption="Uploaded Signature", use_column_width=True)
             
             # Signature verification
             st.subheader("🔍 Signature Verification")
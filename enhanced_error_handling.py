@@ -11,10 +11,21 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any, Callable
 import functools
 
+from lib.registry import registry
+from lib.metrics import metrics as metrics_registry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Scrapeable metrics, shared with AdvancedMonitoring and PerformanceMonitor
+HANDLED_ERRORS = metrics_registry.counter("handled_errors", "Errors shown to users by type", ["error_type"])
+FEEDBACK = metrics_registry.counter("user_feedback", "User feedback submissions", ["type"])
+FEEDBACK_RATING = metrics_registry.histogram("user_feedback_rating", "User feedback ratings (1-5)", ["type"],
+                                             unit="", buckets=(1, 2, 3, 4, 5))
+OPERATION_DURATION = metrics_registry.histogram("operation_duration_seconds", "Duration of tracked operations",
+                                                ["operation"])
+
 class ErrorHandler:
     """Enhanced error handling and user feedback system"""
     
@@ -39,6 +50,7 @@ class ErrorHandler:
         }
         
         self.error_logs.append(error_details)
+        HANDLED_ERRORS.labels(type(error).__name__).inc()
         logger.error(f"Error {error_id}: {error}")
         
         # Show user-friendly error message
@@ -123,6 +135,8 @@ class ErrorHandler:
         }
         
         self.user_feedback.append(feedback)
+        FEEDBACK.labels(feedback_type).inc()
+        FEEDBACK_RATING.labels(feedback_type).observe(rating)
         logger.info(f"User feedback collected: {feedback}")
         
         return feedback
@@ -212,10 +226,11 @@ class ErrorHandler:
         }
         
         self.performance_metrics.append(performance_data)
+        OPERATION_DURATION.labels(operation).observe(end_time - start_time)
         logger.info(f"Performance tracked: {performance_data}")
 
-# Global error handler instance
-error_handler = ErrorHandler()
+# Global error handler instance, created on first use
+error_handler = registry.register("error_handler", ErrorHandler)
 
 def error_boundary(func: Callable) -> Callable:
     """Decorator for error boundary functionality"""
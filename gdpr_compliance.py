@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import logging
 
+from lib.registry import registry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -359,8 +361,8 @@ class GDPRCompliance:
         # In production, delete from database
         logger.info("User data deleted")
 
-# Global GDPR instance
-gdpr_compliance = GDPRCompliance()
+# Global GDPR instance, created on first use
+gdpr_compliance = registry.register("gdpr_compliance", GDPRCompliance)
 
 def show_gdpr_compliance():
     """Main GDPR compliance interface"""
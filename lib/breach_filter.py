@@ -0,0 +1,167 @@
+"""
+Breached-password filter for Harem CRM
+A Bloom filter over the SHA-1 of known common and breached passwords, built
+offline from a list we supply (plain passwords, or the SHA1:count lines of
+the Have I Been Pwned download) and memory-mapped read-only at runtime. The
+file opens instantly, only the pages lookups touch are resident, and the
+operating system shares them between worker processes. A lookup is a SHA-1
+plus a handful of bit tests; false positives (a fresh password reported as
+breached) happen at the rate chosen at build time, false negatives never.
+"""
+import os
+import re
+import mmap
+import math
+import struct
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BREACH_FILTER_PATH_ENV = "BREACHED_PASSWORDS_FILTER"
+DEFAULT_FILTER_PATH = "data/breached_passwords.bloom"
+DEFAULT_FP_RATE = 0.001
+
+# magic, version, hash count k, bit count m, item count n
+_HEADER = struct.Struct("<4sHHQQ")
+_MAGIC = b"HBPF"
+_VERSION = 1
+_MASK64 = (1 << 64) - 1
+
+_SHA1_LINE = re.compile(r"^([0-9A-Fa-f]{40})(?::\d+)?$")
+
+# Rows hashed and inserted per NumPy batch while building
+BUILD_CHUNK = 1 << 16
+
+def filter_parameters(count: int, fp_rate: float) -> Dict[str, int]:
+    """Optimal bit and hash counts for `count` items at `fp_rate`"""
+    count = max(1, count)
+    bits = max(64, int(math.ceil(-count * math.log(fp_rate) / (math.log(2) ** 2))))
+    bits = (bits + 7) // 8 * 8
+    hashes = max(1, round(bits / count * math.log(2)))
+    return {"bits": bits, "hashes": hashes}
+
+def entry_digest(line: str) -> Optional[bytes]:
+    """SHA-1 of a list entry: HIBP lines are already hashes, anything else is a password"""
+    line = line.rstrip("\r\n")
+    if not line:
+        return None
+    match = _SHA1_LINE.match(line)
+    if match:
+        return bytes.fromhex(match.group(1))
+    return hashlib.sha1(line.encode("utf-8")).digest()
+
+def _digest_halves(digest: bytes):
+    """Two 64-bit hashes for double hashing, taken straight from the SHA-1"""
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:16], "little") | 1
+
+def build_filter(entries: Iterable[str], path: str, count: int, fp_rate: float = DEFAULT_FP_RATE) -> Dict[str, Any]:
+    """Write a filter for `count` entries (an upper bound is fine) to `path`"""
+    params = filter_parameters(count, fp_rate)
+    bits, hashes = params["bits"], params["hashes"]
+    bit_array = np.zeros(bits // 8, dtype=np.uint8)
+    rounds = np.arange(hashes, dtype=np.uint64)
+    inserted = 0
+
+    def insert(digests):
+        raw = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(-1, 20)
+        h1 = raw[:, :8].copy().view("<u8").ravel()
+        h2 = raw[:, 8:16].copy().view("<u8").ravel() | np.uint64(1)
+        # uint64 arithmetic wraps like the & _MASK64 in lookups
+        with np.errstate(over="ignore"):
+            positions = (h1[:, None] + rounds[None, :] * h2[:, None]) % np.uint64(bits)
+        positions = positions.ravel()
+        np.bitwise_or.at(bit_array, (positions >> np.uint64(3)).astype(np.int64),
+                         np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+    chunk = []
+    for line in entries:
+        digest = entry_digest(line)
+        if digest is None:
+            continue
+        chunk.append(digest)
+        if len(chunk) >= BUILD_CHUNK:
+            insert(chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        insert(chunk)
+        inserted += len(chunk)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, hashes, bits, inserted))
+        f.write(bit_array.tobytes())
+    os.replace(tmp_path, path)
+
+    fill = np.unpackbits(bit_array).mean()
+    return {"path": path, "items": inserted, "bits": bits, "hashes": hashes,
+            "bytes": _HEADER.size + bits // 8, "fill_ratio": float(fill),
+            "expected_fp_rate": float(fill ** hashes)}
+
+class BreachedPasswordFilter:
+    """Read-only, memory-mapped Bloom filter"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.hashes, self.bits, self.items = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a breached-password filter")
+        if len(self._mmap) != _HEADER.size + self.bits // 8:
+            self._mmap.close()
+            raise ValueError(f"{path} is truncated")
+
+    def contains_digest(self, digest: bytes) -> bool:
+        h1, h2 = _digest_halves(digest)
+        data, offset, bits = self._mmap, _HEADER.size, self.bits
+        for i in range(self.hashes):
+            position = ((h1 + i * h2) & _MASK64) % bits
+            if not data[offset + (position >> 3)] >> (position & 7) & 1:
+                return False
+        return True
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains_digest(hashlib.sha1(password.encode("utf-8")).digest())
+
+    def info(self) -> Dict[str, Any]:
+        return {"path": self.path, "items": self.items, "bits": self.bits, "hashes": self.hashes,
+                "bytes": len(self._mmap)}
+
+    def close(self):
+        self._mmap.close()
+
+_breach_filter: Optional[BreachedPasswordFilter] = None
+_breach_filter_checked = False
+_breach_filter_lock = threading.Lock()
+
+def get_breach_filter() -> Optional[BreachedPasswordFilter]:
+    """The deployed filter, or None if no filter file has been built"""
+    global _breach_filter, _breach_filter_checked
+    if _breach_filter_checked:
+        return _breach_filter
+
+    with _breach_filter_lock:
+        if not _breach_filter_checked:
+            path = os.environ.get(BREACH_FILTER_PATH_ENV, DEFAULT_FILTER_PATH)
+            if os.path.exists(path):
+                try:
+                    _breach_filter = BreachedPasswordFilter(path)
+                    logger.info(f"✅ Breached-password filter loaded: {_breach_filter.items} entries")
+                except Exception as e:
+                    logger.error(f"❌ Error loading breached-password filter {path}: {e}")
+            else:
+                logger.warning(f"⚠️ No breached-password filter at {path}; only the built-in list is checked")
+            _breach_filter_checked = True
+    return _breach_filter
@@ -0,0 +1,100 @@
+"""
+Stored login credentials for Harem CRM
+bcrypt hashes by username in a JSON file under secrets/, shared by every
+worker process. A missing file is seeded with the admin account, using
+ADMIN_PASSWORD when set and the original built-in password otherwise, so
+existing logins keep working. authenticate_user checks passwords against
+these hashes, and hashes made below the current BCRYPT_ROUNDS are replaced
+with upgraded ones after a successful login.
+"""
+import os
+import json
+import secrets
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .registry import registry
+from .password_hashing import password_hasher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_FILE_ENV = "CREDENTIALS_FILE"
+ADMIN_PASSWORD_ENV = "ADMIN_PASSWORD"
+DEFAULT_CREDENTIALS_FILE = "secrets/credentials.json"
+DEFAULT_ADMIN_USERNAME = "admin"
+LEGACY_ADMIN_PASSWORD = "harem2025"
+
+class CredentialStore:
+    """Password hashes by username, persisted atomically"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get(CREDENTIALS_FILE_ENV, DEFAULT_CREDENTIALS_FILE)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+        if not os.path.exists(self.path):
+            self._seed()
+
+    def _seed(self):
+        password = os.environ.get(ADMIN_PASSWORD_ENV)
+        if not password:
+            logger.warning(f"⚠️ {ADMIN_PASSWORD_ENV} not set: the admin account uses the built-in password")
+            password = LEGACY_ADMIN_PASSWORD
+        self._save({"users": {DEFAULT_ADMIN_USERNAME: {
+            "password_hash": password_hasher.hash(password),
+            "role": "admin",
+            "updated_at": datetime.now().isoformat()
+        }}})
+        logger.info(f"✅ Credentials stored in {self.path}")
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"users": {}}
+
+    def _save(self, payload: Dict[str, Any]):
+        """Write atomically so other workers never read a partial file"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def get_hash(self, username: str) -> Optional[str]:
+        """The stored hash, read fresh so changes by other workers apply at once"""
+        user = self._load()["users"].get(username)
+        return user.get("password_hash") if user else None
+
+    def get_role(self, username: str) -> Optional[str]:
+        user = self._load()["users"].get(username)
+        return user.get("role") if user else None
+
+    def set_hash(self, username: str, password_hash: str, role: str = None):
+        """Store a (new or upgraded) hash for a user"""
+        with self._lock:
+            payload = self._load()
+            user = payload["users"].setdefault(username, {"role": role or "user"})
+            user["password_hash"] = password_hash
+            if role:
+                user["role"] = role
+            user["updated_at"] = datetime.now().isoformat()
+            self._save(payload)
+        logger.info(f"✅ Password hash updated for user {username}")
+
+    @property
+    def dummy_hash(self) -> str:
+        """Checked for unknown usernames, so they take as long as real ones"""
+        if self._dummy_hash is None:
+            self._dummy_hash = password_hasher.hash(secrets.token_urlsafe(16))
+        return self._dummy_hash
+
+# Global credential store instance
+credential_store = registry.register("credential_store", CredentialStore)
@@ -4,16 +4,18 @@ Database connection and data management for Harem CRM
 import os
 import streamlit as st
 from supabase import create_client, Client
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
 
+from .performance import instrumented_cache, swr_cache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@st.cache_resource
+@instrumented_cache(resource=True)
 def init_supabase() -> Client:
     """Initialize Supabase client with caching"""
     try:
@@ -52,135 +54,121 @@ def init_supabase() -> Client:
         logger.warning(f"⚠️ Failed to initialize Supabase: {e}")
         return None
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_applications() -> List[Dict[str, Any]]:
-    """Get all applications from database"""
+def _fetch_rows(table: str, label: str) -> List[Dict[str, Any]]:
+    """All rows of a table, newest first
+
+    Failures raise rather than returning an empty list: inside swr_cache an
+    error keeps the last good value, where an empty result would be cached
+    as a fresh one.
+    """
+    supabase = init_supabase()
+    if not supabase:
+        return []
+
+    response = supabase.table(table).select('*').order('created_at', desc=True).execute()
+    if response.data:
+        logger.info(f"✅ Retrieved {len(response.data)} {label}")
+        return response.data
+    logger.info(f"📊 No {label} found in database")
+    return []
+
+def _serve(fetch: Callable[[], Any], label: str, default: Any) -> Any:
+    """Call a cached fetch_* getter, showing the error and returning default if nothing can be served"""
     try:
-        supabase = init_supabase()
-        if not supabase:
-            return []
-            
-        response = supabase.table('applications').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} applications")
-            return response.data
-        else:
-            logger.info("📊 No applications found in database")
-            return []
+        return fetch()
     except Exception as e:
-        logger.error(f"❌ Error fetching applications: {e}")
-        st.error(f"Failed to fetch applications: {e}")
-        return []
+        logger.error(f"❌ Error fetching {label}: {e}")
+        st.error(f"Failed to fetch {label}: {e}")
+        return default
+
+@swr_cache("get_applications", ttl=300, shared=True)  # Cache for 5 minutes
+def fetch_applications() -> List[Dict[str, Any]]:
+    return _fetch_rows('applications', 'applications')
+
+@swr_cache("get_users", ttl=300, shared=True)
+def fetch_users() -> List[Dict[str, Any]]:
+    return _fetch_rows('users', 'users')
+
+@swr_cache("get_tasks", ttl=300, shared=True)
+def fetch_tasks() -> List[Dict[str, Any]]:
+    return _fetch_rows('tasks', 'tasks')
+
+@swr_cache("get_content_sessions", ttl=300, shared=True)
+def fetch_content_sessions() -> List[Dict[str, Any]]:
+    return _fetch_rows('content_sessions', 'content sessions')
+
+@swr_cache("get_contracts", ttl=300, shared=True)
+def fetch_contracts() -> List[Dict[str, Any]]:
+    return _fetch_rows('contracts', 'contracts')
+
+@swr_cache("get_leads", ttl=300, shared=True)
+def fetch_leads() -> List[Dict[str, Any]]:
+    return _fetch_rows('leads', 'leads')
+
+def get_applications() -> List[Dict[str, Any]]:
+    """Get all applications from database"""
+    return _serve(fetch_applications, "applications", [])
 
-@st.cache_data(ttl=300)
 def get_users() -> List[Dict[str, Any]]:
     """Get all users from database"""
-    try:
-        supabase = init_supabase()
-        if not supabase:
-            return []
-            
-        response = supabase.table('users').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} users")
-            return response.data
-        else:
-            logger.info("📊 No users found in database")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Error fetching users: {e}")
-        st.error(f"Failed to fetch users: {e}")
-        return []
+    return _serve(fetch_users, "users", [])
 
-@st.cache_data(ttl=300)
 def get_tasks() -> List[Dict[str, Any]]:
     """Get all tasks from database"""
-    try:
-        supabase = init_supabase()
-        if not supabase:
-            return []
-            
-        response = supabase.table('tasks').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} tasks")
-            return response.data
-        else:
-            logger.info("📊 No tasks found in database")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Error fetching tasks: {e}")
-        st.error(f"Failed to fetch tasks: {e}")
-        return []
+    return _serve(fetch_tasks, "tasks", [])
 
-@st.cache_data(ttl=300)
 def get_content_sessions() -> List[Dict[str, Any]]:
     """Get all content sessions from database"""
-    try:
-        supabase = init_supabase()
-        if not supabase:
-            return []
-            
-        response = supabase.table('content_sessions').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} content sessions")
-            return response.data
-        else:
-            logger.info("📊 No content sessions found in database")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Error fetching content sessions: {e}")
-        st.error(f"Failed to fetch content sessions: {e}")
-        return []
+    return _serve(fetch_content_sessions, "content sessions", [])
 
-@st.cache_data(ttl=300)
 def get_contracts() -> List[Dict[str, Any]]:
     """Get all contracts from database"""
-    try:
-        supabase = init_supabase()
-        if not supabase:
-            return []
-            
-        response = supabase.table('contracts').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} contracts")
-            return response.data
-        else:
-            logger.info("📊 No contracts found in database")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Error fetching contracts: {e}")
-        st.error(f"Failed to fetch contracts: {e}")
-        return []
+    return _serve(fetch_contracts, "contracts", [])
 
-@st.cache_data(ttl=300)
 def get_leads() -> List[Dict[str, Any]]:
     """Get all leads from database"""
+    return _serve(fetch_leads, "leads", [])
+
+# Data types that can be read a page at a time, and their tables
+PAGED_TABLES = {
+    'applications': 'applications',
+    'users': 'users',
+    'tasks': 'tasks',
+    'leads': 'leads',
+    'contracts': 'contracts',
+    'content_sessions': 'content_sessions'
+}
+
+def fetch_page(data_type: str, page: int, page_size: int, supabase: Optional[Client] = None) -> Dict[str, Any]:
+    """Fetch one page of a table, newest first, with the exact total count
+
+    Safe to call from background threads: pass the client in rather than
+    resolving it here, and failures are logged instead of shown.
+    """
+    table = PAGED_TABLES[data_type]
+    start = (page - 1) * page_size
+    result = {'data': [], 'page': page, 'page_size': page_size, 'total_items': 0}
     try:
-        supabase = init_supabase()
         if not supabase:
-            return []
-            
-        response = supabase.table('leads').select('*').order('created_at', desc=True).execute()
-        
-        if response.data:
-            logger.info(f"✅ Retrieved {len(response.data)} leads")
-            return response.data
-        else:
-            logger.info("📊 No leads found in database")
-            return []
+            return result
+
+        response = (supabase.table(table).select('*', count='exact')
+                    .order('created_at', desc=True)
+                    .range(start, start + page_size - 1)
+                    .execute())
+        result['data'] = response.data or []
+        result['total_items'] = response.count if response.count is not None else start + len(result['data'])
+        return result
     except Exception as e:
-        logger.error(f"❌ Error fetching leads: {e}")
-        st.error(f"Failed to fetch leads: {e}")
-        return []
+        logger.error(f"❌ Error fetching {data_type} page {page}: {e}")
+        return result
 
-@st.cache_data(ttl=300)
 def get_analytics() -> Dict[str, Any]:
-    """Get analytics data from database"""
+    """Get analytics data from database
+
+    Not cached itself: the counts are cheap, and computing them from the
+    cached applications keeps them within that cache's staleness bound.
+    """
     try:
         supabase = init_supabase()
         if not supabase:
@@ -238,6 +226,21 @@ def get_analytics() -> Dict[str, Any]:
             "avg_response_time": "0 days"
         }
 
+def _search_index_call(method: str, *args, **kwargs):
+    """Keep the application search index in step with database writes
+
+    Only an index that already exists is updated; building one here would
+    decrypt and fetch every application inside a form submit. Without one,
+    the first search builds it from the current data.
+    """
+    try:
+        from .search import built_application_search_index
+        index = built_application_search_index()
+        if index is not None:
+            getattr(index, method)(*args, **kwargs)
+    except Exception as e:
+        logger.warning(f"⚠️ Search index not updated: {e}")
+
 def test_database_connection() -> bool:
     """Test database connection"""
     try:
@@ -264,6 +267,7 @@ def create_application(application_data: Dict[str, Any]) -> bool:
         
         if response.data:
             logger.info(f"✅ Application created successfully: {response.data[0]['id']}")
+            _search_index_call("index_supabase_rows", response.data)
             return True
         else:
             logger.error("❌ Failed to create application")
@@ -285,6 +289,7 @@ def update_application_status(application_id: str, status: str) -> bool:
         
         if response.data:
             logger.info(f"✅ Application {application_id} status updated to {status}")
+            _search_index_call("update_status", str(application_id), status, source="supabase")
             return True
         else:
             logger.error(f"❌ Failed to update application {application_id}")
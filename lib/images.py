@@ -0,0 +1,168 @@
+"""
+Image optimization pipeline for Harem CRM
+Decodes uploads and stored photos with Pillow, applies the EXIF orientation
+and strips the metadata (GPS, camera serials), resizes to display sizes and
+re-encodes to WebP or JPEG. Derivatives are cached on disk under the hash of
+the source bytes, so each photo is processed once per size and format.
+"""
+import os
+import io
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .registry import registry
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each place photos are displayed
+DISPLAY_SIZES = {"thumbnail": 256, "display": 1024, "full": 2048}
+
+# Encoder settings tuned for photos: visually lossless at display size while
+# keeping WebP encode time reasonable (method 4 of 0-6)
+FORMAT_SETTINGS = {
+    "WEBP": {"extension": "webp", "mime": "image/webp", "options": {"quality": 80, "method": 4}},
+    "JPEG": {"extension": "jpg", "mime": "image/jpeg",
+             "options": {"quality": 82, "optimize": True, "progressive": True}},
+}
+
+# Batches this small are cheaper to run inline than to ship to the pool
+INLINE_BATCH_SIZE = 4
+
+ImageSource = Union[str, bytes]
+
+def _derivative_path(cache_dir: str, digest: str, max_size: int, fmt: str) -> str:
+    settings = FORMAT_SETTINGS[fmt]
+    quality = settings["options"]["quality"]
+    return os.path.join(cache_dir, digest[:2], f"{digest}_{max_size}_q{quality}.{settings['extension']}")
+
+def _encode(data: bytes, max_size: int, fmt: str) -> bytes:
+    """Decode, orient, strip metadata, resize and re-encode one image"""
+    with Image.open(io.BytesIO(data)) as image:
+        # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        image.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(image)
+
+        if fmt == "JPEG" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if fmt == "WEBP" and "A" in image.getbands() else "RGB")
+
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        # Keep the colour profile, drop everything else
+        icc_profile = image.info.get("icc_profile")
+        output = io.BytesIO()
+        options = dict(FORMAT_SETTINGS[fmt]["options"])
+        if icc_profile:
+            options["icc_profile"] = icc_profile
+        image.save(output, format=fmt, exif=b"", **options)
+        return output.getvalue()
+
+def _optimize_one(job: Tuple[ImageSource, str, int, str]) -> Dict[str, Any]:
+    """Worker entry point: produce (or reuse) the derivative of one image"""
+    source, cache_dir, max_size, fmt = job
+    result = {"source": source if isinstance(source, str) else "<bytes>", "path": None,
+              "cached": False, "input_bytes": 0, "output_bytes": 0, "error": None}
+    try:
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                data = f.read()
+        else:
+            data = source
+        result["input_bytes"] = len(data)
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = _derivative_path(cache_dir, digest, max_size, fmt)
+        result["path"] = path
+
+        if os.path.exists(path):
+            result["cached"] = True
+            result["output_bytes"] = os.path.getsize(path)
+            return result
+
+        encoded = _encode(data, max_size, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write atomically so a concurrent reader never sees half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+        result["output_bytes"] = len(encoded)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+class ImageOptimizer:
+    """Process-pool image optimizer with a content-addressed derivative cache"""
+
+    def __init__(self, cache_dir: str = "data/image_cache", max_workers: int = None):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or max(1, min(os.cpu_count() or 1, 8))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.stats = {"processed": 0, "cache_hits": 0, "failed": 0, "input_bytes": 0, "output_bytes": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawn rather than fork: forking the threaded Streamlit
+                # server can copy held locks into the workers
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def optimize(self, sources: List[ImageSource], max_size: int = DISPLAY_SIZES["display"],
+                 fmt: str = "WEBP") -> List[Dict[str, Any]]:
+        """Optimize a batch of image paths or raw bytes, preserving order"""
+        fmt = fmt.upper()
+        if fmt not in FORMAT_SETTINGS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        if not PIL_AVAILABLE:
+            raise RuntimeError("Pillow is not installed")
+
+        jobs = [(source, self.cache_dir, max_size, fmt) for source in sources]
+        if len(jobs) <= INLINE_BATCH_SIZE or self.max_workers == 1:
+            results = [_optimize_one(job) for job in jobs]
+        else:
+            chunksize = max(1, len(jobs) // (self.max_workers * 4))
+            results = list(self._get_pool().map(_optimize_one, jobs, chunksize=chunksize))
+
+        for result in results:
+            if result["error"]:
+                self.stats["failed"] += 1
+                logger.warning(f"⚠️ Could not optimize {result['source']}: {result['error']}")
+                continue
+            self.stats["cache_hits" if result["cached"] else "processed"] += 1
+            self.stats["input_bytes"] += result["input_bytes"]
+            self.stats["output_bytes"] += result["output_bytes"]
+        return results
+
+    def optimize_bytes(self, data: bytes, max_size: int = DISPLAY_SIZES["display"],
+                       fmt: str = "WEBP") -> Tuple[bytes, str]:
+        """Optimize one upload and return (encoded bytes, mime type)"""
+        result = self.optimize([data], max_size=max_size, fmt=fmt)[0]
+        if result["error"]:
+            raise ValueError(result["error"])
+        with open(result["path"], "rb") as f:
+            return f.read(), FORMAT_SETTINGS[fmt.upper()]["mime"]
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+# Global image optimizer instance
+image_optimizer = registry.register("image_optimizer", ImageOptimizer)
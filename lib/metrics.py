@@ -0,0 +1,315 @@
+"""
+Metrics registry and OpenMetrics exposition for Harem CRM
+PerformanceMonitor, AdvancedMonitoring and ErrorHandler record counters,
+gauges and histograms here, and an optional side HTTP endpoint or textfile
+exporter publishes them so Prometheus can scrape and alert on them without
+anyone opening the dashboard.
+
+    METRICS_PORT=9464  ->  http://127.0.0.1:9464/metrics
+    METRICS_FILE=/var/lib/node_exporter/harem.prom  ->  rewritten every 15s
+"""
+import os
+import math
+import time
+import bisect
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "harem_"
+METRICS_PORT_ENV = "METRICS_PORT"
+METRICS_HOST_ENV = "METRICS_HOST"
+METRICS_FILE_ENV = "METRICS_FILE"
+METRICS_FILE_INTERVAL = 15  # Seconds
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (sample suffix, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _format_bound(value: float) -> str:
+    """le/quantile label values are always canonical floats, e.g. "1.0", so series match across scrapes"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+class _Metric:
+    """A metric family with one child per label combination"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), unit: str = ""):
+        self.name = name
+        self.help = help_text
+        self.unit = unit
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        key = tuple(str(kwargs[name]) for name in self.labelnames) if kwargs else tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> List[Sample]:
+        result = []
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            result.extend((suffix, {**labels, **extra}, value) for suffix, extra, value in child.samples())
+        return result
+
+class _CounterChild:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def samples(self) -> List[Sample]:
+        return [("_total", {}, self.value)]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def samples(self) -> List[Sample]:
+        return [("", {}, self.value)]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self) -> List[Sample]:
+        with self.lock:
+            counts, total_sum = list(self.counts), self.sum
+        result, cumulative = [], 0
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            cumulative += count
+            result.append(("_bucket", {"le": _format_bound(bound)}, cumulative))
+        result.append(("_count", {}, cumulative))
+        result.append(("_sum", {}, total_sum))
+        return result
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), unit: str = "",
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames, unit)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered as OpenMetrics text
+
+    Collectors are callables returning (name, kind, help, unit, samples)
+    tuples; they expose values that are already counted elsewhere (such as
+    cache statistics) without adding work to the hot path.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> _Metric:
+        full_name = self.prefix + name
+        metric = self._metrics.get(full_name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(full_name)
+                if metric is None:
+                    metric = self._metrics[full_name] = cls(full_name, *args, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {full_name} already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = (), unit: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames, unit)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (), unit: str = "seconds",
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, unit, buckets)
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _families(self) -> List[tuple]:
+        families = [(m.name, m.kind, m.help, m.unit, m.samples()) for m in list(self._metrics.values())]
+        for collector in list(self._collectors):
+            try:
+                for name, kind, help_text, unit, samples in collector():
+                    families.append((self.prefix + name, kind, help_text, unit, samples))
+            except Exception as e:
+                logger.error(f"❌ Metrics collector failed: {e}")
+        return families
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Exposition text; OpenMetrics 1.0 or the Prometheus 0.0.4 format"""
+        lines = []
+        for name, kind, help_text, unit, samples in self._families():
+            # Prometheus 0.0.4 names counter families with their _total suffix
+            family = name if openmetrics or kind != "counter" else name + "_total"
+            lines.append(f"# TYPE {family} {kind}")
+            lines.append(f"# HELP {family} {_escape(help_text)}")
+            if unit and openmetrics:
+                lines.append(f"# UNIT {family} {unit}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+        body = metrics.render(openmetrics=openmetrics).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the app log
+        pass
+
+def write_metrics_file(path: str):
+    """Write the Prometheus text format atomically (node_exporter textfile collector)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(metrics.render(openmetrics=False))
+    os.replace(tmp_path, path)
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+def start_metrics_exporter(port: Optional[int] = None, path: Optional[str] = None) -> bool:
+    """Start the HTTP endpoint and/or file exporter once per process
+
+    Configured by METRICS_PORT (and METRICS_HOST, default 127.0.0.1) and
+    METRICS_FILE unless given explicitly; returns False if neither is set
+    or the exporter is already running.
+    """
+    global _exporter_started
+    if _exporter_started:
+        return False
+
+    with _exporter_lock:
+        if _exporter_started:
+            return False
+        port = port if port is not None else int(os.environ.get(METRICS_PORT_ENV, 0) or 0)
+        path = path or os.environ.get(METRICS_FILE_ENV)
+        if not port and not path:
+            return False
+
+        if port:
+            try:
+                host = os.environ.get(METRICS_HOST_ENV, "127.0.0.1")
+                server = ThreadingHTTPServer((host, port), _MetricsHandler)
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                logger.info(f"✅ Metrics endpoint on http://{host}:{port}/metrics")
+            except OSError as e:
+                # Another worker on this host already serves the port
+                logger.warning(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+
+        if path:
+            def write_loop():
+                while True:
+                    try:
+                        write_metrics_file(path)
+                    except Exception as e:
+                        logger.error(f"❌ Error writing metrics file {path}: {e}")
+                    time.sleep(METRICS_FILE_INTERVAL)
+            threading.Thread(target=write_loop, name="metrics-file", daemon=True).start()
+            logger.info(f"✅ Writing metrics to {path} every {METRICS_FILE_INTERVAL}s")
+
+        _exporter_started = True
+        return True
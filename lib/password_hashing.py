@@ -0,0 +1,161 @@
+"""
+Password hashing pool for Harem CRM
+bcrypt is deliberately slow, and a burst of logins hashing on their script
+threads competes for every core with unrelated reruns. Hashes and checks run
+here on a small bounded thread pool instead (bcrypt releases the GIL), so at
+most a fixed number of cores are ever busy hashing; callers beyond the queue
+limit are refused rather than piling up. The cost factor comes from
+BCRYPT_ROUNDS, chosen for this hardware with calibrate_cost(), and hashes
+below it are upgraded after the next successful verification.
+"""
+import os
+import re
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bcrypt
+
+from .registry import registry
+from .metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS_ENV = "BCRYPT_ROUNDS"
+HASH_WORKERS_ENV = "PASSWORD_HASH_WORKERS"
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+# Requests waiting beyond the running ones, per worker
+QUEUE_PER_WORKER = 8
+# How long a caller waits for a queue slot before giving up
+QUEUE_TIMEOUT = 10.0
+
+_BCRYPT_COST = re.compile(r"^\$2[abxy]\$(\d{2})\$")
+
+HASH_QUEUE_DEPTH = metrics.gauge("password_hash_queue_depth", "Password hash requests waiting for a worker")
+HASH_WAIT = metrics.histogram("password_hash_queue_wait", "Time password hash requests waited for a worker",
+                              ["operation"])
+HASH_DURATION = metrics.histogram("password_hash_duration", "Time spent in bcrypt", ["operation"])
+HASH_REJECTED = metrics.counter("password_hash_rejected", "Password hash requests refused with a full queue")
+HASH_UPGRADES = metrics.counter("password_hash_upgrades", "Stored hashes re-hashed at the current cost")
+
+class PasswordHasherBusy(RuntimeError):
+    """The hashing queue is full"""
+
+def hash_cost(hashed: str) -> Optional[int]:
+    """Cost factor of a bcrypt hash, or None if it isn't one"""
+    match = _BCRYPT_COST.match(hashed or "")
+    return int(match.group(1)) if match else None
+
+class PasswordHasher:
+    """Bounded bcrypt pool with queue metrics"""
+
+    def __init__(self, rounds: int = None, max_workers: int = None):
+        self.rounds = rounds or int(os.environ.get(BCRYPT_ROUNDS_ENV, DEFAULT_ROUNDS))
+        # Half the cores by default, leaving the rest to serve reruns
+        self.max_workers = max_workers or int(
+            os.environ.get(HASH_WORKERS_ENV, 0) or max(1, (os.cpu_count() or 1) // 2))
+        self.max_queued = self.max_workers * QUEUE_PER_WORKER
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queued)
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.stats = {"hashes": 0, "verifications": 0, "rejected": 0, "upgrades": 0, "max_waiting": 0}
+
+    def _run(self, operation: str, func: Callable, *args) -> Any:
+        """Run func on the pool and wait for it; raises PasswordHasherBusy when saturated"""
+        if not self._slots.acquire(timeout=QUEUE_TIMEOUT):
+            self.stats["rejected"] += 1
+            HASH_REJECTED.inc()
+            raise PasswordHasherBusy(f"Password {operation} queue is full")
+
+        submitted = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self.stats["max_waiting"] = max(self.stats["max_waiting"], self._waiting)
+            HASH_QUEUE_DEPTH.set(self._waiting)
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._waiting -= 1
+                HASH_QUEUE_DEPTH.set(self._waiting)
+            HASH_WAIT.labels(operation).observe(started - submitted)
+            try:
+                return func(*args)
+            finally:
+                HASH_DURATION.labels(operation).observe(time.perf_counter() - started)
+                self._slots.release()
+
+        try:
+            future = self._pool.submit(task)
+        except Exception:
+            with self._lock:
+                self._waiting -= 1
+            self._slots.release()
+            raise
+        return future.result()
+
+    def hash(self, password: str, rounds: int = None) -> str:
+        salt = bcrypt.gensalt(rounds or self.rounds)
+        hashed = self._run("hash", bcrypt.hashpw, password.encode('utf-8'), salt)
+        self.stats["hashes"] += 1
+        return hashed.decode('utf-8')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        self.stats["verifications"] += 1
+        return self._run("verify", bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        cost = hash_cost(hashed)
+        return cost is not None and cost < self.rounds
+
+    def upgrade(self, password: str, on_rehash: Callable[[str], None]):
+        """Re-hash at the current cost in the background and hand the new hash to on_rehash
+
+        on_rehash runs on a pool thread, so it should persist the hash rather
+        than touch st.session_state.
+        """
+        def rehash():
+            try:
+                on_rehash(self.hash(password))
+                self.stats["upgrades"] += 1
+                HASH_UPGRADES.inc()
+            except Exception as e:
+                logger.error(f"❌ Error upgrading password hash: {e}")
+        threading.Thread(target=rehash, name="bcrypt-upgrade", daemon=True).start()
+
+    def status(self) -> Dict[str, Any]:
+        return {"rounds": self.rounds, "workers": self.max_workers, "max_queued": self.max_queued,
+                "waiting": self._waiting, **self.stats}
+
+def calibrate_cost(target_ms: float = 250.0, samples: int = 3,
+                   min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS) -> Dict[str, Any]:
+    """Highest bcrypt cost whose median hash time stays within target_ms on this machine
+
+    Each extra round doubles the work, so timing stops at the first cost
+    over the target.
+    """
+    timings: List[Tuple[int, float]] = []
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        salt = bcrypt.gensalt(rounds)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration-password", salt)
+            durations.append((time.perf_counter() - start) * 1000)
+        median = sorted(durations)[len(durations) // 2]
+        timings.append((rounds, median))
+        if median > target_ms:
+            break
+        chosen = rounds
+    return {"rounds": chosen, "target_ms": target_ms, "timings_ms": timings}
+
+# Global password hasher instance
+password_hasher = registry.register("password_hasher", PasswordHasher)
@@ -3,44 +3,200 @@ Performance optimization utilities for Harem CRM
 """
 import streamlit as st
 import time
+import inspect
+import itertools
+import contextvars
+import math
+import pickle
+import sqlite3
+import sys
+import threading
 import logging
 from typing import Any, Callable, Dict, List
 from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from array import array
+import re
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+from .metrics import metrics as metrics_registry, start_metrics_exporter
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Latency histogram layout: log-spaced buckets from 1µs to ~20 minutes with
+# ~2.5% relative error, so every histogram has a fixed, small footprint
+HISTOGRAM_GROWTH = 1.05
+HISTOGRAM_BUCKETS = 430
+HISTOGRAM_WINDOWS = (1, 5, 60)  # Minutes
+PERCENTILES = {'p50': 0.50, 'p95': 0.95, 'p99': 0.99, 'p999': 0.999}
+
+# DataFrame dtype optimization: label columns that are always categorical,
+# the distinct-value share below which other text becomes categorical, and
+# column name endings that suggest dates
+CATEGORICAL_COLUMNS = {'status', 'location', 'body_type'}
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+DATETIME_COLUMN_HINTS = ('_at', 'date', 'timestamp')
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2})?')
+
+# Cache warm-up: cached getters live for CACHE_TTL seconds and are
+# recomputed WARM_REFRESH_MARGIN seconds before they would expire
+CACHE_TTL = 300
+WARM_REFRESH_MARGIN = 60
+
+# Stale-while-revalidate: expired values are served while they refresh in
+# the background, but never once they are older than this
+SWR_MAX_STALENESS = 900
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+# Lazy loading: pages kept per data type, how long a page stays fresh
+# (matching the cached getters) and the threads that prefetch next pages
+PAGE_CACHE_SIZE = 8
+PAGE_TTL = 300  # Seconds
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-prefetch")
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = None
+
+# Scrapeable copy of every timed call (dashboard percentiles use LatencyHistogram)
+FUNCTION_DURATION = metrics_registry.histogram(
+    "function_duration_seconds", "Wall time of performance_timer functions", ["function"]
+)
+
+class LatencyHistogram:
+    """HDR-style log-bucketed latency histogram with per-minute windows
+    
+    Keeps an all-time bucket array plus sparse per-minute slots for the last
+    hour, so memory is bounded no matter how many calls are recorded.
+    """
+    
+    _LOG_GROWTH = math.log(HISTOGRAM_GROWTH)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._all_time = array('Q', [0]) * HISTOGRAM_BUCKETS
+        self._minutes = [None] * max(HISTOGRAM_WINDOWS)  # (minute, {bucket: count})
+        self.count = 0
+        self.max_value = 0.0
+    
+    @classmethod
+    def _bucket(cls, seconds: float) -> int:
+        micros = seconds * 1_000_000
+        if micros < 1:
+            return 0
+        return min(1 + int(math.log(micros) / cls._LOG_GROWTH), HISTOGRAM_BUCKETS - 1)
+    
+    @staticmethod
+    def _bucket_value(bucket: int) -> float:
+        """Representative value (seconds) of a bucket: its geometric midpoint"""
+        if bucket == 0:
+            return 0.0
+        return HISTOGRAM_GROWTH ** (bucket - 0.5) / 1_000_000
+    
+    def record(self, seconds: float, now: float = None):
+        bucket = self._bucket(seconds)
+        minute = int((now if now is not None else time.time()) // 60)
+        slot = minute % len(self._minutes)
+        
+        with self._lock:
+            self._all_time[bucket] += 1
+            self.count += 1
+            self.max_value = max(self.max_value, seconds)
+            
+            entry = self._minutes[slot]
+            if entry is None or entry[0] != minute:
+                entry = (minute, {})
+                self._minutes[slot] = entry
+            entry[1][bucket] = entry[1].get(bucket, 0) + 1
+    
+    def _window_counts(self, window_minutes: int = None, now: float = None) -> Dict[int, int]:
+        if window_minutes is None:
+            return {bucket: count for bucket, count in enumerate(self._all_time) if count}
+        
+        current = int((now if now is not None else time.time()) // 60)
+        counts = {}
+        for entry in self._minutes:
+            if entry is not None and current - window_minutes < entry[0] <= current:
+                for bucket, count in entry[1].items():
+                    counts[bucket] = counts.get(bucket, 0) + count
+        return counts
+    
+    def percentiles(self, window_minutes: int = None, now: float = None) -> Dict[str, Any]:
+        """Count and p50/p95/p99/p999 (seconds) for all time or the last N minutes"""
+        with self._lock:
+            counts = self._window_counts(window_minutes, now)
+        
+        total = sum(counts.values())
+        result = {'count': total}
+        if not total:
+            result.update({name: None for name in PERCENTILES})
+            return result
+        
+        ordered = sorted(counts.items())
+        for name, fraction in PERCENTILES.items():
+            rank = max(1, math.ceil(total * fraction))
+            seen = 0
+            for bucket, count in ordered:
+                seen += count
+                if seen >= rank:
+                    result[name] = self._bucket_value(bucket)
+                    break
+        return result
+
 class PerformanceMonitor:
     """Monitor and optimize application performance"""
     
-    def __init__(self):
+    def __init__(self, slow_call_threshold: float = 1.0, log_sample_rate: int = 100):
         self.metrics = {}
-        self.cache_hits = 0
-        self.cache_misses = 0
+        self.histograms = {}
+        self.cache_stats = {}
+        self._cache_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        # Calls slower than this are always logged; others 1 in log_sample_rate
+        self.slow_call_threshold = slow_call_threshold
+        self.log_sample_rate = log_sample_rate
         
-    def track_performance(self, func_name: str, execution_time: float):
-        """Track function execution time"""
+    def track_performance(self, func_name: str, execution_time: float, self_time: float = None):
+        """Track function execution time (self_time excludes nested timed calls)"""
         try:
-            if func_name not in self.metrics:
-                self.metrics[func_name] = {
-                    'total_time': 0,
-                    'call_count': 0,
-                    'avg_time': 0,
-                    'max_time': 0,
-                    'min_time': float('inf')
-                }
+            with self._metrics_lock:
+                if func_name not in self.metrics:
+                    self.metrics[func_name] = {
+                        'total_time': 0,
+                        'call_count': 0,
+                        'avg_time': 0,
+                        'max_time': 0,
+                        'min_time': float('inf'),
+                        'total_self_time': 0,
+                        'avg_self_time': 0
+                    }
+                    self.histograms[func_name] = LatencyHistogram()
+                
+                metrics = self.metrics[func_name]
+                metrics['total_time'] += execution_time
+                metrics['call_count'] += 1
+                metrics['avg_time'] = metrics['total_time'] / metrics['call_count']
+                metrics['max_time'] = max(metrics['max_time'], execution_time)
+                metrics['min_time'] = min(metrics['min_time'], execution_time)
+                metrics['total_self_time'] += execution_time if self_time is None else self_time
+                metrics['avg_self_time'] = metrics['total_self_time'] / metrics['call_count']
+                call_count = metrics['call_count']
             
-            metrics = self.metrics[func_name]
-            metrics['total_time'] += execution_time
-            metrics['call_count'] += 1
-            metrics['avg_time'] = metrics['total_time'] / metrics['call_count']
-            metrics['max_time'] = max(metrics['max_time'], execution_time)
-            metrics['min_time'] = min(metrics['min_time'], execution_time)
+            self.histograms[func_name].record(execution_time)
+            FUNCTION_DURATION.labels(func_name).observe(execution_time)
             
-            logger.info(f"⏱️ {func_name}: {execution_time:.3f}s (avg: {metrics['avg_time']:.3f}s)")
+            # Log slow calls always and everything else sampled
+            if execution_time >= self.slow_call_threshold:
+                logger.warning(f"🐌 {func_name}: {execution_time:.3f}s (avg: {metrics['avg_time']:.3f}s)")
+            elif self.log_sample_rate and (call_count - 1) % self.log_sample_rate == 0:
+                logger.info(f"⏱️ {func_name}: {execution_time:.3f}s (avg: {metrics['avg_time']:.3f}s, {call_count} calls)")
             
         except Exception as e:
             logger.error(f"❌ Error tracking performance: {e}")
@@ -84,97 +240,632 @@ class PerformanceMonitor:
             logger.error(f"❌ Error getting performance summary: {e}")
             return {}
     
-    def record_cache_hit(self):
-        """Record cache hit"""
-        self.cache_hits += 1
+    def get_latency_percentiles(self, window_minutes: int = None) -> List[Dict[str, Any]]:
+        """Per-function latency percentiles for all time or the last N minutes"""
+        rows = []
+        for func_name, histogram in list(self.histograms.items()):
+            stats = histogram.percentiles(window_minutes)
+            if stats['count']:
+                rows.append({
+                    'function': func_name,
+                    **stats,
+                    'max': histogram.max_value,
+                    'avg_self': self.metrics[func_name]['avg_self_time']
+                })
+        return sorted(rows, key=lambda x: x['p99'], reverse=True)
+    
+    def _cache_entry_stats(self, func_name: str) -> Dict[str, Any]:
+        """Get (or create) the cache counters for a function; caller holds the lock"""
+        if func_name not in self.cache_stats:
+            self.cache_stats[func_name] = {
+                'resource': False,
+                'calls': 0,
+                'misses': 0,
+                'evictions': 0,
+                'recompute_time': 0.0,
+                'entry_sizes': {},
+                'failures': 0,
+                'stale_serves': 0,
+                'refreshes': 0
+            }
+        return self.cache_stats[func_name]
+    
+    def register_cached_function(self, func_name: str, resource: bool = False):
+        """Register a cached function so it is listed before its first call"""
+        with self._cache_lock:
+            self._cache_entry_stats(func_name)['resource'] = resource
+    
+    def record_cache_call(self, func_name: str):
+        """Record a call to a cached function (hit or miss)"""
+        with self._cache_lock:
+            self._cache_entry_stats(func_name)['calls'] += 1
+    
+    def record_cache_miss(self, func_name: str, cache_key: str, recompute_time: float, entry_size: int = 0,
+                          failed: bool = False):
+        """Record a cache miss, i.e. the wrapped function actually ran"""
+        with self._cache_lock:
+            stats = self._cache_entry_stats(func_name)
+            stats['misses'] += 1
+            stats['recompute_time'] += recompute_time
+            if failed:
+                # Failed results aren't cached, so the next call is a miss again
+                stats['failures'] += 1
+                return
+            if cache_key in stats['entry_sizes']:
+                # Recomputing a key we already cached means its entry expired or was evicted
+                stats['evictions'] += 1
+            stats['entry_sizes'][cache_key] = entry_size
+    
+    def record_cache_refresh(self, func_name: str, cache_key: str, recompute_time: float, entry_size: int = 0,
+                             failed: bool = False):
+        """Record a background refresh of a stale entry (callers were not kept waiting)"""
+        with self._cache_lock:
+            stats = self._cache_entry_stats(func_name)
+            stats['refreshes'] += 1
+            stats['recompute_time'] += recompute_time
+            if failed:
+                stats['failures'] += 1
+                return
+            stats['entry_sizes'][cache_key] = entry_size
+    
+    def record_stale_serve(self, func_name: str):
+        """Record a call answered with an expired value while it is refreshed"""
+        with self._cache_lock:
+            self._cache_entry_stats(func_name)['stale_serves'] += 1
+    
+    def record_cache_clear(self, func_name: str = None, resource: bool = False):
+        """Record that cached entries were dropped (every data or resource cache if no name given)"""
+        with self._cache_lock:
+            if func_name:
+                names = [func_name]
+            else:
+                names = [name for name, stats in self.cache_stats.items() if stats['resource'] == resource]
+            for name in names:
+                stats = self._cache_entry_stats(name)
+                stats['evictions'] += len(stats['entry_sizes'])
+                stats['entry_sizes'] = {}
     
-    def record_cache_miss(self):
-        """Record cache miss"""
-        self.cache_misses += 1
+    @property
+    def cache_hits(self) -> int:
+        return sum(max(stats['calls'] - stats['misses'], 0) for stats in self.cache_stats.values())
+    
+    @property
+    def cache_misses(self) -> int:
+        return sum(stats['misses'] for stats in self.cache_stats.values())
+    
+    @property
+    def stale_serves(self) -> int:
+        return sum(stats['stale_serves'] for stats in self.cache_stats.values())
+    
+    def get_cache_breakdown(self) -> List[Dict[str, Any]]:
+        """Per-function cache statistics"""
+        with self._cache_lock:
+            breakdown = []
+            for func_name, stats in self.cache_stats.items():
+                hits = max(stats['calls'] - stats['misses'], 0)
+                breakdown.append({
+                    'function': func_name,
+                    'kind': 'resource' if stats['resource'] else 'data',
+                    'calls': stats['calls'],
+                    'hits': hits,
+                    'misses': stats['misses'],
+                    'hit_rate': hits / stats['calls'] if stats['calls'] else 0,
+                    'evictions': stats['evictions'],
+                    'entries': len(stats['entry_sizes']),
+                    'entry_bytes': sum(stats['entry_sizes'].values()),
+                    'stale_serves': stats['stale_serves'],
+                    'refreshes': stats['refreshes'],
+                    'avg_recompute_ms': (stats['recompute_time'] / (stats['misses'] + stats['refreshes']) * 1000
+                                         if stats['misses'] + stats['refreshes'] else 0),
+                    'failures': stats['failures']
+                })
+            return sorted(breakdown, key=lambda x: x['calls'], reverse=True)
 
 # Initialize performance monitor
 performance_monitor = PerformanceMonitor()
 
-def performance_timer(func_name: str = None):
-    """Decorator to time function execution"""
+# Global timing switch: when off, timed functions cost one global lookup
+TIMING_ENABLED = True
+
+# The innermost active span for the current thread or asyncio task
+_current_span = contextvars.ContextVar("performance_span", default=None)
+
+def set_timing_enabled(enabled: bool):
+    """Globally enable or disable performance_timer instrumentation"""
+    global TIMING_ENABLED
+    TIMING_ENABLED = enabled
+
+class _Span:
+    """One timed call; children add their time so self-time can be derived"""
+    
+    __slots__ = ("child_ns",)
+    
+    def __init__(self):
+        self.child_ns = 0
+
+def _finish_span(name: str, span: _Span, parent: _Span, elapsed_ns: int):
+    if parent is not None:
+        parent.child_ns += elapsed_ns
+    performance_monitor.track_performance(name, elapsed_ns / 1e9, (elapsed_ns - span.child_ns) / 1e9)
+
+def performance_timer(func_name: str = None, sample_rate: int = 1):
+    """Decorator to time function execution
+    
+    Uses perf_counter_ns, times 1 in `sample_rate` calls, and attributes
+    time spent in nested timed calls to the child so each function also
+    reports self-time. Generator functions report time spent producing
+    items (plus a separate "<name> [first item]" metric), and coroutine
+    functions are timed from call to completion.
+    """
     def decorator(func: Callable) -> Callable:
+        name = func_name or func.__name__
+        calls = itertools.count()
+        
+        def sampled() -> bool:
+            return TIMING_ENABLED and (sample_rate <= 1 or next(calls) % sample_rate == 0)
+        
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if not sampled():
+                    return (yield from func(*args, **kwargs))
+                
+                parent = _current_span.get()
+                span = _Span()
+                generator = func(*args, **kwargs)
+                busy_ns = 0
+                first_item_recorded = False
+                resume, value = generator.send, None
+                try:
+                    while True:
+                        # Time each resumption with this span current, so
+                        # timed calls made by the generator count as children
+                        token = _current_span.set(span)
+                        start = time.perf_counter_ns()
+                        try:
+                            item = resume(value)
+                        except StopIteration as stop:
+                            return stop.value
+                        finally:
+                            busy_ns += time.perf_counter_ns() - start
+                            _current_span.reset(token)
+                        
+                        if not first_item_recorded:
+                            first_item_recorded = True
+                            performance_monitor.track_performance(f"{name} [first item]", busy_ns / 1e9)
+                        try:
+                            resume, value = generator.send, (yield item)
+                        except GeneratorExit:
+                            generator.close()
+                            raise
+                        except BaseException as e:
+                            resume, value = generator.throw, e
+                finally:
+                    _finish_span(name, span, parent, busy_ns)
+            return gen_wrapper
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not sampled():
+                    return await func(*args, **kwargs)
+                
+                parent = _current_span.get()
+                span = _Span()
+                token = _current_span.set(span)
+                start = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    elapsed_ns = time.perf_counter_ns() - start
+                    _current_span.reset(token)
+                    _finish_span(name, span, parent, elapsed_ns)
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            if not TIMING_ENABLED:
+                return func(*args, **kwargs)
+            if sample_rate > 1 and next(calls) % sample_rate:
+                return func(*args, **kwargs)
+            
+            parent = _current_span.get()
+            span = _Span()
+            token = _current_span.set(span)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ns = time.perf_counter_ns() - start
+                _current_span.reset(token)
+                _finish_span(name, span, parent, elapsed_ns)
+        return wrapper
+    return decorator
+
+def _cache_key(args: tuple, kwargs: dict) -> str:
+    """Stable key for the arguments of a cached call"""
+    return repr((args, sorted(kwargs.items())))
+
+def _entry_size(value: Any) -> int:
+    """Approximate size in bytes of a cached value"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+def instrumented_cache(func_name: str = None, resource: bool = False, **cache_kwargs):
+    """st.cache_data (or st.cache_resource) that records real hits and misses
+    
+    The outer wrapper counts every call, while the function handed to
+    Streamlit only runs on a miss, so hits are calls minus misses. Misses also
+    record recompute latency and the size of the new entry; recomputing a
+    key that was already cached is counted as an eviction or expiry.
+    """
+    def decorator(func: Callable) -> Callable:
+        name = func_name or func.__name__
+        
+        @wraps(func)
+        def compute(*args, **kwargs):
+            start_time = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                execution_time = time.time() - start_time
-                performance_monitor.track_performance(func_name or func.__name__, execution_time)
-                return result
-            except Exception as e:
-                execution_time = time.time() - start_time
-                performance_monitor.track_performance(func_name or func.__name__, execution_time)
-                raise e
+            except Exception:
+                performance_monitor.record_cache_miss(
+                    name, _cache_key(args, kwargs), time.perf_counter() - start_time, failed=True
+                )
+                raise
+            performance_monitor.record_cache_miss(
+                name, _cache_key(args, kwargs), time.perf_counter() - start_time, _entry_size(result)
+            )
+            return result
+        
+        cache = st.cache_resource if resource else st.cache_data
+        cached = cache(**cache_kwargs)(compute)
+        performance_monitor.register_cached_function(name, resource)
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            performance_monitor.record_cache_call(name)
+            return cached(*args, **kwargs)
+        
+        def clear():
+            cached.clear()
+            performance_monitor.record_cache_clear(name)
+        
+        wrapper.clear = clear
+        return wrapper
+    return decorator
+
+class _StaleWhileRevalidate:
+    """Storage and single-flight bookkeeping behind one swr_cache function
+    
+    Entries live in this process, or with `shared` in the cross-process
+    SQLite cache when SHARED_CACHE_PATH is configured; there a lease makes
+    one process compute while the others wait for its result.
+    """
+    
+    def __init__(self, name: str, func: Callable, ttl: float, max_staleness: float, shared: bool = False):
+        self.name = name
+        self.func = func
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.shared = shared
+        self.entries: Dict[str, tuple] = {}  # key -> (pickled or raw value, is_pickled, computed_at)
+        self.inflight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+    
+    def _backend(self):
+        if not self.shared:
+            return None
+        from .shared_cache import get_shared_cache
+        return get_shared_cache()
+    
+    def _lookup(self, key: str, backend) -> tuple:
+        if backend is None:
+            with self.lock:
+                return self.entries.get(key)
+        found = backend.lookup(self.name, key)
+        return (found[0], True, found[1]) if found else None
+    
+    @staticmethod
+    def _load(entry: tuple) -> Any:
+        # Hand every caller its own copy, as st.cache_data does
+        return pickle.loads(entry[0]) if entry[1] else entry[0]
+    
+    def _finish(self, key: str, future: Future, value: Any = None, error: BaseException = None):
+        with self.lock:
+            self.inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+    
+    def _compute(self, key: str, future: Future, args: tuple, kwargs: dict, background: bool,
+                 previous: tuple = None):
+        # Whatever fails (the shared backend included), the future is
+        # resolved and leaves inflight; otherwise every later caller for the
+        # key would wait on it forever and refreshes would never run again
+        value, error = None, None
+        try:
+            value = self._produce(key, args, kwargs, background, previous)
+        except BaseException as e:
+            error = e
+            if background:
+                logger.warning(f"⚠️ Refreshing {self.name} failed, serving last good value: {e}")
+        finally:
+            self._finish(key, future, value, error)
+    
+    def _produce(self, key: str, args: tuple, kwargs: dict, background: bool, previous: tuple = None) -> Any:
+        backend = self._backend()
+        version = None
+        try:
+            if backend is not None:
+                try:
+                    version = backend.version(self.name)
+                    if not backend.acquire_lease(self.name, key):
+                        # Another process is computing this key: take its result, or
+                        # compute here if its lease runs out without one
+                        found = backend.wait_for(self.name, key, newer_than=previous[2] if previous else 0)
+                        if found:
+                            return pickle.loads(found[0])
+                except sqlite3.Error as e:
+                    # Locked, corrupt or full: this computation stays in-process
+                    logger.error(f"❌ Shared cache unavailable for {self.name}, computing locally: {e}")
+                    backend = None
+            
+            start_time = time.perf_counter()
+            record = performance_monitor.record_cache_refresh if background else performance_monitor.record_cache_miss
+            try:
+                value = self.func(*args, **kwargs)
+            except BaseException:
+                record(self.name, key, time.perf_counter() - start_time, failed=True)
+                raise
+            
+            elapsed = time.perf_counter() - start_time
+            try:
+                stored = (pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), True)
+                size = len(stored[0])
+            except Exception:
+                stored = (value, False)
+                size = sys.getsizeof(value)
+            
+            if backend is None:
+                with self.lock:
+                    self.entries[key] = stored + (time.time(),)
+            else:
+                try:
+                    if stored[1]:
+                        backend.store(self.name, key, stored[0], time.time(), version)
+                    else:
+                        logger.warning(f"⚠️ {self.name} returned an unpicklable value; not shared")
+                except Exception as e:
+                    logger.error(f"❌ Error storing {self.name} in shared cache: {e}")
+            
+            record(self.name, key, elapsed, size)
+            return value
+        finally:
+            if backend is not None:
+                try:
+                    backend.release_lease(self.name, key)
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️ Could not release shared cache lease for {self.name}: {e}")
+    
+    def get(self, args: tuple, kwargs: dict, force: bool = False) -> Any:
+        key = _cache_key(args, kwargs)
+        backend = self._backend()
+        try:
+            entry = self._lookup(key, backend)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Shared cache lookup failed for {self.name}, using this process's cache: {e}")
+            entry = self._lookup(key, None)
+        age = time.time() - entry[2] if entry else None
+        if not force and entry and age < self.ttl:
+            return self._load(entry)
+        
+        with self.lock:
+            if not force and entry and age < self.max_staleness:
+                if key not in self.inflight:
+                    future = self.inflight[key] = Future()
+                    _refresh_executor.submit(self._compute, key, future, args, kwargs, True, entry)
+                stale_value = entry
+            else:
+                stale_value = None
+                future = self.inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self.inflight[key] = Future()
+        
+        if stale_value is not None:
+            performance_monitor.record_stale_serve(self.name)
+            return self._load(stale_value)
+        
+        # Missing, past max staleness or forced: compute once, others wait
+        if owner:
+            self._compute(key, future, args, kwargs, False, entry)
+        return future.result()
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        backend = self._backend()
+        if backend is not None:
+            try:
+                backend.invalidate(self.name)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Error invalidating {self.name} in shared cache: {e}")
+
+_swr_caches: List[_StaleWhileRevalidate] = []
+
+def swr_cache(func_name: str = None, ttl: float = CACHE_TTL, max_staleness: float = SWR_MAX_STALENESS,
+              shared: bool = False):
+    """Stale-while-revalidate cache with single-flight refresh
+    
+    Fresh values (younger than `ttl`) are returned as usual. Expired values
+    younger than `max_staleness` are still returned immediately while one
+    background refresh replaces them; past `max_staleness` (or with nothing
+    cached) the caller recomputes, and concurrent callers for the same key
+    wait on that single computation. A failed refresh keeps the last good
+    value until it reaches `max_staleness`. With `shared`, values are kept
+    in the cross-process cache when one is configured (see lib.shared_cache).
+    """
+    def decorator(func: Callable) -> Callable:
+        name = func_name or func.__name__
+        cache = _StaleWhileRevalidate(name, func, ttl, max_staleness, shared)
+        _swr_caches.append(cache)
+        performance_monitor.register_cached_function(name)
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            performance_monitor.record_cache_call(name)
+            return cache.get(args, kwargs)
+        
+        def refresh(*args, **kwargs):
+            """Recompute now, keeping the old value visible until the new one is ready"""
+            return cache.get(args, kwargs, force=True)
+        
+        def clear():
+            cache.clear()
+            performance_monitor.record_cache_clear(name)
+        
+        wrapper.refresh = refresh
+        wrapper.clear = clear
         return wrapper
     return decorator
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+# The database getters carry the cache; a second swr_cache layer here would
+# add its staleness window on top of theirs
 @performance_timer("get_applications_cached")
 def get_applications_cached() -> List[Dict[str, Any]]:
     """Get applications with caching"""
-    try:
-        from .database import get_applications
-        performance_monitor.record_cache_hit()
-        return get_applications()
-    except Exception as e:
-        performance_monitor.record_cache_miss()
-        logger.error(f"❌ Error getting cached applications: {e}")
-        return []
+    from .database import get_applications
+    return get_applications()
 
-@st.cache_data(ttl=300)
 @performance_timer("get_users_cached")
 def get_users_cached() -> List[Dict[str, Any]]:
     """Get users with caching"""
-    try:
-        from .database import get_users
-        performance_monitor.record_cache_hit()
-        return get_users()
-    except Exception as e:
-        performance_monitor.record_cache_miss()
-        logger.error(f"❌ Error getting cached users: {e}")
-        return []
+    from .database import get_users
+    return get_users()
 
-@st.cache_data(ttl=300)
 @performance_timer("get_analytics_cached")
 def get_analytics_cached() -> Dict[str, Any]:
     """Get analytics with caching"""
+    from .database import get_analytics
+    return get_analytics()
+
+def _smallest_int_dtype(minimum: int, maximum: int, nullable: bool) -> str:
+    """Narrowest integer dtype that holds [minimum, maximum] exactly"""
+    candidates = ('uint8', 'uint16', 'uint32', 'uint64') if minimum >= 0 else ('int8', 'int16', 'int32', 'int64')
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            if nullable:
+                return 'UInt' + dtype[4:] if dtype.startswith('u') else dtype.capitalize()
+            return dtype
+    return 'Int64' if nullable else 'int64'
+
+def _parse_datetimes(series: pd.Series) -> pd.Series:
     try:
-        from .database import get_analytics
-        performance_monitor.record_cache_hit()
-        return get_analytics()
-    except Exception as e:
-        performance_monitor.record_cache_miss()
-        logger.error(f"❌ Error getting cached analytics: {e}")
-        return {}
+        return pd.to_datetime(series, errors='coerce', format='ISO8601')
+    except (TypeError, ValueError):
+        # pandas < 2.0 has no ISO8601 format; mixed offsets need utc
+        try:
+            return pd.to_datetime(series, errors='coerce')
+        except (TypeError, ValueError):
+            return pd.to_datetime(series, errors='coerce', utc=True)
+
+def _optimize_column(name: str, series: pd.Series) -> pd.Series:
+    """Compact, lossless dtype for one column (or the column unchanged)"""
+    if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    
+    non_null = series.dropna()
+    if non_null.empty:
+        return series
+    
+    if pd.api.types.is_integer_dtype(series):
+        return series.astype(_smallest_int_dtype(int(non_null.min()), int(non_null.max()),
+                                                 pd.api.types.is_extension_array_dtype(series)))
+    if pd.api.types.is_float_dtype(series):
+        # Integer columns that picked up NaN for missing values
+        if (non_null % 1 == 0).all():
+            return series.astype(_smallest_int_dtype(int(non_null.min()), int(non_null.max()), True))
+        return series
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return series
+    
+    inferred = pd.api.types.infer_dtype(non_null, skipna=True)
+    if inferred == 'integer':
+        # Python ints in an object column, possibly with gaps
+        return series.astype(_smallest_int_dtype(int(non_null.min()), int(non_null.max()),
+                                                 len(non_null) < len(series)))
+    if inferred != 'string':
+        # Nested answers (dicts, lists) and mixed columns stay as objects
+        return series
+    
+    lowered = name.lower()
+    if lowered in CATEGORICAL_COLUMNS:
+        return series.astype('category')
+    
+    if lowered.endswith(DATETIME_COLUMN_HINTS) or _ISO_DATE.match(non_null.iloc[0]):
+        parsed = _parse_datetimes(series)
+        if pd.api.types.is_datetime64_any_dtype(parsed) and parsed.notna().sum() == len(non_null):
+            return parsed
+    
+    if non_null.nunique() <= len(non_null) * CATEGORY_MAX_UNIQUE_RATIO:
+        return series.astype('category')
+    # Object text moves to Arrow strings; pandas 3 text columns already are
+    return series.astype(STRING_DTYPE) if STRING_DTYPE and pd.api.types.is_object_dtype(series) else series
 
-def optimize_dataframe(df: pd.DataFrame, max_rows: int = 1000) -> pd.DataFrame:
-    """Optimize DataFrame for display"""
+def optimize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Shrink a DataFrame's memory with compact, lossless dtypes
+    
+    status, location and body_type (and other repetitive text) become
+    categoricals, integers are downcast to the narrowest type that holds
+    their range, ISO date strings are parsed to datetimes and remaining text
+    uses Arrow-backed strings. No rows are dropped; the memory report is
+    stored in result.attrs['optimization'].
+    """
     try:
-        # Limit rows for performance
-        if len(df) > max_rows:
-            df = df.head(max_rows)
-            logger.info(f"📊 DataFrame optimized: limited to {max_rows} rows")
+        memory_before = int(df.memory_usage(deep=True).sum())
+        optimized = df.copy(deep=False)
+        dtype_changes = {}
         
-        # Optimize data types
         for col in df.columns:
-            if df[col].dtype == 'object':
-                # Try to convert to numeric
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='ignore')
-                except:
-                    pass
+            series = df[col]
+            converted = _optimize_column(str(col), series)
+            if converted is not series:
+                optimized[col] = converted
+                dtype_changes[str(col)] = (str(series.dtype), str(converted.dtype))
         
-        return df
+        memory_after = int(optimized.memory_usage(deep=True).sum())
+        optimized.attrs['optimization'] = {
+            'rows': len(optimized),
+            'memory_before': memory_before,
+            'memory_after': memory_after,
+            'reduction': 1 - memory_after / memory_before if memory_before else 0.0,
+            'dtype_changes': dtype_changes
+        }
+        logger.info(f"📊 DataFrame optimized: {len(optimized)} rows, "
+                    f"{memory_before / 1024:.0f} KiB → {memory_after / 1024:.0f} KiB")
+        return optimized
         
     except Exception as e:
         logger.error(f"❌ Error optimizing DataFrame: {e}")
         return df
 
+def show_dataframe(df: pd.DataFrame, height: int = 400, **kwargs):
+    """Show every row of an optimized DataFrame
+    
+    st.dataframe only draws the rows in view, so large frames are scrolled
+    rather than truncated.
+    """
+    optimized = optimize_dataframe(df)
+    st.dataframe(optimized, height=height, use_container_width=True, **kwargs)
+    report = optimized.attrs.get('optimization')
+    if report:
+        st.caption(f"{report['rows']:,} rows · {report['memory_after'] / 1024 / 1024:.1f} MiB in memory "
+                   f"({report['reduction']:.0%} smaller than {report['memory_before'] / 1024 / 1024:.1f} MiB)")
+
 def paginate_data(data: List[Dict[str, Any]], page: int = 1, page_size: int = 20) -> Dict[str, Any]:
     """Paginate data for better performance"""
     try:
@@ -212,6 +903,11 @@ def clear_cache():
     """Clear all cached data"""
     try:
         st.cache_data.clear()
+        for cache in _swr_caches:
+            cache.clear()
+        for loader in list(_page_loaders.values()):
+            loader.clear()
+        performance_monitor.record_cache_clear()
         logger.info("✅ Cache cleared successfully")
     except Exception as e:
         logger.error(f"❌ Error clearing cache: {e}")
@@ -219,10 +915,20 @@ def clear_cache():
 def get_cache_info() -> Dict[str, Any]:
     """Get cache information"""
     try:
+        from .shared_cache import get_shared_cache
+        from .security import token_cache
+        shared_cache = get_shared_cache()
+        hits = performance_monitor.cache_hits
+        misses = performance_monitor.cache_misses
         return {
-            'cache_hits': performance_monitor.cache_hits,
-            'cache_misses': performance_monitor.cache_misses,
-            'cache_hit_rate': performance_monitor.cache_hits / (performance_monitor.cache_hits + performance_monitor.cache_misses) if (performance_monitor.cache_hits + performance_monitor.cache_misses) > 0 else 0
+            'cache_hits': hits,
+            'cache_misses': misses,
+            'cache_hit_rate': hits / (hits + misses) if (hits + misses) > 0 else 0,
+            'stale_serves': performance_monitor.stale_serves,
+            'functions': performance_monitor.get_cache_breakdown(),
+            'page_loaders': [loader.info() for loader in list(_page_loaders.values())],
+            'shared_cache': shared_cache.info() if shared_cache else None,
+            'session_tokens': token_cache.info()
         }
     except Exception as e:
         logger.error(f"❌ Error getting cache info: {e}")
@@ -236,17 +942,47 @@ def show_performance_dashboard():
         # Performance summary
         summary = performance_monitor.get_performance_summary()
         
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Total Functions", summary.get('total_functions', 0))
-        
-        with col2:
-            cache_info = get_cache_info()
-            st.metric("Cache Hit Rate", f"{cache_info.get('cache_hit_rate', 0):.1%}")
+        # Per-function cache breakdown
+        st.subheader("🎯 Cache Effectiveness")
+        cache_info = get_cache_info()
+        if cache_info.get('stale_serves'):
+            st.caption(f"⏳ {cache_info['stale_serves']} calls were answered with a stale value while it refreshed")
+        if cache_info.get('functions'):
+            cache_df = pd.DataFrame(cache_info['functions'])
+            cache_df['hit_rate'] = cache_df['hit_rate'].map(lambda rate: f"{rate:.1%}")
+            cache_df['entry_kb'] = (cache_df.pop('entry_bytes') / 1024).round(1)
+            cache_df['avg_recompute_ms'] = cache_df['avg_recompute_ms'].round(1)
+            st.dataframe(cache_df, use_container_width=True)
+        else:
+            st.info("No cached functions have been called yet.")
+        if cache_info.get('shared_cache'):
+            shared = cache_info['shared_cache']
+            st.caption(f"🔗 Shared cache {shared['path']}: {shared['entries']} entries, "
+                       f"{shared['bytes'] / 1024 / 1024:.1f} / {shared['max_bytes'] / 1024 / 1024:.0f} MiB, "
+                       f"{shared['hits']} hits, {shared['lease_waits']} waits on other workers")
+        if cache_info.get('session_tokens'):
+            tokens = cache_info['session_tokens']
+            st.caption(f"🔑 Session tokens: {tokens['hits']} of {tokens['hits'] + tokens['misses']} checks served "
+                       f"from the verified-token cache, ~{tokens['saved_seconds'] * 1000:.1f} ms of verification saved")
+        if cache_info.get('page_loaders'):
+            st.caption("Lazy-loaded pages")
+            st.dataframe(pd.DataFrame(cache_info['page_loaders']), use_container_width=True)
         
-        with col3:
-            st.metric("Cache Hits", cache_info.get('cache_hits', 0))
+        # Tail latency per function
+        st.subheader("⏱️ Latency Percentiles")
+        window_labels = {f"Last {minutes} min": minutes for minutes in HISTOGRAM_WINDOWS}
+        window_labels["All time"] = None
+        window = st.selectbox("Window", list(window_labels), key="latency_window")
+        latency_rows = performance_monitor.get_latency_percentiles(window_labels[window])
+        if latency_rows:
+            latency_df = pd.DataFrame(latency_rows)
+            time_columns = list(PERCENTILES) + ['max', 'avg_self']
+            for column in time_columns:
+                latency_df[column] = (latency_df[column] * 1000).round(2)
+            st.dataframe(latency_df.rename(columns={c: f"{c} (ms)" for c in time_columns}),
+                         use_container_width=True)
+        else:
+            st.info("No timed calls in this window.")
         
         # Slowest functions
         if summary.get('slowest_functions'):
@@ -260,6 +996,49 @@ def show_performance_dashboard():
             for func in summary['most_called_functions'][:5]:
                 st.write(f"**{func['function']}**: {func['call_count']} calls ({func['avg_time']:.3f}s avg)")
         
+        # Background cache warm-up
+        st.subheader("🔥 Cache Warm-up")
+        warm_status = cache_warmer.status
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("State", warm_status['state'].title())
+        with col2:
+            st.metric("Last Warm-up", f"{warm_status['duration']:.2f}s" if warm_status['duration'] is not None else "—")
+        with col3:
+            st.metric("Refreshes", warm_status['refreshes'])
+        with col4:
+            st.metric("Next Refresh", warm_status['next_refresh_at'][11:19] if warm_status['next_refresh_at'] else "—")
+        if warm_status['targets']:
+            st.dataframe(pd.DataFrame([
+                {'cache': name, 'duration_ms': round(target['duration'] * 1000, 1), 'error': target['error']}
+                for name, target in warm_status['targets'].items()
+            ]), use_container_width=True)
+        if not cache_warmer.started and st.button("Start Warm-up"):
+            cache_warmer.start()
+            st.rerun()
+        
+        # Lazily created subsystems
+        st.subheader("🧩 Component Initialization")
+        from .registry import registry
+        init_report = registry.init_report()
+        if init_report:
+            st.dataframe(pd.DataFrame(init_report), use_container_width=True)
+            if st.button("Warm Up Components"):
+                registry.warm_up(names=[c['component'] for c in init_report])
+                st.rerun()
+        else:
+            st.info("No components registered in this process yet.")
+        
+        # Per-session rerun profiling
+        st.subheader("🔬 Rerun Profiler")
+        from .profiler import show_profiler_panel
+        show_profiler_panel()
+        
+        # Per-session memory and session_state budgets
+        st.subheader("🧠 Session Memory")
+        from .session_memory import show_session_memory_panel
+        show_session_memory_panel()
+        
         # Cache management
         st.subheader("🗄️ Cache Management")
         col1, col2 = st.columns(2)
@@ -278,54 +1057,331 @@ def show_performance_dashboard():
         logger.error(f"❌ Error showing performance dashboard: {e}")
         st.error(f"Error displaying performance dashboard: {e}")
 
-def optimize_images(images: List[str], max_size: int = 1024) -> List[str]:
-    """Optimize images for web display"""
+def optimize_images(images: List[str], max_size: int = 1024, fmt: str = "WEBP") -> List[str]:
+    """Optimize images for web display
+    
+    Returns the path of a resized, metadata-free derivative for each image,
+    or the original path for any image that could not be processed.
+    """
     try:
-        # In production, implement actual image optimization
-        # For now, just return the original list
-        logger.info(f"📸 Optimizing {len(images)} images")
-        return images
+        from .images import image_optimizer
+        start_time = time.perf_counter()
+        results = image_optimizer.optimize(images, max_size=max_size, fmt=fmt)
+        optimized = [result['path'] if not result['error'] else image
+                     for image, result in zip(images, results)]
+        
+        cached = sum(1 for result in results if result['cached'])
+        logger.info(f"📸 Optimized {len(images)} images ({cached} from cache) "
+                    f"in {time.perf_counter() - start_time:.2f}s")
+        return optimized
         
     except Exception as e:
         logger.error(f"❌ Error optimizing images: {e}")
         return images
 
+class PageLoader:
+    """Pages of one data type: a small LRU plus background prefetch"""
+    
+    def __init__(self, data_type: str, page_size: int, max_pages: int = PAGE_CACHE_SIZE, ttl: float = PAGE_TTL):
+        self.data_type = data_type
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self._pages: OrderedDict = OrderedDict()  # page -> (fetched_at, result)
+        self._inflight: Dict[int, Future] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'prefetched': 0, 'prefetch_hits': 0}
+    
+    def _fetch(self, page: int, supabase, generation: int) -> Dict[str, Any]:
+        from .database import fetch_page
+        start_time = time.perf_counter()
+        result = fetch_page(self.data_type, page, self.page_size, supabase)
+        performance_monitor.track_performance(f"fetch_page[{self.data_type}]", time.perf_counter() - start_time)
+        
+        with self._lock:
+            self._inflight.pop(page, None)
+            # Pages fetched before a clear() are dropped, not cached
+            if generation == self._generation:
+                self._pages[page] = (time.time(), result)
+                self._pages.move_to_end(page)
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+        return result
+    
+    def _fresh(self, page: int) -> Dict[str, Any]:
+        """Cached page if still within the TTL; caller holds the lock"""
+        cached = self._pages.get(page)
+        if cached and time.time() - cached[0] < self.ttl:
+            self._pages.move_to_end(page)
+            return cached[1]
+        return None
+    
+    def get_page(self, page: int, supabase) -> Dict[str, Any]:
+        with self._lock:
+            result = self._fresh(page)
+            if result is not None:
+                self.stats['hits'] += 1
+                return result
+            future = self._inflight.get(page)
+            generation = self._generation
+            self.stats['prefetch_hits' if future else 'misses'] += 1
+        
+        if future:
+            return future.result()
+        return self._fetch(page, supabase, generation)
+    
+    def prefetch(self, page: int, supabase):
+        """Start fetching a page in the background unless it is cached or on its way"""
+        with self._lock:
+            if page in self._inflight or self._fresh(page) is not None:
+                return
+            self._inflight[page] = _prefetch_executor.submit(self._fetch, page, supabase, self._generation)
+            self.stats['prefetched'] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._generation += 1
+    
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'data_type': self.data_type, 'page_size': self.page_size,
+                    'cached_pages': len(self._pages), **self.stats}
+
+_page_loaders: Dict[tuple, PageLoader] = {}
+_page_loaders_lock = threading.Lock()
+
+def get_page_loader(data_type: str, page_size: int) -> PageLoader:
+    """Process-wide loader for a data type and page size"""
+    with _page_loaders_lock:
+        loader = _page_loaders.get((data_type, page_size))
+        if loader is None:
+            loader = _page_loaders[(data_type, page_size)] = PageLoader(data_type, page_size)
+        return loader
+
 def lazy_load_data(data_type: str, page: int = 1, page_size: int = 20):
-    """Lazy load data for better performance"""
+    """Lazy load data for better performance
+    
+    Generator yielding pages of applications, users, tasks, leads, contracts
+    or content_sessions from `page` onwards. Each page has the same shape as
+    paginate_data()'s result, and the next page is fetched in the background
+    while the caller renders the current one.
+    """
     try:
-        if data_type == 'applications':
-            return get_applications_cached()
-        elif data_type == 'users':
-            return get_users_cached()
-        elif data_type == 'analytics':
-            return get_analytics_cached()
-        else:
-            return []
-            
+        from .database import PAGED_TABLES, init_supabase
+        if data_type not in PAGED_TABLES:
+            logger.warning(f"⚠️ No lazy loader for {data_type}")
+            return
+        # Resolve the client on the script thread; prefetch threads reuse it
+        supabase = init_supabase()
+        loader = get_page_loader(data_type, page_size)
     except Exception as e:
         logger.error(f"❌ Error lazy loading {data_type}: {e}")
-        return []
+        return
+    
+    while True:
+        try:
+            result = loader.get_page(page, supabase)
+            total_pages = (result['total_items'] + page_size - 1) // page_size
+            has_next = page < total_pages
+            if has_next:
+                loader.prefetch(page + 1, supabase)
+        except Exception as e:
+            logger.error(f"❌ Error lazy loading {data_type} page {page}: {e}")
+            return
+        
+        yield {
+            'data': result['data'],
+            'page': page,
+            'page_size': page_size,
+            'total_items': result['total_items'],
+            'total_pages': total_pages,
+            'has_next': has_next,
+            'has_prev': page > 1
+        }
+        if not has_next:
+            return
+        page += 1
+
+def show_paged_table(data_type: str, row: Callable[[Dict[str, Any]], Dict[str, Any]],
+                     page_size: int = 25, key: str = None) -> bool:
+    """Show a table one page at a time with Previous/Next controls
+
+    Only the page in view is read from the database, and the next one is
+    prefetched while it renders. `row` maps a database row to the columns
+    shown. Returns False if there is nothing to show, e.g. in offline mode.
+    """
+    key = key or f"{data_type}_page"
+    page = st.session_state.get(key, 1)
+    result = next(lazy_load_data(data_type, page, page_size), None)
+    if result and not result['data'] and page > 1:
+        # Rows were deleted since the page was chosen; go to the last one
+        page = max(1, result['total_pages'])
+        st.session_state[key] = page
+        result = next(lazy_load_data(data_type, page, page_size), None)
+    if not result or not result['data']:
+        return False
+
+    show_dataframe(pd.DataFrame([row(item) for item in result['data']]))
+
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("◀ Previous", key=f"{key}_prev", disabled=not result['has_prev']):
+            st.session_state[key] = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page} of {result['total_pages']} · {result['total_items']:,} {data_type.replace('_', ' ')}")
+    with col3:
+        if st.button("Next ▶", key=f"{key}_next", disabled=not result['has_next']):
+            st.session_state[key] = page + 1
+            st.rerun()
+    return True
+
+class CacheWarmer:
+    """Process-level warm-up and ahead-of-TTL refresh of cached getters
+    
+    A single background thread fills the caches once, then recomputes them
+    every `ttl - refresh_margin` seconds so no session ever finds them cold
+    or expired. Each refresh recomputes one getter at a time: swr_cache
+    getters keep serving their old value meanwhile, and other cached
+    getters are cleared first, so sessions arriving mid-refresh wait on
+    Streamlit's per-key compute lock rather than starting their own fetch.
+    """
+    
+    def __init__(self, targets: Callable[[], List[tuple]], ttl: float = CACHE_TTL,
+                 refresh_margin: float = WARM_REFRESH_MARGIN):
+        self._targets = targets
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.status = {
+            'state': 'not started',
+            'started_at': None,
+            'last_warm_at': None,
+            'duration': None,
+            'refreshes': 0,
+            'next_refresh_at': None,
+            'targets': {}
+        }
+    
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+    
+    def start(self) -> bool:
+        """Start the warm-up thread; returns False if it is already running"""
+        if self._thread is not None:
+            return False
+        with self._start_lock:
+            if self._thread is not None:
+                return False
+            self._stop.clear()
+            self.status['started_at'] = datetime.now().isoformat()
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+            return True
+    
+    def stop(self):
+        self._stop.set()
+    
+    def warm(self, refresh: bool = False):
+        """Fill (or with `refresh`, recompute) every target cache now"""
+        self.status['state'] = 'refreshing' if refresh else 'warming'
+        start_time = time.perf_counter()
+        failed = False
+        
+        for name, func in self._targets():
+            target_start = time.perf_counter()
+            try:
+                if refresh and hasattr(func, 'refresh'):
+                    func.refresh()
+                elif refresh:
+                    func.clear()
+                    func()
+                else:
+                    func()
+                self.status['targets'][name] = {'duration': time.perf_counter() - target_start, 'error': None}
+            except Exception as e:
+                failed = True
+                self.status['targets'][name] = {'duration': time.perf_counter() - target_start, 'error': str(e)}
+                logger.error(f"❌ Error warming {name}: {e}")
+        
+        self.status['duration'] = time.perf_counter() - start_time
+        self.status['last_warm_at'] = datetime.now().isoformat()
+        self.status['state'] = 'failed' if failed else 'warm'
+        if refresh:
+            self.status['refreshes'] += 1
+        logger.info(f"✅ Cache {'refreshed' if refresh else 'warmed up'} in {self.status['duration']:.2f}s")
+    
+    def _run(self):
+        interval = max(1.0, self.ttl - self.refresh_margin)
+        self.warm()
+        while True:
+            self.status['next_refresh_at'] = (datetime.now() + timedelta(seconds=interval)).isoformat()
+            if self._stop.wait(interval):
+                break
+            self.warm(refresh=True)
+        self.status['state'] = 'stopped'
+        self.status['next_refresh_at'] = None
+
+def _warm_targets() -> List[tuple]:
+    """Cached database getters to keep hot (the raising fetch_* forms, so failures show in the status)"""
+    from .database import fetch_applications, fetch_users
+    return [
+        ('get_applications', fetch_applications),
+        ('get_users', fetch_users)
+    ]
+
+# Process-wide cache warmer
+cache_warmer = CacheWarmer(_warm_targets)
+
+def _cache_metric_families():
+    """Scrape-time export of the cache and warm-up statistics"""
+    breakdown = performance_monitor.get_cache_breakdown()
+    counters = {
+        'cache_calls': ('calls', "Calls to cached functions"),
+        'cache_misses': ('misses', "Cached calls that recomputed while the caller waited"),
+        'cache_stale_serves': ('stale_serves', "Calls answered with a stale value during refresh"),
+        'cache_refreshes': ('refreshes', "Background refreshes of stale entries"),
+        'cache_evictions': ('evictions', "Cache entries dropped by expiry, eviction or clear"),
+        'cache_failures': ('failures', "Cached function calls that raised")
+    }
+    for name, (field, help_text) in counters.items():
+        yield (name, 'counter', help_text, '',
+               [('_total', {'function': row['function']}, row[field]) for row in breakdown])
+    yield ('cache_entry_bytes', 'gauge', "Pickled size of cached entries", 'bytes',
+           [('', {'function': row['function']}, row['entry_bytes']) for row in breakdown])
+    
+    warm_status = cache_warmer.status
+    yield ('cache_warmup_duration_seconds', 'gauge', "Duration of the last cache warm-up", 'seconds',
+           [('', {}, warm_status['duration'] or 0)])
+    yield ('cache_warmup_refreshes', 'counter', "Ahead-of-TTL cache refreshes", '',
+           [('_total', {}, warm_status['refreshes'])])
+
+metrics_registry.register_collector(_cache_metric_families)
 
 def preload_critical_data():
     """Preload critical data for better performance"""
     try:
-        # Preload most important data
-        get_analytics_cached()
-        get_applications_cached()
-        get_users_cached()
-        
-        logger.info("✅ Critical data preloaded successfully")
+        cache_warmer.warm()
         
     except Exception as e:
         logger.error(f"❌ Error preloading critical data: {e}")
 
 def setup_performance_monitoring():
-    """Setup performance monitoring"""
+    """Setup performance monitoring
+    
+    Starts the process-wide cache warmer (and the metrics exporter, when
+    METRICS_PORT or METRICS_FILE is set) the first time any session gets
+    here; the data is loaded on a background thread, so no session waits
+    for it.
+    """
     try:
-        # Initialize performance tracking
-        if 'performance_initialized' not in st.session_state:
-            st.session_state.performance_initialized = True
-            preload_critical_data()
+        if not cache_warmer.started and cache_warmer.start():
+            start_metrics_exporter()
             logger.info("✅ Performance monitoring initialized")
         
     except Exception as e:
@@ -0,0 +1,358 @@
+"""
+Per-rerun script profiler for Harem CRM
+Profiling is switched on per session from the performance dashboard. While it
+is on, every script rerun is recorded either as a timeline of page functions,
+data calls, DataFrame construction, Plotly figures and widget calls, or as
+full cProfile stats. The slowest reruns of the session are kept for export.
+"""
+import streamlit as st
+import sys
+import time
+import json
+import heapq
+import cProfile
+import pstats
+import itertools
+import tempfile
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILER_MODE_KEY = "profiler_mode"
+PROFILER_RERUNS_KEY = "profiler_reruns"
+PROFILER_MODES = ("Off", "Timeline", "cProfile")
+PROFILER_KEEP_SLOWEST = 20
+
+# Timeline categories, in the order the dashboard shows them
+CATEGORIES = ("page", "data", "dataframe", "plotly", "widget", "script")
+
+# Library categories are recorded at their outermost call only, so Streamlit
+# and Plotly internals don't flood the timeline
+_LIBRARY_CATEGORIES = {"dataframe", "plotly", "widget"}
+_DATA_PREFIXES = ("get_", "load_", "search", "init_supabase")
+_APP_MODULE_PREFIXES = ("__main__", "lib.", "config.")
+
+_rerun_sequence = itertools.count()
+
+def _classify(frame) -> Optional[Tuple[str, str]]:
+    """(category, frame name) for a call worth recording, else None"""
+    code = frame.f_code
+    name = code.co_name
+    module = frame.f_globals.get("__name__", "")
+
+    if module.startswith(_APP_MODULE_PREFIXES):
+        if name.startswith("show_"):
+            return "page", name
+        if name.startswith(_DATA_PREFIXES):
+            return "data", name
+        return None
+
+    if module == "streamlit.runtime.caching.cache_utils" and name == "__call__":
+        func = getattr(getattr(frame.f_locals.get("self"), "_info", None), "func", None)
+        return "data", f"cache lookup {getattr(func, '__qualname__', '?')}"
+    if module.startswith("streamlit.elements") and not name.startswith("_"):
+        return "widget", f"st.{name}"
+    if module == "pandas.core.frame" and name == "__init__":
+        return "dataframe", "pd.DataFrame()"
+    if module.startswith("plotly.express") and not name.startswith("_"):
+        return "plotly", f"px.{name}"
+    if module.startswith("plotly.graph_objs") and name == "__init__":
+        return "plotly", f"go.{frame.f_locals.get('self').__class__.__name__}()"
+    if module.startswith("postgrest") and name == "execute":
+        return "data", "supabase execute"
+    return None
+
+class RerunProfile:
+    """One recorded script rerun"""
+
+    __slots__ = ("sequence", "started_at", "duration_ns", "mode", "frames", "events", "stats", "pages", "interrupted")
+
+    def __init__(self, mode: str):
+        self.sequence = next(_rerun_sequence)
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.duration_ns = 0
+        self.mode = mode
+        self.frames: List[Tuple[str, str]] = []  # (name, category)
+        self.events: List[Tuple[str, int, int]] = []  # ("O" | "C", frame index, ns since start)
+        self.stats: Optional[cProfile.Profile] = None
+        self.pages: List[str] = []
+        self.interrupted = False
+
+    @property
+    def label(self) -> str:
+        return " › ".join(self.pages[:3]) or "(no page)"
+
+    def category_breakdown(self) -> Dict[str, float]:
+        """Exclusive milliseconds per category; uninstrumented time is "script" """
+        totals = dict.fromkeys(CATEGORIES, 0)
+        stack: List[int] = []
+        last = 0
+        for kind, frame, at in self.events:
+            owner = self.frames[stack[-1]][1] if stack else "script"
+            totals[owner] += at - last
+            last = at
+            if kind == "O":
+                stack.append(frame)
+            elif stack:
+                stack.pop()
+        totals["script"] += self.duration_ns - last
+        return {category: ns / 1e6 for category, ns in totals.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        row = {
+            "rerun": self.sequence,
+            "started_at": self.started_at,
+            "page": self.label,
+            "mode": self.mode,
+            "total_ms": round(self.duration_ns / 1e6, 1),
+            "interrupted": self.interrupted,
+        }
+        if self.mode == "Timeline":
+            row.update({f"{category}_ms": round(ms, 1) for category, ms in self.category_breakdown().items()})
+        return row
+
+class _TimelineRecorder:
+    """sys.setprofile hook that records open/close events for classified calls"""
+
+    def __init__(self, profile: RerunProfile):
+        self.profile = profile
+        self.frame_index: Dict[Tuple[str, str], int] = {}
+        self.stack: List[Tuple[Any, int, str]] = []  # (frame, frame index, category)
+        self.library_depth = 0
+        self.start_ns = time.perf_counter_ns()
+
+    def _index(self, name: str, category: str) -> int:
+        key = (name, category)
+        index = self.frame_index.get(key)
+        if index is None:
+            index = self.frame_index[key] = len(self.profile.frames)
+            self.profile.frames.append(key)
+        return index
+
+    def __call__(self, frame, event, arg):
+        if event == "call":
+            if self.library_depth:
+                return
+            classified = _classify(frame)
+            if classified is None:
+                return
+            category, name = classified
+            index = self._index(name, category)
+            self.stack.append((frame, index, category))
+            if category in _LIBRARY_CATEGORIES:
+                self.library_depth += 1
+            elif category == "page" and name not in self.profile.pages:
+                self.profile.pages.append(name)
+            self.profile.events.append(("O", index, time.perf_counter_ns() - self.start_ns))
+        elif event == "return" and self.stack and self.stack[-1][0] is frame:
+            _, index, category = self.stack.pop()
+            if category in _LIBRARY_CATEGORIES:
+                self.library_depth -= 1
+            self.profile.events.append(("C", index, time.perf_counter_ns() - self.start_ns))
+
+    def finish(self, end_ns: int):
+        # Close anything left open by an exception escaping the script
+        while self.stack:
+            _, index, _ = self.stack.pop()
+            self.profile.events.append(("C", index, end_ns))
+
+class profile_rerun:
+    """Context manager wrapped around a script run
+
+    Does nothing unless profiling is on for the current session, and steps
+    aside if another profiler or debugger already owns sys.setprofile.
+    """
+
+    def __init__(self):
+        self.profile: Optional[RerunProfile] = None
+        self.recorder: Optional[_TimelineRecorder] = None
+
+    def __enter__(self):
+        try:
+            mode = st.session_state.get(PROFILER_MODE_KEY, "Off")
+        except Exception:
+            return self
+        if mode not in PROFILER_MODES[1:] or sys.getprofile() is not None:
+            return self
+
+        self.profile = RerunProfile(mode)
+        self.start_ns = time.perf_counter_ns()
+        if mode == "Timeline":
+            self.recorder = _TimelineRecorder(self.profile)
+            sys.setprofile(self.recorder)
+        else:
+            self.profile.stats = cProfile.Profile()
+            self.profile.stats.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profile is None:
+            return False
+
+        end_ns = time.perf_counter_ns() - self.start_ns
+        if self.recorder is not None:
+            sys.setprofile(None)
+            self.recorder.finish(end_ns)
+        else:
+            self.profile.stats.disable()
+            self.profile.stats.create_stats()
+
+        self.profile.duration_ns = end_ns
+        # st.rerun() and st.stop() end a run by raising
+        self.profile.interrupted = exc_type is not None
+        try:
+            _keep(self.profile)
+        except Exception as e:
+            logger.error(f"❌ Error storing rerun profile: {e}")
+        return False
+
+def _keep(profile: RerunProfile):
+    """Keep the slowest reruns of this session in a bounded min-heap"""
+    kept = st.session_state.setdefault(PROFILER_RERUNS_KEY, [])
+    entry = (profile.duration_ns, profile.sequence, profile)
+    if len(kept) < PROFILER_KEEP_SLOWEST:
+        heapq.heappush(kept, entry)
+    else:
+        heapq.heappushpop(kept, entry)
+
+def get_profiled_reruns(slowest: int = None) -> List[RerunProfile]:
+    """This session's kept reruns, slowest first"""
+    kept = st.session_state.get(PROFILER_RERUNS_KEY, [])
+    reruns = [profile for _, _, profile in sorted(kept, key=lambda entry: entry[:2], reverse=True)]
+    return reruns[:slowest] if slowest else reruns
+
+def to_speedscope(reruns: List[RerunProfile]) -> str:
+    """Speedscope evented profiles, one per rerun, with shared frames"""
+    frames: List[Dict[str, str]] = []
+    frame_ids: Dict[Tuple[str, str], int] = {}
+
+    def frame_id(name: str, category: str) -> int:
+        if (name, category) not in frame_ids:
+            frame_ids[(name, category)] = len(frames)
+            frames.append({"name": name, "file": category})
+        return frame_ids[(name, category)]
+
+    profiles = []
+    for rerun in reruns:
+        if rerun.mode != "Timeline":
+            continue
+        root = frame_id(f"rerun {rerun.sequence}", "script")
+        local = [frame_id(name, category) for name, category in rerun.frames]
+        end = rerun.duration_ns / 1e6
+        events = [{"type": "O", "frame": root, "at": 0}]
+        events += [{"type": kind, "frame": local[index], "at": at / 1e6} for kind, index, at in rerun.events]
+        events.append({"type": "C", "frame": root, "at": end})
+        profiles.append({
+            "type": "evented",
+            "name": f"#{rerun.sequence} {rerun.label} ({end:.0f} ms)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": end,
+            "events": events,
+        })
+
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": "Harem CRM reruns",
+        "exporter": "harem-crm-profiler",
+    })
+
+def to_folded_stacks(reruns: List[RerunProfile]) -> str:
+    """Folded stacks (stack;frames microseconds) for flamegraph.pl and friends"""
+    totals: Dict[str, int] = {}
+    for rerun in reruns:
+        if rerun.mode != "Timeline":
+            continue
+        stack = ["rerun"]
+        last = 0
+        for kind, index, at in rerun.events:
+            path = ";".join(stack)
+            totals[path] = totals.get(path, 0) + at - last
+            last = at
+            if kind == "O":
+                stack.append(rerun.frames[index][0])
+            elif len(stack) > 1:
+                stack.pop()
+        totals["rerun"] = totals.get("rerun", 0) + rerun.duration_ns - last
+    return "\n".join(f"{path} {ns // 1000}" for path, ns in totals.items() if ns >= 1000) + "\n"
+
+def to_pstats(reruns: List[RerunProfile]) -> Optional[bytes]:
+    """Merged cProfile stats (pstats dump format) for the given reruns"""
+    profiles = [rerun.stats for rerun in reruns if rerun.stats is not None]
+    if not profiles:
+        return None
+    stats = pstats.Stats(*profiles)
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    os.close(fd)
+    try:
+        stats.dump_stats(path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def show_profiler_switch():
+    """Sidebar switch for profiling this session's reruns
+
+    Rendered on every admin page: Streamlit drops a widget's state on any
+    rerun that doesn't draw it, which would switch profiling off as soon as
+    the admin went to the page they meant to profile.
+    """
+    try:
+        st.sidebar.selectbox(
+            "🔬 Rerun profiler",
+            PROFILER_MODES,
+            key=PROFILER_MODE_KEY,
+            help="Timeline records page functions, data calls, DataFrames, Plotly figures and widgets; "
+                 "cProfile records every Python call at higher overhead."
+        )
+    except Exception as e:
+        logger.error(f"❌ Error showing profiler switch: {e}")
+
+def show_profiler_panel():
+    """Kept reruns of this session and their exports"""
+    try:
+        st.caption(f"Profiling: {st.session_state.get(PROFILER_MODE_KEY, 'Off')} "
+                   f"(switch it with the rerun profiler in the sidebar)")
+
+        reruns = get_profiled_reruns()
+        if not reruns:
+            st.info("No profiled reruns yet. Turn profiling on and use the app.")
+            return
+
+        st.dataframe([rerun.summary() for rerun in reruns], use_container_width=True)
+
+        slowest = st.number_input("Export the slowest N reruns", min_value=1, max_value=len(reruns),
+                                  value=min(5, len(reruns)), key="profiler_export_count")
+        selected = reruns[:int(slowest)]
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button("Speedscope JSON", to_speedscope(selected),
+                               file_name=f"reruns_{stamp}.speedscope.json", mime="application/json")
+        with col2:
+            st.download_button("Folded stacks", to_folded_stacks(selected),
+                               file_name=f"reruns_{stamp}.folded", mime="text/plain")
+        with col3:
+            pstats_bytes = to_pstats(selected)
+            if pstats_bytes:
+                st.download_button("cProfile stats", pstats_bytes,
+                                   file_name=f"reruns_{stamp}.prof", mime="application/octet-stream")
+            else:
+                st.caption("cProfile stats need reruns profiled in cProfile mode.")
+
+        if st.button("Clear Profiled Reruns"):
+            st.session_state[PROFILER_RERUNS_KEY] = []
+            st.rerun()
+
+    except Exception as e:
+        logger.error(f"❌ Error showing rerun profiler: {e}")
+        st.error(f"Error displaying rerun profiler: {e}")
@@ -0,0 +1,265 @@
+"""
+Server-wide rate limiting for Harem CRM
+Token buckets keyed by user, client IP and action, kept in a SQLite file that
+every session and worker process on the host shares, so opening a new
+browser tab or landing on another worker doesn't reset anyone's allowance.
+Each check is a primary-key read and write per bucket inside one
+transaction; buckets that have refilled completely carry no state and are
+garbage collected by later checks.
+"""
+import streamlit as st
+import os
+import time
+import sqlite3
+import threading
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .registry import registry
+from .metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_DB_ENV = "RATE_LIMIT_DB"
+DEFAULT_RATE_LIMIT_DB = "data/rate_limits.sqlite3"
+
+# Proxies in front of the app that append to X-Forwarded-For. Entries left
+# of the one our outermost proxy added are client-supplied and can't be
+# trusted. The default 0 ignores the header and uses the socket peer: with
+# no proxy the whole header comes from the client. Set it to the length of
+# the real proxy chain when deploying behind one.
+TRUSTED_PROXY_HOPS_ENV = "TRUSTED_PROXY_HOPS"
+DEFAULT_TRUSTED_PROXY_HOPS = 0
+
+# Full buckets are swept at most this often per process, in batches
+GC_INTERVAL = 60.0
+GC_BATCH = 1000
+
+@dataclass(frozen=True)
+class RateLimit:
+    """`capacity` requests, refilled evenly over `period` seconds"""
+    capacity: int
+    period: float = 3600.0
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+RATE_LIMITS: Dict[str, RateLimit] = {
+    'login': RateLimit(5),          # 5 login attempts per hour
+    'application': RateLimit(3),    # 3 applications per hour
+    'update': RateLimit(20),        # 20 updates per hour
+    'view': RateLimit(100),         # 100 views per hour
+}
+DEFAULT_RATE_LIMIT = RateLimit(10)
+
+# Several people can share an address behind NAT or an office proxy
+IP_CAPACITY_FACTOR = 5
+
+# Actions that also get a bucket per user and address, so one client can't
+# use up a named account's allowance alone; the account-wide bucket stays
+# as the overall limit, with room for several clients' worth of attempts
+CLIENT_KEYED_ACTIONS = {'login'}
+ACCOUNT_CAPACITY_FACTOR = 4
+
+RATE_LIMIT_CHECKS = metrics.counter("rate_limit_checks", "Rate limit checks by action and outcome",
+                                    ["action", "result"])
+
+def _refill(tokens: float, updated_at: float, now: float, limit: RateLimit) -> float:
+    return min(limit.capacity, tokens + max(0.0, now - updated_at) * limit.rate)
+
+class SQLiteBuckets:
+    """Token buckets in a WAL-mode SQLite file shared between processes"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    full_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS rate_buckets_full ON rate_buckets (full_at);
+            """)
+
+    def consume(self, buckets: List[Tuple[str, RateLimit]], now: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Take `cost` tokens from every bucket, or from none; (allowed, fewest tokens left)"""
+        allowed, remaining, levels = True, float("inf"), []
+        with self._lock:
+            # The write lock makes read-then-write atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, limit in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+                    ).fetchone()
+                    level = _refill(row[0], row[1], now, limit) if row else float(limit.capacity)
+                    if level < cost:
+                        allowed = False
+                    levels.append((key, limit, level))
+                    remaining = min(remaining, level)
+
+                if allowed:
+                    self._conn.executemany("""
+                        INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)
+                    """, [(key, level - cost, now, now + (limit.capacity - level + cost) / limit.rate)
+                          for key, limit, level in levels])
+                    remaining -= cost
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, remaining
+
+    def collect(self, now: float) -> int:
+        """Delete buckets that have refilled completely"""
+        with self._lock:
+            cursor = self._conn.execute("""
+                DELETE FROM rate_buckets WHERE key IN (
+                    SELECT key FROM rate_buckets WHERE full_at <= ? LIMIT ?
+                )
+            """, (now, GC_BATCH))
+            return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+    def reset(self, keys: List[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM rate_buckets WHERE key = ?", [(key,) for key in keys])
+
+class MemoryBuckets:
+    """Per-process fallback with the same interface, used if the file can't be opened"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: List[Tuple[str, RateLimit]], now: float, cost: float = 1.0) -> Tuple[bool, float]:
+        with self._lock:
+            levels = []
+            for key, limit in buckets:
+                bucket = self._buckets.get(key)
+                levels.append((key, limit,
+                               _refill(bucket[0], bucket[1], now, limit) if bucket else float(limit.capacity)))
+            remaining = min(level for _, _, level in levels)
+            if remaining < cost:
+                return False, remaining
+            for key, limit, level in levels:
+                self._buckets[key] = (level - cost, now, now + (limit.capacity - level + cost) / limit.rate)
+            return True, remaining - cost
+
+    def collect(self, now: float) -> int:
+        with self._lock:
+            expired = [key for key, bucket in self._buckets.items() if bucket[2] <= now][:GC_BATCH]
+            for key in expired:
+                del self._buckets[key]
+            return len(expired)
+
+    def count(self) -> int:
+        return len(self._buckets)
+
+    def reset(self, keys: List[str]):
+        with self._lock:
+            for key in keys:
+                self._buckets.pop(key, None)
+
+class RateLimiter:
+    """Token-bucket limits per action, applied to each of user and IP"""
+
+    def __init__(self, db_path: str = None, limits: Dict[str, RateLimit] = None):
+        self.limits = limits or RATE_LIMITS
+        self.db_path = db_path or os.environ.get(RATE_LIMIT_DB_ENV, DEFAULT_RATE_LIMIT_DB)
+        try:
+            self.store = SQLiteBuckets(self.db_path)
+            logger.info(f"✅ Rate limits shared through {self.db_path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Rate limits kept per process, {self.db_path} unavailable: {e}")
+            self.store = MemoryBuckets()
+        self._next_gc = time.time() + GC_INTERVAL
+        self.stats = {"checks": 0, "denied": 0, "collected": 0}
+
+    def buckets(self, action: str, user_id: Optional[str] = None,
+                ip_address: Optional[str] = None) -> List[Tuple[str, RateLimit]]:
+        limit = self.limits.get(action, DEFAULT_RATE_LIMIT)
+        buckets = []
+        if user_id and action in CLIENT_KEYED_ACTIONS:
+            buckets.append((f"user:{user_id}:{action}",
+                            RateLimit(limit.capacity * ACCOUNT_CAPACITY_FACTOR, limit.period)))
+            if ip_address:
+                buckets.append((f"user:{user_id}@{ip_address}:{action}", limit))
+        elif user_id:
+            buckets.append((f"user:{user_id}:{action}", limit))
+        if ip_address:
+            buckets.append((f"ip:{ip_address}:{action}",
+                            RateLimit(limit.capacity * IP_CAPACITY_FACTOR, limit.period)))
+        return buckets
+
+    def check(self, action: str, user_id: Optional[str] = None, ip_address: Optional[str] = None,
+              cost: float = 1.0) -> bool:
+        """Spend a token for this action from the user's and the IP's buckets; False if either is empty"""
+        buckets = self.buckets(action, user_id, ip_address)
+        if not buckets:
+            return True
+
+        now = time.time()
+        allowed, _ = self.store.consume(buckets, now, cost)
+
+        self.stats["checks"] += 1
+        if not allowed:
+            self.stats["denied"] += 1
+        RATE_LIMIT_CHECKS.labels(action, "allowed" if allowed else "denied").inc()
+
+        if now >= self._next_gc:
+            self._next_gc = now + GC_INTERVAL
+            try:
+                self.stats["collected"] += self.store.collect(now)
+            except Exception as e:
+                logger.warning(f"⚠️ Rate limit garbage collection failed: {e}")
+        return allowed
+
+    def reset(self, action: str, user_id: Optional[str] = None, ip_address: Optional[str] = None):
+        """Forget the user's buckets for an action, e.g. after a successful login
+
+        The address keeps its bucket, so a login can't clear the limit on
+        attempts against other accounts from the same client.
+        """
+        self.store.reset([key for key, _ in self.buckets(action, user_id, ip_address) if key.startswith("user:")])
+
+    def status(self) -> Dict[str, object]:
+        return {"store": type(self.store).__name__, "path": self.db_path, "buckets": self.store.count(), **self.stats}
+
+# Global rate limiter instance
+rate_limiter = registry.register("rate_limiter", RateLimiter)
+
+def client_ip() -> Optional[str]:
+    """The socket peer, or with TRUSTED_PROXY_HOPS set, the address our own proxy saw
+
+    Only the X-Forwarded-For entry added by the outermost trusted proxy is
+    used (the rightmost, with one proxy); anything to its left was sent by
+    the client and can be anything.
+    """
+    try:
+        hops = int(os.environ.get(TRUSTED_PROXY_HOPS_ENV, DEFAULT_TRUSTED_PROXY_HOPS))
+        forwarded = st.context.headers.get("X-Forwarded-For") if hops > 0 else None
+        if forwarded:
+            entries = [entry.strip() for entry in forwarded.split(",") if entry.strip()]
+            if len(entries) >= hops:
+                return entries[-hops]
+        ip_address = getattr(st.context, "ip_address", None)
+        return ip_address if isinstance(ip_address, str) else None
+    except Exception:
+        return None
@@ -0,0 +1,120 @@
+"""
+Lazy component registry for Harem CRM
+Module-level managers are registered here instead of being built at import
+time, so pages that never touch a subsystem never pay for creating it.
+"""
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class _Component:
+    """Bookkeeping for one registered component"""
+
+    __slots__ = ("name", "factory", "on_init", "warm", "instance", "init_seconds", "initialized_at", "lock")
+
+    def __init__(self, name: str, factory: Callable[[], Any], on_init: Optional[Callable[[Any], None]], warm: bool):
+        self.name = name
+        self.factory = factory
+        self.on_init = on_init
+        self.warm = warm
+        self.instance = None
+        self.init_seconds = None
+        self.initialized_at = None
+        self.lock = threading.Lock()
+
+class ComponentRegistry:
+    """Creates registered singletons on first use and records init time"""
+
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+
+    def register(self, name: str, factory: Callable[[], Any], on_init: Callable[[Any], None] = None,
+                 warm: bool = False) -> "LazyProxy":
+        """Register a factory and return a proxy that stands in for the instance
+
+        `on_init` runs once right after the instance is created; components
+        registered with `warm=True` are created by warm_up().
+        """
+        self._components[name] = _Component(name, factory, on_init, warm)
+        return LazyProxy(self, name)
+
+    def get(self, name: str) -> Any:
+        """Get a component, creating it on first use"""
+        component = self._components[name]
+        if component.instance is not None:
+            return component.instance
+
+        with component.lock:
+            if component.instance is None:
+                start = time.perf_counter()
+                instance = component.factory()
+                if component.on_init:
+                    component.on_init(instance)
+                component.init_seconds = time.perf_counter() - start
+                component.initialized_at = datetime.now().isoformat()
+                component.instance = instance
+                logger.info(f"✅ {name} initialized in {component.init_seconds * 1000:.1f}ms")
+        return component.instance
+
+    def is_initialized(self, name: str) -> bool:
+        return self._components[name].instance is not None
+
+    def warm_up(self, names: Iterable[str] = None, background: bool = False) -> Optional[threading.Thread]:
+        """Create components ahead of first use (all `warm` ones by default)"""
+        targets = list(names) if names is not None else [c.name for c in self._components.values() if c.warm]
+
+        def run():
+            for name in targets:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"❌ Error warming up {name}: {e}")
+
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name="component-warm-up")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def init_report(self) -> List[Dict[str, Any]]:
+        """Per-component initialization status and time"""
+        return [
+            {
+                "component": component.name,
+                "initialized": component.instance is not None,
+                "init_ms": round(component.init_seconds * 1000, 2) if component.init_seconds is not None else None,
+                "initialized_at": component.initialized_at
+            }
+            for component in self._components.values()
+        ]
+
+class LazyProxy:
+    """Module-level stand-in that forwards to the registered instance"""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ComponentRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self._registry.is_initialized(self._name) else "not initialized"
+        return f"<LazyProxy {self._name} ({state})>"
+
+# Process-wide registry
+registry = ComponentRegistry()
@@ -0,0 +1,237 @@
+"""
+Record sanitization for Harem CRM
+Cleans a whole form submission in one pass with rules chosen per field type.
+The patterns are compiled once at import, and bleach runs only on strings
+that contain characters it would change, so choices, numbers, dates and
+plain sentences skip the HTML parser entirely. Free text gets exactly the
+result SecurityManager.sanitize_input has always produced.
+"""
+import re
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Union
+
+from bleach.sanitizer import Cleaner
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Characters bleach rewrites: markup, and the control characters and CR that
+# its HTML tokenizer replaces or normalizes. Strings without any of them come
+# out of bleach.clean unchanged.
+_NEEDS_BLEACH = re.compile(r'[<>&\x00-\x08\x0b-\x1f]')
+
+# bleach.clean builds a Cleaner per call; Cleaners aren't thread-safe, so
+# each thread keeps its own
+_cleaners = threading.local()
+
+def _bleach(value: str) -> str:
+    cleaner = getattr(_cleaners, "cleaner", None)
+    if cleaner is None:
+        cleaner = _cleaners.cleaner = Cleaner(tags=[], attributes={}, strip=True)
+    return cleaner.clean(value)
+
+# Whole SQL keywords, then conditions such as "OR 1=1", then keyword
+# phrases. Keyword removals leave non-word characters on both sides, so the
+# phrases (UNION SELECT, DROP TABLE, ...) can only reappear when a condition
+# removal exposes a new word; otherwise they are skipped.
+_SQL_KEYWORDS = re.compile(r'(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)', re.IGNORECASE)
+_SQL_CONDITIONS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\b(OR|AND)\s+\d+\s*=\s*\d+)',
+    r'(\b(OR|AND)\s+\w+\s*=\s*\w+)',
+))
+_SQL_PHRASES = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\bUNION\s+SELECT\b)',
+    r'(\bDROP\s+TABLE\b)',
+    r'(\bDELETE\s+FROM\b)',
+    r'(\bINSERT\s+INTO\b)',
+    r'(\bUPDATE\s+SET\b)',
+))
+
+# Script patterns need '<', ':' or '='; cheap membership tests skip them for
+# ordinary sentences
+_SCRIPT_TAGS = tuple(re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in (
+    r'<script[^>]*>.*?</script>',
+    r'<iframe[^>]*>.*?</iframe>',
+    r'<object[^>]*>.*?</object>',
+    r'<embed[^>]*>.*?</embed>',
+))
+_JAVASCRIPT_URL = re.compile(r'javascript:', re.IGNORECASE)
+_EVENT_HANDLER = re.compile(r'on\w+\s*=', re.IGNORECASE)
+
+_WHITESPACE = re.compile(r'\s+')
+_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_PHONE_DISALLOWED = re.compile(r'[^\d+\-\s().]')
+_NON_DIGIT = re.compile(r'\D')
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+FieldSpec = Union[str, Dict[str, Any]]
+
+def sanitize_text(value: str) -> str:
+    """Strip markup, SQL keywords and script fragments from free text"""
+    if not value:
+        return ""
+    sanitized = value
+    if _NEEDS_BLEACH.search(sanitized):
+        sanitized = _bleach(sanitized)
+    sanitized = _SQL_KEYWORDS.sub('', sanitized)
+    if '=' in sanitized:
+        before = sanitized
+        for pattern in _SQL_CONDITIONS:
+            sanitized = pattern.sub('', sanitized)
+        if sanitized != before:
+            for pattern in _SQL_PHRASES:
+                sanitized = pattern.sub('', sanitized)
+    # Same order as the original pipeline: tags, javascript:, then handlers
+    if '<' in sanitized:
+        sanitized = _SCRIPT_TAGS[0].sub('', sanitized)
+    if ':' in sanitized:
+        sanitized = _JAVASCRIPT_URL.sub('', sanitized)
+    if '=' in sanitized:
+        sanitized = _EVENT_HANDLER.sub('', sanitized)
+    if '<' in sanitized:
+        for pattern in _SCRIPT_TAGS[1:]:
+            sanitized = pattern.sub('', sanitized)
+    return sanitized.strip()
+
+def _clean_text(value: Any, spec: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        return sanitize_text(value)
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_clean_text(item, spec) for item in value]
+    if isinstance(value, dict):
+        return {key: _clean_text(item, spec) for key, item in value.items()}
+    return sanitize_text(str(value))
+
+def _clean_line(value: Any, spec: Dict[str, Any]) -> str:
+    return _WHITESPACE.sub(' ', sanitize_text(str(value)))
+
+def _clean_email(value: Any, spec: Dict[str, Any]) -> str:
+    value = str(value).strip()
+    return value if _EMAIL.match(value) else ""
+
+def _clean_phone(value: Any, spec: Dict[str, Any]) -> str:
+    value = _PHONE_DISALLOWED.sub('', str(value)).strip()
+    return value if 10 <= len(_NON_DIGIT.sub('', value)) <= 15 else ""
+
+def _clean_int(value: Any, spec: Dict[str, Any]) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+def _clean_number(value: Any, spec: Dict[str, Any]) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _clean_bool(value: Any, spec: Dict[str, Any]) -> bool:
+    return bool(value)
+
+def _clean_date(value: Any, spec: Dict[str, Any]) -> Optional[str]:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    value = str(value).strip()
+    return value if _ISO_DATE.match(value) else None
+
+def _clean_choice(value: Any, spec: Dict[str, Any]) -> str:
+    value = value if isinstance(value, str) else str(value)
+    options = spec.get('options')
+    if options is not None and value not in options:
+        return ""
+    # Options come from our own lists; only a tampered value has markup
+    return sanitize_text(value) if _NEEDS_BLEACH.search(value) else value.strip()
+
+def _clean_choices(value: Any, spec: Dict[str, Any]) -> list:
+    if isinstance(value, str) or not hasattr(value, '__iter__'):
+        value = [value]
+    cleaned = (_clean_choice(item, spec) for item in value)
+    return [item for item in cleaned if item]
+
+FIELD_CLEANERS: Dict[str, Callable[[Any, Dict[str, Any]], Any]] = {
+    'text': _clean_text,
+    'line': _clean_line,
+    'email': _clean_email,
+    'phone': _clean_phone,
+    'int': _clean_int,
+    'number': _clean_number,
+    'bool': _clean_bool,
+    'date': _clean_date,
+    'choice': _clean_choice,
+    'choices': _clean_choices,
+}
+
+# Field types of the comprehensive application form: text inputs are single
+# lines, text areas free text, selectboxes and multiselects choices
+COMPREHENSIVE_APPLICATION_SCHEMA: Dict[str, FieldSpec] = {
+    # Basic information
+    'full_name': 'line', 'email': 'email', 'phone': 'phone', 'age': 'int', 'location': 'line',
+    'occupation': 'line', 'education': 'choice', 'relationship_status': 'choice',
+    # Physical attributes
+    'height': 'line', 'weight': 'line', 'body_type': 'choice', 'hair_color': 'choice',
+    'eye_color': 'choice', 'tattoos': 'choice',
+    # Experience and interests
+    'selected_categories': 'choices', 'experience': 'choice', 'interests': 'text', 'limits': 'text',
+    # Availability
+    'available_days': 'choices', 'available_times': 'choices', 'duration_preferences': 'choices',
+    'commitment_level': 'choice', 'travel_willingness': 'choice', 'time_commitment': 'choice',
+    # Lifestyle
+    'smoking': 'choice', 'drinking': 'choice', 'drugs': 'choice', 'pets': 'line', 'hobbies': 'text',
+    'living_situation': 'choice',
+    # Content creation
+    'content_interest': 'choice', 'content_types': 'choices', 'content_platforms': 'choices',
+    'content_comfort': 'choice',
+    # Financial
+    'financial_interest': 'choice', 'findom_interest': 'bool', 'cash_pig': 'bool', 'cash_pig_control': 'bool',
+    'recruitment_interest': 'bool', 'payment_methods': 'choices', 'tribute_amounts': 'choice',
+    # Verification
+    'reference_contact': 'line', 'social_media_handles': 'line', 'id_verification': 'bool',
+    'background_check': 'bool', 'video_call_verification': 'bool',
+    # About you
+    'why_interested': 'text', 'what_hoping_to_gain': 'text', 'previous_experience': 'text',
+    'questions_for_us': 'text', 'how_heard_about_us': 'choice',
+    # Drug usage
+    'drugs_currently_using': 'choices', 'drugs_comfortable_with': 'choices',
+    'drug_usage_frequency': 'choice', 'drug_comfort_level': 'choice',
+    # STI testing
+    'sti_testing_status': 'choice', 'last_sti_test_date': 'date', 'sti_test_results': 'choice',
+    'sti_eligibility_status': 'choice', 'sti_test_upload': 'line',
+}
+
+def sanitize_record(record: Dict[str, Any], schema: Dict[str, FieldSpec], default: str = 'text') -> Dict[str, Any]:
+    """Sanitize every field of a record by its schema type
+
+    A spec is a type name or a dict with 'type' and optionally 'options'
+    (allowed choices) and 'max_length' (applied to the raw input). Fields
+    missing from the schema are treated as `default`. Values failing
+    validation (a malformed email, a choice not offered) come back empty so
+    required-field checks reject them.
+    """
+    cleaned = {}
+    for field, value in record.items():
+        spec = schema.get(field, default)
+        if isinstance(spec, str):
+            spec = {'type': spec}
+        if value is None:
+            cleaned[field] = None
+            continue
+        # Cut before cleaning so an escaped entity is never split
+        max_length = spec.get('max_length')
+        if max_length and isinstance(value, str):
+            value = value[:max_length]
+        try:
+            cleaned[field] = FIELD_CLEANERS[spec['type']](value, spec)
+        except Exception as e:
+            logger.error(f"❌ Error sanitizing field {field}: {e}")
+            cleaned[field] = None
+    return cleaned
@@ -0,0 +1,323 @@
+"""
+Full-text search over applications for Harem CRM
+"""
+import streamlit as st
+import re
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Answer keys that feed the weighted columns; every other text answer is
+# indexed as free text
+NAME_FIELDS = {"full_name", "name", "content_alias"}
+LOCATION_FIELDS = {"location", "city", "state", "country"}
+OCCUPATION_FIELDS = {"occupation", "profession"}
+
+# bm25 weights for (name, location, occupation, answers)
+COLUMN_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def _collect_fields(data: Any, fields: Dict[str, List[str]], key: str = ""):
+    """Walk nested answers and bucket text values by column"""
+    if isinstance(data, dict):
+        for child_key, value in data.items():
+            _collect_fields(value, fields, str(child_key).lower())
+    elif isinstance(data, (list, tuple, set)):
+        for value in data:
+            _collect_fields(value, fields, key)
+    elif isinstance(data, str) and data.strip():
+        if key in NAME_FIELDS:
+            fields["name"].append(data)
+        elif key in LOCATION_FIELDS:
+            fields["location"].append(data)
+        elif key in OCCUPATION_FIELDS:
+            fields["occupation"].append(data)
+        else:
+            fields["answers"].append(data)
+
+def build_match_query(query: str) -> str:
+    """Translate a search box query into a safe FTS5 MATCH expression
+
+    Words are ANDed together, "quoted text" is matched as a phrase and a
+    trailing * makes a word a prefix match. Everything else is quoted so
+    user input can never produce an FTS5 syntax error.
+    """
+    terms = []
+    for phrase, word in _QUERY_TOKEN.findall(query or ""):
+        words = _WORD.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        if word.endswith("*"):
+            term += "*"
+        terms.append(term)
+    return " ".join(terms)
+
+class ApplicationSearchIndex:
+    """Incrementally maintained SQLite FTS5 index of applications
+
+    The index defaults to an in-memory database: it holds decrypted answers,
+    so it is rebuilt from the encrypted store at startup rather than written
+    to disk in plaintext.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS application_docs (
+                    doc_id INTEGER PRIMARY KEY,
+                    app_id TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    status TEXT,
+                    name TEXT,
+                    UNIQUE (app_id, source)
+                )
+            """)
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS application_fts USING fts5(
+                    name, location, occupation, answers,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            """)
+            # Make the built-in rank column use our column weights so
+            # ORDER BY rank LIMIT k takes the FTS5 top-k fast path
+            weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+            self._conn.execute(
+                "INSERT INTO application_fts(application_fts, rank) VALUES ('rank', ?)",
+                (f"bm25({weights})",)
+            )
+
+    def _document(self, data: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        fields = {"name": [], "location": [], "occupation": [], "answers": []}
+        _collect_fields(data, fields)
+        return tuple(" ".join(fields[column]) for column in ("name", "location", "occupation", "answers"))
+
+    def _upsert(self, app_id: str, data: Dict[str, Any], status: Optional[str], source: str):
+        """Insert or replace one document; caller holds the lock and transaction"""
+        document = self._document(data)
+        row = self._conn.execute(
+            "SELECT doc_id FROM application_docs WHERE app_id = ? AND source = ?", (app_id, source)
+        ).fetchone()
+
+        if row:
+            doc_id = row[0]
+            self._conn.execute("DELETE FROM application_fts WHERE rowid = ?", (doc_id,))
+            self._conn.execute(
+                "UPDATE application_docs SET status = ?, name = ? WHERE doc_id = ?", (status, document[0], doc_id)
+            )
+        else:
+            doc_id = self._conn.execute(
+                "INSERT INTO application_docs (app_id, source, status, name) VALUES (?, ?, ?, ?)",
+                (app_id, source, status, document[0])
+            ).lastrowid
+
+        self._conn.execute(
+            "INSERT INTO application_fts (rowid, name, location, occupation, answers) VALUES (?, ?, ?, ?, ?)",
+            (doc_id, *document)
+        )
+
+    def index_application(self, app_id: str, data: Dict[str, Any], status: Optional[str] = None,
+                          source: str = "local"):
+        """Add or re-index a single application"""
+        try:
+            with self._lock, self._conn:
+                self._upsert(app_id, data, status, source)
+        except Exception as e:
+            logger.error(f"❌ Error indexing application {app_id}: {e}")
+
+    def index_applications(self, applications: Iterable[Tuple[str, Dict[str, Any], Optional[str]]],
+                           source: str = "local") -> int:
+        """Bulk index (app_id, data, status) tuples in one transaction"""
+        count = 0
+        try:
+            with self._lock, self._conn:
+                for app_id, data, status in applications:
+                    self._upsert(app_id, data, status, source)
+                    count += 1
+            logger.info(f"✅ Indexed {count} {source} applications")
+        except Exception as e:
+            logger.error(f"❌ Error bulk indexing {source} applications: {e}")
+        return count
+
+    def update_status(self, app_id: str, status: str, source: str = "local"):
+        """Update the status filter of an indexed application"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE application_docs SET status = ? WHERE app_id = ? AND source = ?", (status, app_id, source)
+                )
+        except Exception as e:
+            logger.error(f"❌ Error updating indexed status for {app_id}: {e}")
+
+    def remove_application(self, app_id: str, source: str = "local"):
+        """Drop an application from the index"""
+        try:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    "SELECT doc_id FROM application_docs WHERE app_id = ? AND source = ?", (app_id, source)
+                ).fetchone()
+                if row:
+                    self._conn.execute("DELETE FROM application_fts WHERE rowid = ?", (row[0],))
+                    self._conn.execute("DELETE FROM application_docs WHERE doc_id = ?", (row[0],))
+        except Exception as e:
+            logger.error(f"❌ Error removing {app_id} from index: {e}")
+
+    def index_secure_records(self, manager) -> int:
+        """Index every application held by a SecureDataManager"""
+        def records():
+            for header in manager.get_all_applications():
+                data = manager.load_application_body(header["application_id"])
+                if data is not None:
+                    yield header["application_id"], data, header.get("status")
+        return self.index_applications(records(), source="local")
+
+    def index_supabase_rows(self, rows: List[Dict[str, Any]]) -> int:
+        """Index rows from the Supabase applications table"""
+        return self.index_applications(
+            ((str(row.get("id")), row, row.get("status")) for row in rows if row.get("id") is not None),
+            source="supabase"
+        )
+
+    def search(self, query: str, limit: int = 20, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ranked top-k search supporting prefix (word*) and "phrase" queries"""
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        status_clause = "WHERE d.status = ?" if status else ""
+        # Without a status filter the inner query can stop at `limit` hits
+        inner_limit = "LIMIT ?" if not status else ""
+        sql = f"""
+            SELECT d.app_id, d.source, d.status, d.name, hits.rank, hits.snippet
+            FROM (
+                SELECT rowid, rank, snippet(application_fts, -1, '**', '**', '…', 12) AS snippet
+                FROM application_fts
+                WHERE application_fts MATCH ?
+                ORDER BY rank
+                {inner_limit}
+            ) AS hits
+            JOIN application_docs d ON d.doc_id = hits.rowid
+            {status_clause}
+            ORDER BY hits.rank
+            LIMIT ?
+        """
+        params = [match] + ([status] if status else [limit]) + [limit]
+
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"❌ Search failed for {query!r}: {e}")
+            return []
+
+        return [
+            {
+                "app_id": app_id,
+                "source": source,
+                "status": app_status,
+                "name": name,
+                "score": round(-rank, 6),
+                "snippet": snippet
+            }
+            for app_id, source, app_status, name, rank, snippet in rows
+        ]
+
+    def count(self) -> int:
+        """Number of indexed applications"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM application_docs").fetchone()[0]
+
+    def clear(self):
+        """Remove everything from the index"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM application_fts")
+            self._conn.execute("DELETE FROM application_docs")
+
+# The index get_application_search_index last built, for writers that must
+# not trigger a build themselves
+_built_index: Optional[ApplicationSearchIndex] = None
+
+def built_application_search_index() -> Optional[ApplicationSearchIndex]:
+    """The process's index if one has been built, without building it"""
+    return _built_index
+
+@st.cache_resource
+def get_application_search_index() -> ApplicationSearchIndex:
+    """Build the process-wide index from local secure records and Supabase"""
+    global _built_index
+    index = ApplicationSearchIndex()
+    # Published first, like the secure-records hook, so writes made while
+    # the build runs still reach it
+    _built_index = index
+
+    try:
+        from config.secure_data_manager import secure_data_manager
+        # Attach first so applications saved during the build are not missed
+        secure_data_manager.search_index = index
+        index.index_secure_records(secure_data_manager)
+    except Exception as e:
+        logger.warning(f"⚠️ Local applications not indexed: {e}")
+
+    try:
+        from .database import get_applications
+        index.index_supabase_rows(get_applications())
+    except Exception as e:
+        logger.warning(f"⚠️ Supabase applications not indexed: {e}")
+
+    return index
+
+def show_application_search():
+    """Search box and ranked results for the admin applications page"""
+    try:
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            query = st.text_input(
+                "🔍 Search applications",
+                key="application_search_query",
+                help='Search names, locations, occupations and answers. Use "quotes" for phrases and word* for prefixes.'
+            )
+
+        with col2:
+            status = st.selectbox("Status", ["All", "pending", "approved", "rejected"], key="application_search_status")
+
+        if not query:
+            return
+
+        index = get_application_search_index()
+        results = index.search(query, limit=50, status=None if status == "All" else status)
+
+        st.caption(f"{len(results)} matches across {index.count()} indexed applications")
+        if results:
+            st.dataframe(
+                [
+                    {
+                        "ID": result["app_id"],
+                        "Name": result["name"] or "N/A",
+                        "Status": result["status"] or "N/A",
+                        "Source": result["source"],
+                        "Match": result["snippet"],
+                        "Score": result["score"]
+                    }
+                    for result in results
+                ],
+                use_container_width=True
+            )
+
+    except Exception as e:
+        logger.error(f"❌ Error showing application search: {e}")
+        st.error(f"Error searching applications: {e}")
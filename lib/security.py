@@ -4,19 +4,34 @@ Security utilities for Harem CRM
 import streamlit as st
 import hashlib
 import secrets
-import bcrypt
-import bleach
+import threading
+import time
+from collections import OrderedDict
 import re
-from typing import Optional, Dict, Any, List
+from typing import Callable, Optional, Dict, Any, List
 import logging
 from datetime import datetime, timedelta
 import jwt
 import os
 
+from .password_hashing import password_hasher
+from .credentials import credential_store
+from .rate_limiter import rate_limiter, client_ip
+from .sanitization import sanitize_text, sanitize_record
+from .security_log import security_event_log
+from .breach_filter import get_breach_filter
+from .session_registry import session_registry, client_user_agent
+from .metrics import metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Verified session tokens remembered per process
+TOKEN_CACHE_SIZE = 1024
+
+TOKEN_CHECKS = metrics.counter("session_token_checks", "Session token checks by outcome", ["result"])
+
 class SecurityManager:
     """Comprehensive security management for the CRM system"""
     
@@ -26,19 +41,26 @@ class SecurityManager:
         self.lockout_duration = 900  # 15 minutes
         
     def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt"""
+        """Hash password using bcrypt on the hashing pool"""
         try:
-            salt = bcrypt.gensalt()
-            hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-            return hashed.decode('utf-8')
+            return password_hasher.hash(password)
         except Exception as e:
             logger.error(f"❌ Error hashing password: {e}")
             return None
     
-    def verify_password(self, password: str, hashed: str) -> bool:
-        """Verify password against hash"""
+    def verify_password(self, password: str, hashed: str,
+                        on_rehash: Optional[Callable[[str], None]] = None) -> bool:
+        """Verify password against hash
+        
+        When the hash was made at a lower cost than BCRYPT_ROUNDS, a successful
+        check re-hashes the password in the background and passes the new hash
+        to on_rehash for storage.
+        """
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+            verified = password_hasher.verify(password, hashed)
+            if verified and on_rehash and password_hasher.needs_rehash(hashed):
+                password_hasher.upgrade(password, on_rehash)
+            return verified
         except Exception as e:
             logger.error(f"❌ Error verifying password: {e}")
             return False
@@ -46,49 +68,19 @@ class SecurityManager:
     def sanitize_input(self, user_input: str) -> str:
         """Sanitize user input to prevent XSS and injection attacks"""
         try:
-            if not user_input:
-                return ""
-            
-            # Remove HTML tags and dangerous content
-            sanitized = bleach.clean(user_input, 
-                                   tags=[], 
-                                   attributes={}, 
-                                   strip=True)
-            
-            # Remove SQL injection patterns
-            sql_patterns = [
-                r'(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)',
-                r'(\b(OR|AND)\s+\d+\s*=\s*\d+)',
-                r'(\b(OR|AND)\s+\w+\s*=\s*\w+)',
-                r'(\bUNION\s+SELECT\b)',
-                r'(\bDROP\s+TABLE\b)',
-                r'(\bDELETE\s+FROM\b)',
-                r'(\bINSERT\s+INTO\b)',
-                r'(\bUPDATE\s+SET\b)',
-            ]
-            
-            for pattern in sql_patterns:
-                sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
-            
-            # Remove script tags and javascript
-            script_patterns = [
-                r'<script[^>]*>.*?</script>',
-                r'javascript:',
-                r'on\w+\s*=',
-                r'<iframe[^>]*>.*?</iframe>',
-                r'<object[^>]*>.*?</object>',
-                r'<embed[^>]*>.*?</embed>',
-            ]
-            
-            for pattern in script_patterns:
-                sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE | re.DOTALL)
-            
-            return sanitized.strip()
-            
+            return sanitize_text(user_input)
         except Exception as e:
             logger.error(f"❌ Error sanitizing input: {e}")
             return ""
     
+    def sanitize_record(self, record: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Sanitize a whole form submission, field by field type"""
+        try:
+            return sanitize_record(record, schema)
+        except Exception as e:
+            logger.error(f"❌ Error sanitizing record: {e}")
+            return {}
+    
     def validate_email(self, email: str) -> bool:
         """Validate email format"""
         try:
@@ -155,38 +147,13 @@ class SecurityManager:
             return None
     
     def check_rate_limit(self, user_id: str, action: str) -> bool:
-        """Check if user has exceeded rate limits"""
+        """Check if user or their IP address has exceeded rate limits"""
         try:
-            # Get current rate limit data from session state
-            if 'rate_limits' not in st.session_state:
-                st.session_state.rate_limits = {}
-            
-            user_limits = st.session_state.rate_limits.get(user_id, {})
-            action_limits = user_limits.get(action, {'count': 0, 'last_reset': datetime.now()})
-            
-            # Reset counter if more than 1 hour has passed
-            if datetime.now() - action_limits['last_reset'] > timedelta(hours=1):
-                action_limits = {'count': 0, 'last_reset': datetime.now()}
-            
-            # Check limits based on action
-            limits = {
-                'login': 5,  # 5 login attempts per hour
-                'application': 3,  # 3 applications per hour
-                'update': 20,  # 20 updates per hour
-                'view': 100  # 100 views per hour
-            }
-            
-            limit = limits.get(action, 10)
-            
-            if action_limits['count'] >= limit:
+            # Token buckets shared by every session and worker process
+            if not rate_limiter.check(action, user_id=user_id, ip_address=client_ip()):
                 logger.warning(f"❌ Rate limit exceeded for user {user_id}, action {action}")
                 return False
             
-            # Increment counter
-            action_limits['count'] += 1
-            user_limits[action] = action_limits
-            st.session_state.rate_limits[user_id] = user_limits
-            
             logger.info(f"✅ Rate limit check passed for user {user_id}, action {action}")
             return True
             
@@ -195,27 +162,9 @@ class SecurityManager:
             return False
     
     def log_security_event(self, user_id: str, event: str, details: str = ""):
-        """Log security events"""
+        """Log security events to the persistent event log (non-blocking)"""
         try:
-            timestamp = datetime.now().isoformat()
-            log_entry = {
-                'timestamp': timestamp,
-                'user_id': user_id,
-                'event': event,
-                'details': details,
-                'ip_address': '127.0.0.1'  # In production, get real IP
-            }
-            
-            # Store in session state for now (in production, use proper logging)
-            if 'security_logs' not in st.session_state:
-                st.session_state.security_logs = []
-            
-            st.session_state.security_logs.append(log_entry)
-            
-            # Keep only last 1000 entries
-            if len(st.session_state.security_logs) > 1000:
-                st.session_state.security_logs = st.session_state.security_logs[-1000:]
-            
+            security_event_log.append(user_id, event, details, client_ip())
             logger.info(f"🔒 Security event logged: {event} for user {user_id}")
             
         except Exception as e:
@@ -259,9 +208,17 @@ class SecurityManager:
             
             # Common password check
             common_passwords = ['password', '123456', 'qwerty', 'admin', 'letmein']
+            breached = False
             if password.lower() in common_passwords:
                 score -= 2
                 feedback.append("Password is too common")
+            else:
+                # Checked as typed and lowercased, so "Password1!" matches "password1!"
+                breach_filter = get_breach_filter()
+                if breach_filter and (password in breach_filter or password.lower() in breach_filter):
+                    breached = True
+                    score -= 2
+                    feedback.append("Password appears in a list of breached passwords")
             
             strength_levels = {
                 0: "Very Weak",
@@ -276,21 +233,100 @@ class SecurityManager:
                 'score': score,
                 'level': strength_levels.get(score, "Very Weak"),
                 'feedback': feedback,
-                'is_strong': score >= 4
+                'breached': breached,
+                'is_strong': score >= 4 and not breached
             }
             
         except Exception as e:
             logger.error(f"❌ Error checking password strength: {e}")
             return {'score': 0, 'level': 'Very Weak', 'feedback': ['Error checking password'], 'is_strong': False}
 
+class VerifiedTokenCache:
+    """Payloads of session tokens that passed verification, until their exp
+    
+    Keyed by the token's SHA-256 so raw tokens aren't kept as keys. Only
+    successful verifications are cached; logout removes the entry.
+    """
+    
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidations": 0, "verify_seconds": 0.0}
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return payload
+    
+    def put(self, token: str, payload: Dict[str, Any], verify_seconds: float = 0.0):
+        expires_at = payload.get('exp')
+        if not expires_at:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["verify_seconds"] += verify_seconds
+    
+    def invalidate(self, token: Optional[str]):
+        if token:
+            self.invalidate_key(self._key(token))
+    
+    def invalidate_key(self, key: bytes):
+        """Invalidate by the token's SHA-256, for callers that never held the token"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def info(self) -> Dict[str, Any]:
+        """Counters, with verification time saved estimated from measured verifies"""
+        with self._lock:
+            verified = self.stats["misses"] - self.stats["expired"]
+            average = self.stats["verify_seconds"] / verified if verified > 0 else 0.0
+            return {
+                "entries": len(self._entries),
+                **self.stats,
+                "hit_rate": self.stats["hits"] / max(1, self.stats["hits"] + self.stats["misses"]),
+                "saved_seconds": self.stats["hits"] * average
+            }
+
 # Initialize security manager
 security = SecurityManager()
+token_cache = VerifiedTokenCache()
+
+# Sessions ended anywhere (revocation, the per-user cap, idle eviction) drop
+# their verified token too
+session_registry.on_end(lambda session, reason: token_cache.invalidate_key(session.token_key))
 
 def authenticate_user(username: str, password: str) -> bool:
     """Authenticate user with enhanced security"""
     try:
-        # Check rate limiting
-        if not security.check_rate_limit(username, 'login'):
+        # Check rate limiting (keyed by the name as submitted)
+        login_name = username
+        if not security.check_rate_limit(login_name, 'login'):
             st.error("❌ Too many login attempts. Please try again later.")
             security.log_security_event(username, 'rate_limit_exceeded', 'login attempts')
             return False
@@ -301,14 +337,26 @@ def authenticate_user(username: str, password: str) -> bool:
             st.error("❌ Invalid username")
             return False
         
-        # Check credentials (in production, verify against database)
-        if username == "admin" and password == "harem2025":
+        # Check the stored bcrypt hash; unknown names are checked against a
+        # dummy hash so they take as long. Hashes below the current cost are
+        # upgraded in the background and stored for the next login.
+        stored_hash = credential_store.get_hash(username)
+        verified = security.verify_password(
+            password, stored_hash or credential_store.dummy_hash,
+            on_rehash=lambda new_hash: credential_store.set_hash(username, new_hash)
+        )
+        if stored_hash and verified:
             # Generate session token
             token = security.generate_session_token(username)
             if token:
+                session = session_registry.create(username, token, client_ip(), client_user_agent())
                 st.session_state.auth_token = token
                 st.session_state.authenticated_user = username
                 st.session_state.login_time = datetime.now()
+                st.session_state.server_session_id = session.session_id
+                
+                # Only failed attempts should count against the login limit
+                rate_limiter.reset('login', user_id=login_name, ip_address=client_ip())
                 
                 security.log_security_event(username, 'successful_login')
                 logger.info(f"✅ User {username} authenticated successfully")
@@ -330,20 +378,49 @@ def check_authentication() -> bool:
         if 'auth_token' not in st.session_state:
             return False
         
-        # Verify session token
-        payload = security.verify_session_token(st.session_state.auth_token)
-        if not payload:
-            # Clear invalid session
+        token = st.session_state.auth_token
+        if not token:
+            return False
+        
+        # The server-side session must still be live: revoked, capped and
+        # idle sessions end here even while their token is valid
+        session_id = st.session_state.get('server_session_id')
+        if session_registry.touch(session_id, token) is None:
+            TOKEN_CHECKS.labels("session_ended").inc()
+            logger.warning(f"❌ Session ended for user {st.session_state.get('authenticated_user')}: "
+                           f"{session_registry.end_reason(session_id) or 'not registered'}")
+            token_cache.invalidate(token)
             st.session_state.auth_token = None
             st.session_state.authenticated_user = None
+            st.session_state.server_session_id = None
             return False
         
+        # Verify session token, once per token until it expires
+        payload = token_cache.get(token)
+        if payload is not None:
+            TOKEN_CHECKS.labels("cached").inc()
+        else:
+            start = time.perf_counter()
+            payload = security.verify_session_token(token)
+            if not payload:
+                TOKEN_CHECKS.labels("rejected").inc()
+                # Clear invalid session
+                session_registry.end(session_id, 'invalid_token')
+                st.session_state.auth_token = None
+                st.session_state.authenticated_user = None
+                st.session_state.server_session_id = None
+                return False
+            token_cache.put(token, payload, time.perf_counter() - start)
+            TOKEN_CHECKS.labels("verified").inc()
+        
         # Check session timeout
         if 'login_time' in st.session_state:
             if datetime.now() - st.session_state.login_time > timedelta(seconds=security.session_timeout):
+                session_registry.end(session_id, 'timeout')
                 st.session_state.auth_token = None
                 st.session_state.authenticated_user = None
                 st.session_state.login_time = None
+                st.session_state.server_session_id = None
                 return False
         
         return True
@@ -358,20 +435,52 @@ def logout_user():
         if 'authenticated_user' in st.session_state:
             security.log_security_event(st.session_state.authenticated_user, 'logout')
         
+        # Forget the verified token before dropping it
+        token_cache.invalidate(st.session_state.get('auth_token'))
+        session_registry.end(st.session_state.get('server_session_id'), 'logout')
+        
         # Clear session data
         st.session_state.auth_token = None
         st.session_state.authenticated_user = None
         st.session_state.login_time = None
+        st.session_state.server_session_id = None
         
         logger.info("✅ User logged out successfully")
         
     except Exception as e:
         logger.error(f"❌ Logout error: {e}")
 
-def get_security_logs() -> List[Dict[str, Any]]:
-    """Get security logs"""
+def revoke_session(session_id: str) -> bool:
+    """End a live session; its user is signed out on their next rerun"""
+    try:
+        session = session_registry.get(session_id)
+        if session is None or not session_registry.end(session_id, 'revoked'):
+            return False
+        security.log_security_event(session['user_id'], 'session_revoked',
+                                    f"by {st.session_state.get('authenticated_user')}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error revoking session: {e}")
+        return False
+
+def revoke_user_sessions(user_id: str) -> int:
+    """End every live session of a user"""
+    try:
+        count = session_registry.end_user(user_id, 'revoked')
+        if count:
+            security.log_security_event(user_id, 'sessions_revoked',
+                                        f"{count} sessions by {st.session_state.get('authenticated_user')}")
+        return count
+    except Exception as e:
+        logger.error(f"❌ Error revoking sessions of {user_id}: {e}")
+        return 0
+
+def get_security_logs(user_id: Optional[str] = None, event: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      limit: int = 1000) -> List[Dict[str, Any]]:
+    """Get security logs from every session, newest first"""
     try:
-        return st.session_state.get('security_logs', [])
+        return security_event_log.query(user_id=user_id, event=event, since=since, until=until, limit=limit)
     except Exception as e:
         logger.error(f"❌ Error getting security logs: {e}")
         return []
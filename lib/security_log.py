@@ -0,0 +1,256 @@
+"""
+Persistent security event log for Harem CRM
+log_security_event only enqueues; a background writer drains the queue in
+batches into one SQLite segment file per day, indexed by user, event type
+and time. Every session and worker process on the host writes to and reads
+from the same segments, so any admin sees every event, and retention is
+enforced by deleting whole segment files once they age out.
+"""
+import os
+import re
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .registry import registry
+from .metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SECURITY_LOG_DIR_ENV = "SECURITY_LOG_DIR"
+SECURITY_LOG_RETENTION_ENV = "SECURITY_LOG_RETENTION_DAYS"
+DEFAULT_LOG_DIR = "data/security_events"
+DEFAULT_RETENTION_DAYS = 90
+
+# Events held for the writer (a few MB at most); appends beyond this are
+# dropped and counted rather than blocking the script thread
+QUEUE_SIZE = 50000
+DROP_WARNING_INTERVAL = 60
+# Events written per transaction
+WRITE_BATCH = 500
+# How often the writer checks for segments past retention
+RETENTION_INTERVAL = 3600
+
+_SEGMENT_NAME = re.compile(r"^events-(\d{8})\.sqlite3$")
+
+SECURITY_EVENTS_WRITTEN = metrics.counter("security_events_written", "Security events persisted")
+SECURITY_EVENTS_DROPPED = metrics.counter("security_events_dropped", "Security events dropped with a full queue")
+
+def _open_segment(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            user_id TEXT,
+            event TEXT NOT NULL,
+            details TEXT,
+            ip_address TEXT
+        );
+        CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+        CREATE INDEX IF NOT EXISTS events_user_ts ON events (user_id, ts);
+        CREATE INDEX IF NOT EXISTS events_event_ts ON events (event, ts);
+    """)
+    return conn
+
+class SecurityEventLog:
+    """Queue plus background writer over daily SQLite segments"""
+
+    def __init__(self, log_dir: str = None, retention_days: int = None):
+        self.log_dir = log_dir or os.environ.get(SECURITY_LOG_DIR_ENV, DEFAULT_LOG_DIR)
+        self.retention_days = retention_days or int(
+            os.environ.get(SECURITY_LOG_RETENTION_ENV, DEFAULT_RETENTION_DAYS))
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "write_errors": 0, "segments_deleted": 0}
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._writer_conns: Dict[str, sqlite3.Connection] = {}
+        self._stop = threading.Event()
+        self._next_retention = 0.0
+        self._next_drop_warning = 0.0
+        self._writer = threading.Thread(target=self._write_loop, name="security-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _segment_day(self, ts: float) -> str:
+        return datetime.fromtimestamp(ts).strftime("%Y%m%d")
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.log_dir, f"events-{day}.sqlite3")
+
+    def append(self, user_id: Optional[str], event: str, details: str = "", ip_address: Optional[str] = None):
+        """Queue an event without blocking; dropped (and counted) if the writer is far behind"""
+        try:
+            # Stored as text so one odd value can't fail a whole batch
+            self._queue.put_nowait((time.time(), None if user_id is None else str(user_id), str(event),
+                                    "" if details is None else str(details),
+                                    None if ip_address is None else str(ip_address)))
+            self.stats["queued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+            SECURITY_EVENTS_DROPPED.inc()
+            if time.time() >= self._next_drop_warning:
+                self._next_drop_warning = time.time() + DROP_WARNING_INTERVAL
+                logger.warning(f"⚠️ Security log queue full, {self.stats['dropped']} events dropped so far")
+
+    def _write_loop(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+            if time.time() >= self._next_retention:
+                self._next_retention = time.time() + RETENTION_INTERVAL
+                self.enforce_retention()
+
+    def _write_batch(self, batch: List[tuple]):
+        by_day: Dict[str, List[tuple]] = {}
+        for record in batch:
+            by_day.setdefault(self._segment_day(record[0]), []).append(record)
+
+        for day, records in by_day.items():
+            try:
+                conn = self._writer_conns.get(day)
+                if conn is None:
+                    # Only today's (and around midnight, yesterday's) segment stays open
+                    for old_day in [d for d in self._writer_conns if d < day]:
+                        self._writer_conns.pop(old_day).close()
+                    conn = self._writer_conns[day] = _open_segment(self._segment_path(day))
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT INTO events (ts, user_id, event, details, ip_address) VALUES (?, ?, ?, ?, ?)",
+                        records
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    # Leave the connection usable for the next batch
+                    conn.execute("ROLLBACK")
+                    raise
+                self.stats["written"] += len(records)
+                SECURITY_EVENTS_WRITTEN.inc(len(records))
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"❌ Error writing {len(records)} security events: {e}")
+
+    def segments(self) -> List[str]:
+        """Segment days on disk, oldest first"""
+        days = []
+        for name in os.listdir(self.log_dir):
+            match = _SEGMENT_NAME.match(name)
+            if match:
+                days.append(match.group(1))
+        return sorted(days)
+
+    def enforce_retention(self) -> int:
+        """Delete segments whose whole day is past the retention period"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y%m%d")
+        deleted = 0
+        for day in self.segments():
+            if day >= cutoff:
+                break
+            conn = self._writer_conns.pop(day, None)
+            if conn is not None:
+                conn.close()
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self._segment_path(day) + suffix)
+                except FileNotFoundError:
+                    pass
+            deleted += 1
+        if deleted:
+            self.stats["segments_deleted"] += deleted
+            logger.info(f"✅ Deleted {deleted} security log segments older than {self.retention_days} days")
+        return deleted
+
+    def query(self, user_id: Optional[str] = None, event: Optional[str] = None,
+              since: Optional[datetime] = None, until: Optional[datetime] = None,
+              limit: int = 1000) -> List[Dict[str, Any]]:
+        """Events newest first, reading only the segments that overlap the time range"""
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+        first_day = self._segment_day(since_ts) if since_ts else None
+        last_day = self._segment_day(until_ts) if until_ts else None
+
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(event)
+        if since_ts is not None:
+            clauses.append("ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("ts < ?")
+            params.append(until_ts)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        results = []
+        for day in reversed(self.segments()):
+            if len(results) >= limit:
+                break
+            if (last_day and day > last_day) or (first_day and day < first_day):
+                continue
+            try:
+                conn = sqlite3.connect(f"file:{self._segment_path(day)}?mode=ro", uri=True, timeout=10)
+                try:
+                    rows = conn.execute(
+                        f"SELECT ts, user_id, event, details, ip_address FROM events {where} "
+                        f"ORDER BY ts DESC LIMIT ?", (*params, limit - len(results))
+                    ).fetchall()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Security log segment {day} unreadable: {e}")
+                continue
+            results.extend({
+                'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                'user_id': row_user,
+                'event': row_event,
+                'details': details,
+                'ip_address': ip_address
+            } for ts, row_user, row_event, details, ip_address in rows)
+        return results
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued events are written; False on timeout"""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self):
+        self._stop.set()
+        if self._writer.is_alive():
+            self._writer.join(timeout=5)
+        for conn in self._writer_conns.values():
+            conn.close()
+        self._writer_conns.clear()
+
+    def info(self) -> Dict[str, Any]:
+        return {"path": self.log_dir, "segments": len(self.segments()), "queue_depth": self._queue.qsize(),
+                "retention_days": self.retention_days, **self.stats}
+
+# Global security event log instance
+security_event_log = registry.register("security_event_log", SecurityEventLog)
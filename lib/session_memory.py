@@ -0,0 +1,481 @@
+"""
+Per-session memory accounting for Harem CRM
+Every script rerun measures the deep size of the session's state by key and
+enforces budgets: per-key policies trim, evict or spill a key once it grows
+past its budget, and a per-session budget spills the largest spillable keys.
+Spilled values are encrypted with a key that only this process holds and are
+restored at the start of the session's next rerun, so they cost disk rather
+than memory while the session sits idle, and are deleted only once the
+Streamlit runtime has closed the session. Reports from every session land in
+a process-wide registry for the admin view of the heaviest sessions.
+"""
+import streamlit as st
+import os
+import sys
+import time
+import pickle
+import shutil
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .registry import registry
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+try:
+    from streamlit.runtime import Runtime
+except ImportError:
+    Runtime = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_BUDGET_ENV = "SESSION_MEMORY_BUDGET_MB"
+DEFAULT_SESSION_BUDGET_MB = 32
+SPILL_DIR = "data/session_spill"
+
+# Full measurements run at most this often per session; keys restored from
+# disk are re-measured on every rerun so they go back out promptly
+MEASURE_INTERVAL = 5.0
+# Reports of sessions not seen for this long are dropped; their spill files
+# stay until the runtime closes the session
+SESSION_REPORT_TTL = 3600
+# How often stale reports and spills of closed sessions are swept
+SWEEP_INTERVAL = 300
+# Containers longer than this are sized from an evenly spaced sample
+SAMPLE_SIZE = 256
+MAX_DEPTH = 8
+
+@dataclass(frozen=True)
+class KeyPolicy:
+    """Budget for one session_state key and what to do when it is exceeded
+
+    trim  - drop the oldest list items or dict entries until under budget
+    evict - delete the key; its owner must recreate it on demand
+    spill - move the value to disk until the session's next rerun
+    keep  - report only
+    """
+    budget: int
+    action: str
+
+KEY_POLICIES: Dict[str, KeyPolicy] = {
+    'profiler_reruns': KeyPolicy(8 * 1024 * 1024, 'evict'),
+    'comprehensive_form_data': KeyPolicy(1024 * 1024, 'spill'),
+    'application_data': KeyPolicy(1024 * 1024, 'spill'),
+}
+
+# Policies for keys without their own, by value type: cached DataFrames and
+# raw or base64-encoded uploads such as signature images
+TYPE_POLICIES = (
+    ((pd.DataFrame, pd.Series), KeyPolicy(2 * 1024 * 1024, 'spill')),
+    ((bytes, bytearray), KeyPolicy(1024 * 1024, 'spill')),
+    ((str,), KeyPolicy(1024 * 1024, 'spill')),
+)
+
+_ATOMIC_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), datetime)
+
+def deep_sizeof(obj: Any, _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """Approximate bytes reachable from obj, counting shared objects once"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True, index=True))
+    if isinstance(obj, np.ndarray):
+        # Includes the buffer when the array owns it; views share their base's
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMIC_TYPES) or _depth >= MAX_DEPTH:
+        return size
+
+    if isinstance(obj, dict):
+        items = list(obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        items = list(obj)
+    elif hasattr(obj, '__dict__'):
+        return size + deep_sizeof(vars(obj), _seen, _depth + 1)
+    elif hasattr(obj, '__slots__'):
+        items = [getattr(obj, slot) for slot in obj.__slots__ if hasattr(obj, slot)]
+    else:
+        return size
+
+    # Large containers are sized from a sample and scaled up
+    scale = 1.0
+    if len(items) > SAMPLE_SIZE:
+        step = len(items) / SAMPLE_SIZE
+        scale = step
+        items = [items[int(i * step)] for i in range(SAMPLE_SIZE)]
+
+    children = 0
+    for item in items:
+        if isinstance(obj, dict):
+            children += deep_sizeof(item[0], _seen, _depth + 1) + deep_sizeof(item[1], _seen, _depth + 1)
+        else:
+            children += deep_sizeof(item, _seen, _depth + 1)
+    return size + int(children * scale)
+
+def policy_for(key: str, value: Any) -> Optional[KeyPolicy]:
+    if key in KEY_POLICIES:
+        return KEY_POLICIES[key]
+    for types, policy in TYPE_POLICIES:
+        if isinstance(value, types):
+            return policy
+    return None
+
+def _trim(value: Any, size: int, budget: int) -> Any:
+    """Keep the newest items of a list or dict that fit the budget"""
+    if not isinstance(value, (list, dict)) or not value:
+        return value
+    keep = int(len(value) * budget / size)
+    if isinstance(value, list):
+        return value[-keep:] if keep else []
+    return dict(list(value.items())[-keep:]) if keep else {}
+
+class SpilledValue:
+    """Stands in for a session_state value while it is on disk"""
+
+    __slots__ = ("key", "path", "size", "spilled_at")
+
+    def __init__(self, key: str, path: str, size: int):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.spilled_at = time.time()
+
+    def __repr__(self):
+        return f"<SpilledValue {self.key}: {self.size / 1024:.0f} KiB on disk>"
+
+class SessionMemoryTracker:
+    """Process-wide registry of session memory reports and spill storage"""
+
+    def __init__(self, spill_dir: str = SPILL_DIR, session_budget: int = None):
+        self.session_budget = session_budget or int(
+            os.environ.get(SESSION_BUDGET_ENV, DEFAULT_SESSION_BUDGET_MB)) * 1024 * 1024
+        self.spill_dir = os.path.join(spill_dir, str(os.getpid()))
+        self.reports: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"measurements": 0, "trimmed": 0, "evicted": 0, "spilled": 0, "restored": 0}
+        self._last_measured: Dict[str, float] = {}
+        self._unspillable: Dict[str, set] = {}
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+        # Spill files are only readable with this process's key
+        self._cipher = AESGCM(AESGCM.generate_key(bit_length=256))
+        self._remove_orphaned_spills(spill_dir)
+
+    def _remove_orphaned_spills(self, spill_dir: str):
+        """Spills of exited processes can no longer be decrypted"""
+        if not os.path.isdir(spill_dir):
+            return
+        for name in os.listdir(spill_dir):
+            try:
+                os.kill(int(name), 0)
+                continue
+            except (ValueError, ProcessLookupError):
+                shutil.rmtree(os.path.join(spill_dir, name), ignore_errors=True)
+            except PermissionError:
+                # Alive, owned by another user
+                continue
+
+    def _spill_path(self, session_id: str, key: str) -> str:
+        return os.path.join(self.spill_dir, session_id, f"{abs(hash(key)):x}.bin")
+
+    def spill(self, session_id: str, key: str, value: Any, size: int) -> SpilledValue:
+        path = self._spill_path(session_id, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        nonce = os.urandom(12)
+        aad = f"{session_id}:{key}".encode()
+        data = self._cipher.encrypt(nonce, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), aad)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(nonce + data)
+        os.replace(tmp_path, path)
+        self.stats["spilled"] += 1
+        return SpilledValue(key, path, size)
+
+    def load(self, session_id: str, spilled: SpilledValue) -> Any:
+        with open(spilled.path, "rb") as f:
+            blob = f.read()
+        os.remove(spilled.path)
+        aad = f"{session_id}:{spilled.key}".encode()
+        value = pickle.loads(self._cipher.decrypt(blob[:12], blob[12:], aad))
+        self.stats["restored"] += 1
+        return value
+
+    def due(self, session_id: str) -> bool:
+        return time.time() - self._last_measured.get(session_id, 0) >= MEASURE_INTERVAL
+
+    def record(self, session_id: str, report: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._last_measured[session_id] = now
+            self.reports[session_id] = report
+            self.stats["measurements"] += 1
+            if now >= self._next_sweep:
+                self._next_sweep = now + SWEEP_INTERVAL
+                self._sweep(now)
+
+    def _sweep(self, now: float):
+        """Age out idle reports and delete spills of closed sessions; caller holds the lock"""
+        for stale_id in [sid for sid, r in self.reports.items() if now - r['last_seen'] > SESSION_REPORT_TTL]:
+            # An idle session may still come back for its spilled keys
+            self.reports.pop(stale_id, None)
+            self._last_measured.pop(stale_id, None)
+        if os.path.isdir(self.spill_dir):
+            for session_id in os.listdir(self.spill_dir):
+                if session_id not in self.reports and _session_closed(session_id):
+                    self.forget(session_id)
+
+    def forget(self, session_id: str):
+        """Drop a session's report and spill files; caller holds the lock"""
+        self.reports.pop(session_id, None)
+        self._last_measured.pop(session_id, None)
+        self._unspillable.pop(session_id, None)
+        shutil.rmtree(os.path.join(self.spill_dir, session_id), ignore_errors=True)
+
+    def top_sessions(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            reports = list(self.reports.values())
+        return sorted(reports, key=lambda r: r['total_bytes'], reverse=True)[:limit]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            reports = list(self.reports.values())
+        return {
+            'sessions': len(reports),
+            'total_bytes': sum(r['total_bytes'] for r in reports),
+            'spilled_bytes': sum(r['spilled_bytes'] for r in reports),
+            'over_budget': sum(1 for r in reports if r['over_budget']),
+            'session_budget': self.session_budget,
+            **self.stats
+        }
+
+# Global session memory tracker
+session_memory = registry.register("session_memory", SessionMemoryTracker)
+
+def _session_closed(session_id: str) -> bool:
+    """True only once the runtime no longer holds the session, connected or not"""
+    if Runtime is None or not Runtime.exists():
+        return False
+    try:
+        return Runtime.instance()._session_mgr.get_session_info(session_id) is None
+    except Exception:
+        # Can't tell: keep the spill files rather than lose data
+        return False
+
+def _session_id() -> Optional[str]:
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return ctx.session_id if ctx else None
+
+def _session_user() -> str:
+    user = st.session_state.get('current_user')
+    if isinstance(user, dict):
+        return user.get('username') or user.get('email') or 'unknown'
+    return str(user) if user else 'anonymous'
+
+def restore_spilled(session_id: str = None) -> int:
+    """Bring this session's spilled keys back into session_state"""
+    session_id = session_id or _session_id()
+    restored = 0
+    for key in list(st.session_state.keys()):
+        value = st.session_state[key]
+        if isinstance(value, SpilledValue):
+            try:
+                st.session_state[key] = session_memory.load(session_id, value)
+                restored += 1
+            except Exception as e:
+                logger.error(f"❌ Error restoring spilled session key {key}: {e}")
+                del st.session_state[key]
+    return restored
+
+def measure_session(session_id: str, keys: List[str] = None) -> Dict[str, int]:
+    """Deep size of each session_state key (spilled keys count as 0 in memory)"""
+    sizes = {}
+    for key in keys if keys is not None else list(st.session_state.keys()):
+        value = st.session_state.get(key)
+        sizes[key] = 0 if isinstance(value, SpilledValue) else deep_sizeof(value)
+    return sizes
+
+def enforce_budgets(session_id: str, sizes: Dict[str, int]) -> Dict[str, Any]:
+    """Apply per-key policies, then spill the largest keys while over the session budget"""
+    actions = {}
+    spilled = {}
+    unspillable = session_memory._unspillable.setdefault(session_id, set())
+
+    def spill(key: str, size: int) -> bool:
+        if key in unspillable:
+            return False
+        try:
+            st.session_state[key] = session_memory.spill(session_id, key, st.session_state[key], size)
+        except Exception as e:
+            # Widget-bound keys can't be replaced after the widget ran
+            logger.warning(f"⚠️ Session key {key} can't be spilled: {e}")
+            unspillable.add(key)
+            return False
+        spilled[key] = size
+        sizes[key] = 0
+        actions[key] = 'spill'
+        return True
+
+    for key, size in list(sizes.items()):
+        value = st.session_state.get(key)
+        policy = policy_for(key, value)
+        if policy is None or size <= policy.budget:
+            continue
+        if policy.action == 'trim':
+            st.session_state[key] = _trim(value, size, policy.budget)
+            sizes[key] = deep_sizeof(st.session_state[key])
+            actions[key] = 'trim'
+            session_memory.stats["trimmed"] += 1
+        elif policy.action == 'evict':
+            del st.session_state[key]
+            sizes.pop(key)
+            actions[key] = 'evict'
+            session_memory.stats["evicted"] += 1
+        elif policy.action == 'spill':
+            spill(key, size)
+
+    if sum(sizes.values()) > session_memory.session_budget:
+        for key, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            if sum(sizes.values()) <= session_memory.session_budget:
+                break
+            policy = policy_for(key, st.session_state.get(key))
+            if policy is not None and policy.action == 'spill':
+                spill(key, size)
+
+    return {'actions': actions, 'spilled': spilled}
+
+class track_session_memory:
+    """Context manager wrapped around a script run
+
+    Restores spilled keys before the script reads them, and measures and
+    enforces budgets once the run ends, including runs ended by st.rerun().
+    """
+
+    def __enter__(self):
+        self.session_id = None
+        try:
+            self.session_id = _session_id()
+            if self.session_id:
+                self.restored = restore_spilled(self.session_id)
+        except Exception as e:
+            logger.error(f"❌ Error restoring session state: {e}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.session_id:
+            return False
+        try:
+            session_id = self.session_id
+            previous = session_memory.reports.get(session_id)
+            if previous is not None and not session_memory.due(session_id):
+                # Between full measurements only put restored keys back out
+                keys = [key for key in previous['spilled'] if key in st.session_state]
+                if keys:
+                    sizes = {**previous['keys'], **measure_session(session_id, keys)}
+                    sizes = {key: size for key, size in sizes.items() if key in st.session_state}
+                    result = enforce_budgets(session_id, sizes)
+                    previous['spilled'] = result['spilled']
+                    previous['spilled_bytes'] = sum(result['spilled'].values())
+                previous['last_seen'] = time.time()
+                return False
+
+            start = time.perf_counter()
+            sizes = measure_session(session_id)
+            before = sum(sizes.values())
+            result = enforce_budgets(session_id, sizes)
+            total = sum(sizes.values())
+            session_memory.record(session_id, {
+                'session_id': session_id,
+                'user': _session_user(),
+                'total_bytes': total,
+                'before_enforcement_bytes': before,
+                'keys': sizes,
+                'spilled': result['spilled'],
+                'spilled_bytes': sum(result['spilled'].values()),
+                'last_actions': result['actions'],
+                'over_budget': total > session_memory.session_budget,
+                'measure_ms': (time.perf_counter() - start) * 1000,
+                'last_seen': time.time(),
+                'measured_at': datetime.now().isoformat()
+            })
+            if total > session_memory.session_budget:
+                logger.warning(f"⚠️ Session {session_id[:8]} holds {total / 1024 / 1024:.1f} MiB "
+                               f"after enforcing budgets")
+        except Exception as e:
+            logger.error(f"❌ Error measuring session memory: {e}")
+        return False
+
+def show_session_memory_panel():
+    """Admin view of the sessions holding the most memory"""
+    try:
+        summary = session_memory.summary()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Sessions", summary['sessions'])
+        with col2:
+            st.metric("In Memory", f"{summary['total_bytes'] / 1024 / 1024:.1f} MiB")
+        with col3:
+            st.metric("Spilled", f"{summary['spilled_bytes'] / 1024 / 1024:.1f} MiB")
+        with col4:
+            st.metric("Over Budget", summary['over_budget'])
+        st.caption(f"Session budget {summary['session_budget'] / 1024 / 1024:.0f} MiB · "
+                   f"{summary['trimmed']} trims, {summary['evicted']} evictions, "
+                   f"{summary['spilled']} spills, {summary['restored']} restores")
+
+        top = session_memory.top_sessions()
+        if not top:
+            st.info("No sessions measured yet.")
+            return
+
+        rows = []
+        for report in top:
+            largest = max(report['keys'].items(), key=lambda item: item[1], default=("—", 0))
+            rows.append({
+                'session': report['session_id'][:8],
+                'user': report['user'],
+                'memory_kb': round(report['total_bytes'] / 1024, 1),
+                'spilled_kb': round(report['spilled_bytes'] / 1024, 1),
+                'largest_key': largest[0],
+                'largest_kb': round(largest[1] / 1024, 1),
+                'keys': len(report['keys']),
+                'over_budget': report['over_budget'],
+                'measured_at': report['measured_at'][11:19]
+            })
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+        selected = st.selectbox("Keys of session", [row['session'] for row in rows], key="session_memory_selected")
+        report = next(r for r in top if r['session_id'].startswith(selected))
+        key_rows = []
+        for key, size in sorted(report['keys'].items(), key=lambda item: item[1], reverse=True):
+            policy = KEY_POLICIES.get(key)
+            key_rows.append({
+                'key': key,
+                'kb': round(size / 1024, 1),
+                'spilled_kb': round(report['spilled'].get(key, 0) / 1024, 1),
+                'budget_kb': round(policy.budget / 1024) if policy else None,
+                'policy': policy.action if policy else 'by type',
+                'last_action': report['last_actions'].get(key, '')
+            })
+        st.dataframe(pd.DataFrame(key_rows), use_container_width=True)
+
+    except Exception as e:
+        logger.error(f"❌ Error showing session memory: {e}")
+        st.error(f"Error displaying session memory: {e}")
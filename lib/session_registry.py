@@ -0,0 +1,362 @@
+"""
+Server-side session registry for Harem CRM
+Every login gets an entry here, keyed by a random session id kept in
+st.session_state, so sessions can be listed, capped per user and revoked
+centrally. Sessions live in a SQLite file that every worker process on the
+host shares, like the rate limits, so the live list, the per-user cap and
+revocation cover all workers. check_authentication looks its session up on
+every rerun (one primary-key read); a revoked or idle session fails that
+lookup immediately, whichever worker ended it. last_seen is only written
+when it has moved on by TOUCH_WRITE_INTERVAL, and idle sessions are swept
+through the last_seen index at most every SWEEP_INTERVAL per process.
+"""
+import streamlit as st
+import os
+import time
+import hashlib
+import sqlite3
+import secrets
+import threading
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .registry import registry
+from .metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SESSION_DB_ENV = "SESSION_REGISTRY_DB"
+DEFAULT_SESSION_DB = "data/sessions.sqlite3"
+IDLE_TIMEOUT_ENV = "SESSION_IDLE_TIMEOUT"
+MAX_SESSIONS_ENV = "MAX_SESSIONS_PER_USER"
+DEFAULT_IDLE_TIMEOUT = 1800
+DEFAULT_MAX_SESSIONS = 3
+
+# Idle sessions are evicted within this long of their deadline
+SWEEP_INTERVAL = 5.0
+# A rerun only writes last_seen once it is this stale, so idle deadlines
+# may come up to this much early
+TOUCH_WRITE_INTERVAL = 15.0
+# Why recently ended sessions ended, for the message shown to their user
+ENDED_REASONS_KEPT = 1024
+STAT_NAMES = ("created", "idle", "revoked", "capped", "logout", "timeout")
+
+LIVE_SESSIONS = metrics.gauge("server_sessions_live", "Server-side sessions currently live")
+SESSIONS_ENDED = metrics.counter("server_sessions_ended", "Server-side sessions ended by reason", ["reason"])
+
+_SESSION_COLUMNS = "session_id, user_id, token_key, created_at, last_seen, ip_address, user_agent"
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+@dataclass
+class ServerSession:
+    """One logged-in browser session"""
+    session_id: str
+    user_id: str
+    token_key: bytes
+    created_at: float
+    last_seen: float
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+
+    def snapshot(self, now: float, idle_timeout: float) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'user_id': self.user_id,
+            'ip_address': self.ip_address,
+            'user_agent': self.user_agent,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(timespec='seconds'),
+            'last_seen': datetime.fromtimestamp(self.last_seen).isoformat(timespec='seconds'),
+            'idle_seconds': round(now - self.last_seen),
+            'expires_in': round(self.last_seen + idle_timeout - now)
+        }
+
+def _open_db(db_path: str) -> sqlite3.Connection:
+    if db_path != ":memory:":
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            token_key BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT
+        );
+        CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user_id, created_at);
+        CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+        CREATE TABLE IF NOT EXISTS ended_sessions (
+            session_id TEXT PRIMARY KEY,
+            reason TEXT NOT NULL,
+            ended_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ended_sessions_at ON ended_sessions (ended_at);
+        CREATE TABLE IF NOT EXISTS session_stats (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        );
+    """)
+    return conn
+
+class SessionRegistry:
+    """Live sessions by id and by user, with idle eviction and revocation, shared between processes"""
+
+    def __init__(self, idle_timeout: float = None, max_per_user: int = None, db_path: str = None):
+        self.idle_timeout = idle_timeout or float(os.environ.get(IDLE_TIMEOUT_ENV, DEFAULT_IDLE_TIMEOUT))
+        self.max_per_user = max_per_user or int(os.environ.get(MAX_SESSIONS_ENV, DEFAULT_MAX_SESSIONS))
+        self.db_path = db_path or os.environ.get(SESSION_DB_ENV, DEFAULT_SESSION_DB)
+        try:
+            self._conn = _open_db(self.db_path)
+            logger.info(f"✅ Server sessions shared through {self.db_path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Server sessions kept per process, {self.db_path} unavailable: {e}")
+            self._conn = _open_db(":memory:")
+        self._listeners: List[Callable[[ServerSession, str], None]] = []
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def on_end(self, callback: Callable[[ServerSession, str], None]):
+        """Call callback(session, reason) whenever a session ends in this process"""
+        self._listeners.append(callback)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            # The write lock makes read-then-write atomic across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _session(row: tuple) -> ServerSession:
+        return ServerSession(row[0], row[1], bytes(row[2]), row[3], row[4], row[5], row[6])
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str, count: int = 1):
+        conn.execute("""
+            INSERT INTO session_stats (name, count) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET count = count + excluded.count
+        """, (name, count))
+
+    def _remove(self, conn: sqlite3.Connection, session: ServerSession, reason: str, now: float) -> ServerSession:
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session.session_id,))
+        conn.execute("INSERT OR REPLACE INTO ended_sessions (session_id, reason, ended_at) VALUES (?, ?, ?)",
+                     (session.session_id, reason, now))
+        self._count(conn, reason)
+        SESSIONS_ENDED.labels(reason).inc()
+        return session
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> List[Tuple[ServerSession, str]]:
+        """End idle sessions through the last_seen index and trim the ended-reason history"""
+        self._next_sweep = now + SWEEP_INTERVAL
+        rows = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE last_seen <= ?",
+                            (now - self.idle_timeout,)).fetchall()
+        ended = [(self._remove(conn, self._session(row), "idle", now), "idle") for row in rows]
+        conn.execute("""
+            DELETE FROM ended_sessions WHERE session_id IN (
+                SELECT session_id FROM ended_sessions ORDER BY ended_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (ENDED_REASONS_KEPT,))
+        return ended
+
+    def _notify(self, ended: List[Tuple[ServerSession, str]]):
+        with self._lock:
+            LIVE_SESSIONS.set(self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0])
+        for session, reason in ended:
+            for callback in self._listeners:
+                try:
+                    callback(session, reason)
+                except Exception as e:
+                    logger.error(f"❌ Error in session end callback: {e}")
+
+    def create(self, user_id: str, token: str, ip_address: Optional[str] = None,
+               user_agent: Optional[str] = None) -> ServerSession:
+        """Register a login; the user's oldest sessions end if the cap is reached"""
+        now = time.time()
+        session = ServerSession(secrets.token_urlsafe(24), user_id, token_digest(token), now, now,
+                                ip_address, user_agent)
+        with self._transaction() as conn:
+            ended = self._expire(conn, now)
+            rows = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE user_id = ? ORDER BY created_at",
+                                (user_id,)).fetchall()
+            for row in rows[:max(0, len(rows) - self.max_per_user + 1)]:
+                ended.append((self._remove(conn, self._session(row), "capped", now), "capped"))
+            conn.execute(f"INSERT INTO sessions ({_SESSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (session.session_id, user_id, session.token_key, now, now, ip_address, user_agent))
+            self._count(conn, "created")
+        self._notify(ended)
+        logger.info(f"✅ Server session created for user {user_id}")
+        return session
+
+    def touch(self, session_id: Optional[str], token: str) -> Optional[ServerSession]:
+        """The live session for this id and token, marked as seen; None if it has ended"""
+        if not session_id:
+            return None
+        now = time.time()
+        ended = []
+        if now >= self._next_sweep:
+            with self._transaction() as conn:
+                ended = self._expire(conn, now)
+
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+        session = self._session(row) if row else None
+        if session is not None:
+            if session.token_key != token_digest(token):
+                session = None
+            elif now - session.last_seen > self.idle_timeout:
+                with self._transaction() as conn:
+                    # Unless another worker has seen it since
+                    row = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ? "
+                                       f"AND last_seen < ?", (session_id, now - self.idle_timeout)).fetchone()
+                    if row:
+                        ended.append((self._remove(conn, self._session(row), "idle", now), "idle"))
+                session = None
+            else:
+                if now - session.last_seen >= TOUCH_WRITE_INTERVAL:
+                    with self._lock:
+                        self._conn.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?",
+                                           (now, session_id))
+                session.last_seen = now
+        if ended:
+            self._notify(ended)
+        return session
+
+    def end(self, session_id: Optional[str], reason: str = "revoked") -> bool:
+        """End one session (logout, timeout or revocation), whichever worker serves it"""
+        if not session_id:
+            return False
+        with self._transaction() as conn:
+            row = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+            session = self._remove(conn, self._session(row), reason, time.time()) if row else None
+        if session is None:
+            return False
+        self._notify([(session, reason)])
+        return True
+
+    def end_user(self, user_id: str, reason: str = "revoked") -> int:
+        """End every session of a user"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE user_id = ?", (user_id,)).fetchall()
+            ended = [(self._remove(conn, self._session(row), reason, now), reason) for row in rows]
+        self._notify(ended)
+        return len(ended)
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """A live session's details, without marking it as seen"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+        return self._session(row).snapshot(time.time(), self.idle_timeout) if row else None
+
+    def end_reason(self, session_id: Optional[str]) -> Optional[str]:
+        """Why a recently ended session ended"""
+        with self._lock:
+            row = self._conn.execute("SELECT reason FROM ended_sessions WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def sessions(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Live sessions on every worker, most recently active first"""
+        now = time.time()
+        with self._transaction() as conn:
+            ended = self._expire(conn, now)
+            if user_id is not None:
+                rows = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE user_id = ?",
+                                    (user_id,)).fetchall()
+            else:
+                rows = conn.execute(f"SELECT {_SESSION_COLUMNS} FROM sessions").fetchall()
+        if ended:
+            self._notify(ended)
+        return sorted((self._session(row).snapshot(now, self.idle_timeout) for row in rows),
+                      key=lambda row: row['idle_seconds'])
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            live, users = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT user_id) FROM sessions").fetchone()
+            stats = dict(self._conn.execute("SELECT name, count FROM session_stats").fetchall())
+        return {"live": live, "users": users, "idle_timeout": self.idle_timeout, "max_per_user": self.max_per_user,
+                "path": self.db_path, **{name: 0 for name in STAT_NAMES}, **stats}
+
+# Global session registry instance
+session_registry = registry.register("session_registry", SessionRegistry)
+
+def client_user_agent() -> Optional[str]:
+    """The browser's User-Agent header, if the request carries one"""
+    try:
+        return st.context.headers.get("User-Agent")
+    except Exception:
+        return None
+
+def show_live_sessions():
+    """Admin page listing live sessions, with revocation"""
+    # Imported here: security registers its listeners on this module
+    from .security import revoke_session, revoke_user_sessions
+
+    st.header("🔐 Live Sessions")
+    try:
+        info = session_registry.info()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Live Sessions", info['live'])
+        with col2:
+            st.metric("Users", info['users'])
+        with col3:
+            st.metric("Idle Evictions", info['idle'])
+        with col4:
+            st.metric("Revoked", info['revoked'])
+        st.caption(f"Idle timeout {info['idle_timeout'] / 60:.0f} min · "
+                   f"at most {info['max_per_user']} sessions per user · "
+                   f"{info['created']} logins, {info['logout']} logouts, {info['capped']} ended by the cap")
+
+        rows = session_registry.sessions()
+        if not rows:
+            st.info("No live sessions.")
+            return
+
+        table = pd.DataFrame(rows)
+        table['session'] = table['session_id'].str[:8]
+        st.dataframe(table[['session', 'user_id', 'ip_address', 'created_at', 'last_seen', 'idle_seconds',
+                            'expires_in', 'user_agent']], use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            labels = {f"{row['session_id'][:8]} · {row['user_id']} · {row['ip_address'] or '—'}": row['session_id']
+                      for row in rows}
+            selected = st.selectbox("Session", list(labels), key="live_sessions_selected")
+            if st.button("Revoke Session", use_container_width=True):
+                if revoke_session(labels[selected]):
+                    st.success("✅ Session revoked")
+                    st.rerun()
+        with col2:
+            users = sorted({row['user_id'] for row in rows})
+            selected_user = st.selectbox("User", users, key="live_sessions_user")
+            if st.button("Revoke All Sessions of User", use_container_width=True):
+                count = revoke_user_sessions(selected_user)
+                st.success(f"✅ {count} sessions revoked")
+                st.rerun()
+
+    except Exception as e:
+        logger.error(f"❌ Error showing live sessions: {e}")
+        st.error(f"Error displaying live sessions: {e}")
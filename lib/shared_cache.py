@@ -0,0 +1,231 @@
+"""
+Cross-process cache backend for Harem CRM
+When several Streamlit server processes run side by side, st.cache_data
+fetches and holds every table once per process. This SQLite backend lets
+cached getters share one copy: values live in a WAL-mode database file that
+every process reads, leases give single-flight refresh across processes,
+entries are evicted least-recently-used once the file exceeds its byte
+budget, and per-namespace version stamps invalidate everywhere at once.
+"""
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Deployments opt in by pointing every worker at the same file
+SHARED_CACHE_PATH_ENV = "SHARED_CACHE_PATH"
+SHARED_CACHE_MAX_MB_ENV = "SHARED_CACHE_MAX_MB"
+DEFAULT_MAX_MB = 256
+
+# A computing process holds a lease this long; if it dies, others take over
+LEASE_SECONDS = 30.0
+# How often waiters poll for another process's result
+POLL_INTERVAL = 0.05
+# Reads refresh an entry's LRU timestamp at most this often, keeping reads
+# from turning into a write per call
+LRU_TOUCH_INTERVAL = 5.0
+
+class SharedCache:
+    """SQLite-backed byte cache shared by every process using the same file"""
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "lease_waits": 0, "stale_versions": 0}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    computed_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                );
+                CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (last_access);
+                CREATE TABLE IF NOT EXISTS cache_versions (
+                    namespace TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS cache_leases (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                );
+            """)
+
+    def version(self, namespace: str) -> int:
+        """Current version stamp of a namespace (0 until first invalidated)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM cache_versions WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def lookup(self, namespace: str, key: str) -> Optional[Tuple[bytes, float]]:
+        """(value, computed_at) of a current-version entry, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT e.value, e.computed_at, e.last_access, e.version, COALESCE(v.version, 0)
+                FROM cache_entries e LEFT JOIN cache_versions v ON v.namespace = e.namespace
+                WHERE e.namespace = ? AND e.key = ?
+            """, (namespace, key)).fetchone()
+
+            if row is None or row[3] != row[4]:
+                if row is not None:
+                    self.stats["stale_versions"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            if now - row[2] > LRU_TOUCH_INTERVAL:
+                self._conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+                )
+        return row[0], row[1]
+
+    def store(self, namespace: str, key: str, value: bytes, computed_at: float, version: int) -> bool:
+        """Store a value computed under `version`; refused if invalidated meanwhile"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT version FROM cache_versions WHERE namespace = ?", (namespace,)
+                ).fetchone()
+                if (row[0] if row else 0) != version:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, version, computed_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (namespace, key, value, len(value), version, computed_at, time.time()))
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stats["stores"] += 1
+        return True
+
+    def _evict(self):
+        """Drop least recently used entries until under budget; caller holds the transaction"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT namespace, key, size FROM cache_entries ORDER BY last_access LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", row[:2])
+            total -= row[2]
+            self.stats["evictions"] += 1
+
+    def invalidate(self, namespace: str):
+        """Bump a namespace's version so every process treats its entries as gone"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("""
+                    INSERT INTO cache_versions (namespace, version) VALUES (?, 1)
+                    ON CONFLICT(namespace) DO UPDATE SET version = version + 1
+                """, (namespace,))
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def acquire_lease(self, namespace: str, key: str, seconds: float = LEASE_SECONDS) -> bool:
+        """Claim the right to compute a key; False while another live process holds it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("""
+                INSERT INTO cache_leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE cache_leases.expires_at < ? OR cache_leases.owner = excluded.owner
+            """, (namespace, key, self.owner, now + seconds, now))
+            return cursor.rowcount == 1
+
+    def release_lease(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self.owner)
+            )
+
+    def wait_for(self, namespace: str, key: str, newer_than: float,
+                 timeout: float = LEASE_SECONDS) -> Optional[Tuple[bytes, float]]:
+        """Wait for another process to store a value computed after `newer_than`"""
+        self.stats["lease_waits"] += 1
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            found = self.lookup(namespace, key)
+            if found and found[1] > newer_than:
+                return found
+            with self._lock:
+                lease = self._conn.execute(
+                    "SELECT expires_at FROM cache_leases WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+            if lease is None or lease[0] < time.time():
+                # The holder finished without storing, or died
+                return self.lookup(namespace, key)
+            time.sleep(POLL_INTERVAL)
+        return None
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        return {"path": self.db_path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes, **self.stats}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """The process's shared cache, or None unless SHARED_CACHE_PATH is set"""
+    global _shared_cache
+    if _shared_cache is not None:
+        return _shared_cache
+
+    path = os.environ.get(SHARED_CACHE_PATH_ENV)
+    if not path:
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                max_mb = int(os.environ.get(SHARED_CACHE_MAX_MB_ENV, DEFAULT_MAX_MB))
+                _shared_cache = SharedCache(path, max_bytes=max_mb * 1024 * 1024)
+                logger.info(f"✅ Shared cache at {path} ({max_mb} MB)")
+            except Exception as e:
+                logger.error(f"❌ Error opening shared cache {path}: {e}")
+                return None
+    return _shared_cache
@@ -0,0 +1,101 @@
+"""
+Ring-buffer time series for Harem CRM
+Fixed-capacity series stored column by column in NumPy arrays, with epoch
+timestamps. Each column is twice the capacity and every sample is written
+to both halves, so the newest N samples are always one contiguous slice:
+appends are O(1) without ever shifting data, and windows (the last N
+samples, or everything since a time) are views, not copies. Samples past
+the capacity overwrite the oldest ones.
+
+Views share memory with the buffer; copy one before keeping it across
+more than `capacity` further appends.
+"""
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _default(dtype: np.dtype) -> Any:
+    """Fill value for a column a sample doesn't provide"""
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'O':
+        return None
+    return dtype.type(0)
+
+class RingBuffer:
+    """Fixed-capacity time series in mirrored NumPy columns"""
+
+    def __init__(self, capacity: int, columns: Dict[str, Any]):
+        self.capacity = capacity
+        dtypes = {'timestamp': np.dtype(np.float64), **{name: np.dtype(dtype) for name, dtype in columns.items()}}
+        self._columns = {name: np.empty(2 * capacity, dtype=dtype) if dtype.kind == 'O'
+                         else np.zeros(2 * capacity, dtype=dtype) for name, dtype in dtypes.items()}
+        self._defaults = {name: _default(dtype) for name, dtype in dtypes.items()}
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def append(self, timestamp: float = None, **values):
+        """Add one sample; columns left out get NaN, 0 or None"""
+        values['timestamp'] = time.time() if timestamp is None else timestamp
+        with self._lock:
+            i, mirror = self._next, self._next + self.capacity
+            for name, column in self._columns.items():
+                value = values.get(name, self._defaults[name])
+                column[i] = value
+                column[mirror] = value
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def window(self, last: Optional[int] = None, since: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Views of every column over the newest `last` samples and/or those at or after `since`"""
+        with self._lock:
+            size = self._size if last is None else max(0, min(last, self._size))
+            end = (self._next - self._size) % self.capacity + self._size
+        start = end - size
+        if since is not None:
+            # Appends are in time order, so the window start is a binary search
+            start += int(np.searchsorted(self._columns['timestamp'][start:end], since, side='left'))
+        return {name: column[start:end] for name, column in self._columns.items()}
+
+    def count(self, since: Optional[float] = None) -> int:
+        """Samples held, or those at or after `since`"""
+        return len(self.window(since=since)['timestamp']) if since is not None else self._size
+
+    def rows(self, last: int) -> List[Dict[str, Any]]:
+        """The newest samples as plain dicts, oldest first, for small displays"""
+        window = self.window(last=last)
+        return [{name: column[i].item() if hasattr(column[i], 'item') else column[i]
+                 for name, column in window.items()} for i in range(len(window['timestamp']))]
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        rows = self.rows(1)
+        return rows[0] if rows else None
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._size = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (object columns count their pointers only)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def memory(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "samples": self._size, "bytes": self.nbytes,
+                "bytes_per_sample": self.nbytes / self.capacity}
@@ -15,6 +15,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from lib.registry import registry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -483,8 +485,8 @@ class MemoryManagementSystem:
         }
         logger.info(f"Memory log: {action} for {memory_id}")
 
-# Global memory management instance
-memory_management = MemoryManagementSystem()
+# Global memory management instance, created on first use
+memory_management = registry.register("memory_management", MemoryManagementSystem)
 
 def show_memory_management_system():
     """Main memory management system interface"""
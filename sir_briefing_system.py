@@ -14,6 +14,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from lib.registry import registry
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -461,8 +463,8 @@ class SirBriefingSystem:
         self.briefing_history[profile_id] = log_entry
         logger.info(f"Briefing log: {action} for {profile_id}")
 
-# Global Sir briefing instance
-sir_briefing = SirBriefingSystem()
+# Global Sir briefing instance, created on first use
+sir_briefing = registry.register("sir_briefing", SirBriefingSystem)
 
 def show_sir_briefing_system():
     """Main Sir briefing system interface"""
@@ -58,6 +58,66 @@ except ImportError:
     }
     PERSONAL_DATA_LOADED = False
 
+# Full-text application search is optional when the lib package isn't deployed
+try:
+    from lib.search import show_application_search
+    APPLICATION_SEARCH_AVAILABLE = True
+except ImportError:
+    APPLICATION_SEARCH_AVAILABLE = False
+
+# Compact-dtype tables are optional as well; plain st.dataframe otherwise
+try:
+    from lib.performance import show_dataframe, show_paged_table, setup_performance_monitoring, show_performance_dashboard
+except ImportError:
+    show_dataframe = None
+    show_paged_table = None
+    setup_performance_monitoring = None
+
+@st.cache_resource
+def start_background_services() -> bool:
+    """Start the cache warm-up (and metrics exporter) once per server process
+
+    Also creates the components registered with warm=True, off the script
+    thread; the secure data manager resumes an interrupted key rotation then.
+    """
+    if setup_performance_monitoring:
+        setup_performance_monitoring()
+    try:
+        import config.secure_data_manager  # Registers itself with the component registry
+        from lib.registry import registry
+        registry.warm_up(background=True)
+    except ImportError:
+        pass
+    return True
+
+# Per-session rerun profiling is optional too; without it reruns run unwrapped
+try:
+    from lib.profiler import profile_rerun, show_profiler_switch, show_profiler_panel
+except ImportError:
+    from contextlib import nullcontext as profile_rerun
+    show_profiler_switch = None
+
+# Session memory budgets are optional as well
+try:
+    from lib.session_memory import track_session_memory, show_session_memory_panel
+except ImportError:
+    from contextlib import nullcontext as track_session_memory
+    show_session_memory_panel = None
+
+# Submissions are sanitized when the sanitization module is available
+try:
+    from lib.sanitization import sanitize_record, COMPREHENSIVE_APPLICATION_SCHEMA
+except ImportError:
+    sanitize_record = None
+
+# Admin logins go through server-side sessions (listing, caps, revocation)
+# when the security module is available
+try:
+    from lib.security import authenticate_user, check_authentication, logout_user
+    from lib.session_registry import show_live_sessions
+except ImportError:
+    authenticate_user = None
+
 # Comprehensive Kink Categories and Data
 KINK_CATEGORIES = [
     {"id": "bdsm_basics", "name": "BDSM Basics", "icon": "🛡️"},
@@ -426,8 +486,12 @@ def show_admin_login():
                 st.rerun()
         
         if submitted:
-            # Simple authentication (replace with secure auth in production)
-            if username == "admin" and password == "harem2025":
+            if authenticate_user:
+                authenticated = authenticate_user(username, password)
+            else:
+                # Simple authentication (replace with secure auth in production)
+                authenticated = username == "admin" and password == "harem2025"
+            if authenticated:
                 st.session_state.admin_authenticated = True
                 st.session_state.current_user = {"username": username, "role": "admin"}
                 st.success("✅ Admin login successful!")
@@ -518,6 +582,14 @@ def show_applicant_dashboard():
         st.info("Communication features will be available after application approval.")
 
 def show_admin_dashboard():
+    # Revoked and idle sessions end here, even mid-visit
+    if authenticate_user and not check_authentication():
+        st.session_state.admin_authenticated = False
+        st.session_state.current_user = None
+        st.warning("⚠️ Your session has ended. Please log in again.")
+        show_admin_login()
+        return
+    
     st.title(f"👑 {PERSONAL_BRANDING['system_name']} - Admin Dashboard")
     st.subheader(f"Welcome back, {st.session_state.current_user.get('username', PERSONAL_BRANDING['title'])}")
     
@@ -540,12 +612,19 @@ def show_admin_dashboard():
             "Contracts", 
             "Bible Management", 
             "Metrics & Analytics", 
-            "Settings", 
-            "Logout"
-        ]
+            "Settings"
+        ] + (["Live Sessions"] if authenticate_user else [])
+          + (["Rerun Profiler"] if show_profiler_switch else [])
+          + (["Session Memory"] if show_session_memory_panel else [])
+          + (["Performance"] if setup_performance_monitoring else []) + ["Logout"]
     )
+    # Kept on every admin page so profiling stays on while other pages are used
+    if show_profiler_switch:
+        show_profiler_switch()
     
     if admin_page == "Logout":
+        if authenticate_user:
+            logout_user()
         st.session_state.admin_authenticated = False
         st.session_state.current_user = None
         st.session_state.user_type = None
@@ -586,6 +665,20 @@ def show_admin_dashboard():
     
     elif admin_page == "Settings":
         show_admin_settings()
+    
+    elif admin_page == "Live Sessions":
+        show_live_sessions()
+    
+    elif admin_page == "Rerun Profiler":
+        st.header("🔬 Rerun Profiler")
+        show_profiler_panel()
+    
+    elif admin_page == "Session Memory":
+        st.header("🧠 Session Memory")
+        show_session_memory_panel()
+    
+    elif admin_page == "Performance":
+        show_performance_dashboard()
 
 def show_admin_overview():
     st.header("📊 Dashboard Overview")
@@ -655,8 +748,17 @@ def show_admin_overview():
 
 def show_admin_applications():
     st.header("📋 Applications Management")
+    
+    if APPLICATION_SEARCH_AVAILABLE:
+        show_application_search()
+    
     st.subheader("All Applications")
     
+    # Database applications are read a page at a time rather than all at once
+    if show_paged_table and show_paged_table("applications", database_application_row):
+        show_application_actions()
+        return
+    
     # Get applications data
     applications = get_applications()
     
@@ -674,34 +776,49 @@ def show_admin_applications():
         
         if df_data:
             df = pd.DataFrame(df_data)
-            st.dataframe(df, use_container_width=True)
-            
-            # Application actions
-            st.subheader("📝 Application Actions")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.write("**Review Applications**")
-                st.write("• View application details")
-                st.write("• Approve/reject applications")
-                st.write("• Add notes and comments")
-            
-            with col2:
-                st.write("**Application Analytics**")
-                st.write("• Conversion rates")
-                st.write("• Response times")
-                st.write("• Source analysis")
+            if show_dataframe:
+                show_dataframe(df)
+            else:
+                st.dataframe(df, use_container_width=True)
             
-            with col3:
-                st.write("**Bulk Actions**")
-                st.write("• Bulk approve/reject")
-                st.write("• Export applications")
-                st.write("• Send notifications")
+            show_application_actions()
         else:
             st.info("📊 **No applications data available yet.**")
     else:
         st.info("📊 **No applications data available yet.** Connect to your database to see real applications.")
 
+def database_application_row(app):
+    """Table columns for a row of the database applications table"""
+    return {
+        "ID": app.get("id", "N/A"),
+        "Name": app.get("full_name", "N/A"),
+        "Email": app.get("email", "N/A"),
+        "Status": app.get("status", "N/A"),
+        "Submitted": str(app.get("created_at"))[:10] if app.get("created_at") else "N/A"
+    }
+
+def show_application_actions():
+    st.subheader("📝 Application Actions")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.write("**Review Applications**")
+        st.write("• View application details")
+        st.write("• Approve/reject applications")
+        st.write("• Add notes and comments")
+    
+    with col2:
+        st.write("**Application Analytics**")
+        st.write("• Conversion rates")
+        st.write("• Response times")
+        st.write("• Source analysis")
+    
+    with col3:
+        st.write("**Bulk Actions**")
+        st.write("• Bulk approve/reject")
+        st.write("• Export applications")
+        st.write("• Send notifications")
+
 def show_roster_management():
     st.header("👥 Roster Management")
     st.subheader("Active Harem Members")
@@ -1874,6 +1991,9 @@ def show_comprehensive_application_form():
         
         with col3:
             if st.button("🚀 Submit Application", type="primary"):
+                if sanitize_record:
+                    form_data = sanitize_record(form_data, COMPREHENSIVE_APPLICATION_SCHEMA)
+                
                 # Validation
                 required_fields = [form_data.get('full_name'), form_data.get('email'), form_data.get('age'), form_data.get('location'), form_data.get('interests'), form_data.get('limits')]
                 required_agreements = [agree_terms, agree_privacy, age_verification]
@@ -1909,6 +2029,9 @@ def show_comprehensive_application_form():
                 st.rerun()
 
 def main():
+    # Warm the data caches in the background before anyone needs them
+    start_background_services()
+    
     # Initialize session state
     init_session_state()
     
@@ -1936,4 +2059,5 @@ def main():
     st.markdown("© 2025 Harem CRM. All rights reserved.")
 
 if __name__ == "__main__":
-    main()
+    with track_session_memory(), profile_rerun():
+        main()